@@ -0,0 +1,224 @@
+"""
+cache.py
+
+/analyze/* 결과 캐시.
+
+- 키: 마스킹된 log/code + persona + input_mode + 모델 ID + 프롬프트 버전의 해시
+- 값: 마스킹된 상태의 cause/solution/prevention (원본 민감정보는 캐시에 절대 저장하지 않는다)
+  → 요청마다 자신의 MaskingManager로 언마스킹해서 응답한다.
+- 메모리 LRU + TTL, 선택적으로 SQLite 파일 백엔드(재시작 후에도 유지)
+- async 핸들러에서는 aget/aset 을 쓴다. (SQLite 접근은 asyncio.to_thread 로 이벤트 루프 밖에서)
+"""
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+
+def analysis_cache_key(masked_log: str, masked_code: str, persona: str, input_mode: str,
+                       model_id: str, prompt_version: str) -> str:
+    raw = json.dumps(
+        [masked_log, masked_code, persona, input_mode, model_id or "", prompt_version],
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class _SqliteStore:
+    """
+    간단한 key/value + 만료시각 테이블. 여러 스레드에서 쓰므로 lock으로 직렬화한다.
+
+    호출마다 커밋하지 않도록
+    - get 의 accessed_at 갱신은 모아 두었다가 다음 set(또는 touch_batch 개가 쌓였을 때) 한 트랜잭션에 쓴다.
+    - 만료/LRU 정리는 행 수가 max_entries 를 넘었거나 prune_interval 초가 지났을 때만 한다.
+    AnalysisCache 의 async 메서드가 이 클래스를 asyncio.to_thread 로 부르므로 이벤트 루프에서는 돌지 않는다.
+    """
+
+    def __init__(self, path: str, max_entries: int, prune_interval: float = 300.0, touch_batch: int = 256):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.max_entries = max_entries
+        self.prune_interval = prune_interval
+        self.touch_batch = touch_batch
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS analysis_cache ("
+            " key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+        self._touched: dict = {}   # key -> accessed_at (아직 쓰지 않은 것)
+        self._rows = self._conn.execute("SELECT COUNT(*) FROM analysis_cache").fetchone()[0]
+        self._pruned_at = time.time()
+
+    def get(self, key: str, now: float):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM analysis_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or row[1] <= now:
+                return None  # 만료된 행은 다음 정리 때 지운다
+            self._touched[key] = now
+            if len(self._touched) >= self.touch_batch:
+                self._flush_touches()
+                self._conn.commit()
+            return json.loads(row[0]), row[1]
+
+    def set(self, key: str, value: dict, expires_at: float, now: float) -> None:
+        with self._lock:
+            self._touched.pop(key, None)
+            exists = self._conn.execute("SELECT 1 FROM analysis_cache WHERE key = ?", (key,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO analysis_cache (key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value, ensure_ascii=False), expires_at, now),
+            )
+            if exists is None:
+                self._rows += 1  # 같은 키를 덮어쓴 경우는 행 수가 그대로다 (cap 을 넘지 않았는데 정리하지 않게)
+            self._flush_touches()
+            if self._rows > self.max_entries or now - self._pruned_at >= self.prune_interval:
+                self._prune(now)
+            self._conn.commit()
+
+    def _flush_touches(self) -> None:
+        if self._touched:
+            self._conn.executemany(
+                "UPDATE analysis_cache SET accessed_at = ? WHERE key = ?",
+                [(at, key) for key, at in self._touched.items()],
+            )
+            self._touched.clear()
+
+    def _prune(self, now: float) -> None:
+        self._conn.execute("DELETE FROM analysis_cache WHERE expires_at <= ?", (now,))
+        self._conn.execute(
+            "DELETE FROM analysis_cache WHERE key NOT IN "
+            "(SELECT key FROM analysis_cache ORDER BY accessed_at DESC LIMIT ?)",
+            (self.max_entries,),
+        )
+        self._rows = self._conn.execute("SELECT COUNT(*) FROM analysis_cache").fetchone()[0]
+        self._pruned_at = now
+
+    def clear(self) -> None:
+        with self._lock:
+            self._touched.clear()
+            self._conn.execute("DELETE FROM analysis_cache")
+            self._conn.commit()
+            self._rows = 0
+
+
+class AnalysisCache:
+    def __init__(self, max_entries: int = 1024, ttl: float = 86400, path: Optional[str] = None,
+                 disk_max_entries: Optional[int] = None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._disk = _SqliteStore(path, disk_max_entries or max_entries * 10) if path else None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    def _get_memory(self, key: str, now: float) -> Optional[dict]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return dict(value)
+                del self._entries[key]
+        return None
+
+    def _after_disk(self, key: str, found) -> Optional[dict]:
+        with self._lock:
+            if found is None:
+                self.misses += 1
+                return None
+            value, expires_at = found
+            self._put(key, value, expires_at)
+            self.hits += 1
+            return dict(value)
+
+    def get(self, key: str) -> Optional[dict]:
+        if not self.enabled:
+            return None
+        now = time.time()
+        value = self._get_memory(key, now)
+        if value is not None:
+            return value
+        return self._after_disk(key, self._disk.get(key, now) if self._disk else None)
+
+    async def aget(self, key: str) -> Optional[dict]:
+        """get 의 async 버전. 메모리 미스일 때만 SQLite 조회를 스레드로 넘긴다."""
+        if not self.enabled:
+            return None
+        now = time.time()
+        value = self._get_memory(key, now)
+        if value is not None:
+            return value
+        found = await asyncio.to_thread(self._disk.get, key, now) if self._disk else None
+        return self._after_disk(key, found)
+
+    def _set_memory(self, key: str, value: dict) -> Tuple[float, float]:
+        now = time.time()
+        expires_at = now + self.ttl
+        with self._lock:
+            self._put(key, dict(value), expires_at)
+        return expires_at, now
+
+    def set(self, key: str, value: dict) -> None:
+        if not self.enabled:
+            return
+        expires_at, now = self._set_memory(key, value)
+        if self._disk:
+            self._disk.set(key, value, expires_at, now)
+
+    async def aset(self, key: str, value: dict) -> None:
+        """set 의 async 버전. SQLite 쓰기는 스레드에서 한다."""
+        if not self.enabled:
+            return
+        expires_at, now = self._set_memory(key, value)
+        if self._disk:
+            await asyncio.to_thread(self._disk.set, key, dict(value), expires_at, now)
+
+    def _put(self, key: str, value: dict, expires_at: float) -> None:
+        self._entries[key] = (expires_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+        if self._disk:
+            self._disk.clear()
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl": self.ttl,
+            "persistent": self._disk is not None,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": round(self.hits / total, 4) if total else 0.0,
+        }
+
+
+def cache_from_env() -> AnalysisCache:
+    return AnalysisCache(
+        max_entries=int(os.getenv("ANALYSIS_CACHE_SIZE", "1024")),
+        ttl=float(os.getenv("ANALYSIS_CACHE_TTL", "86400")),
+        path=os.getenv("ANALYSIS_CACHE_PATH") or None,
+    )
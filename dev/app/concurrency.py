@@ -0,0 +1,96 @@
+"""
+concurrency.py
+
+/analyze/* 엔드포인트의 동시 실행 수를 제한하는 limiter.
+
+- max_in_flight: 동시에 그래프를 실행할 수 있는 요청 수
+- max_queue: 슬롯을 기다릴 수 있는 요청 수 (초과 시 즉시 거절)
+- queue_timeout: 대기 최대 시간(초). 초과 시 거절
+
+거절된 요청은 AnalysisBusyError 로 알리고, API 레이어에서 503으로 변환한다.
+"""
+import asyncio
+import os
+from contextlib import asynccontextmanager
+from typing import Optional
+
+
+class AnalysisBusyError(RuntimeError):
+    """동시 실행/대기열 한도를 넘어 요청을 받을 수 없을 때 발생한다."""
+
+
+class AnalysisLimiter:
+    def __init__(self, max_in_flight: int = 32, max_queue: int = 64, queue_timeout: Optional[float] = 30.0):
+        if max_in_flight < 1:
+            raise ValueError("max_in_flight must be >= 1")
+        self.max_in_flight = max_in_flight
+        self.max_queue = max(0, max_queue)
+        self.queue_timeout = queue_timeout
+        self.in_flight = 0
+        self.waiting = 0
+        self.rejected = 0
+        self._sem: Optional[asyncio.Semaphore] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _semaphore(self) -> asyncio.Semaphore:
+        # Semaphore는 처음 대기한 이벤트 루프에 묶이므로, 루프가 바뀌면(테스트 클라이언트 등) 새로 만든다.
+        loop = asyncio.get_running_loop()
+        if self._sem is None or self._loop is not loop:
+            self._sem = asyncio.Semaphore(self.max_in_flight)
+            self._loop = loop
+            self.in_flight = 0
+            self.waiting = 0
+        return self._sem
+
+    async def acquire(self) -> None:
+        """슬롯 하나를 점유한다. 대기열이 가득 차거나 시간 초과 시 AnalysisBusyError."""
+        sem = self._semaphore()
+        if not sem.locked():
+            # 빈 슬롯이 있으면 대기 없이 바로 점유
+            await sem.acquire()
+        else:
+            if self.waiting >= self.max_queue:
+                self.rejected += 1
+                raise AnalysisBusyError("analysis queue is full")
+
+            self.waiting += 1
+            try:
+                await asyncio.wait_for(sem.acquire(), timeout=self.queue_timeout)
+            except asyncio.TimeoutError:
+                self.rejected += 1
+                raise AnalysisBusyError("timed out waiting for an analysis slot")
+            finally:
+                self.waiting -= 1
+
+        self.in_flight += 1
+
+    def release(self) -> None:
+        self.in_flight -= 1
+        self._sem.release()
+
+    @asynccontextmanager
+    async def slot(self):
+        """그래프 실행 슬롯 하나를 점유하는 컨텍스트. 스트리밍처럼 수명이 긴 경우 acquire/release를 직접 쓴다."""
+        await self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+    def stats(self) -> dict:
+        return {
+            "max_in_flight": self.max_in_flight,
+            "max_queue": self.max_queue,
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "rejected": self.rejected,
+        }
+
+
+def limiter_from_env() -> AnalysisLimiter:
+    timeout = float(os.getenv("ANALYZE_QUEUE_TIMEOUT", "30"))
+    return AnalysisLimiter(
+        max_in_flight=int(os.getenv("ANALYZE_MAX_CONCURRENCY", "32")),
+        max_queue=int(os.getenv("ANALYZE_MAX_QUEUE", "64")),
+        queue_timeout=timeout if timeout > 0 else None,
+    )
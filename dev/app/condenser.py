@@ -0,0 +1,232 @@
+"""
+condenser.py
+
+마스킹된 로그를 그래프(LLM)에 넘기기 전에 줄이는 단계. (마스킹 → 압축 → 그래프)
+
+1. 연속 반복 접기 (항상): 잡음(타임스탬프/ID 등)을 지운 형태가 같은 줄 또는 블록(최대 MAX_PERIOD줄,
+   예: 재귀 호출 스택 프레임)이 MIN_REPEAT회 이상 이어지면 첫/마지막만 남기고 사이를 횟수 표시로 바꾼다.
+2. 흩어진 반복 접기 (예산 초과 시): 예외/스택 트레이스가 아닌 줄이 로그 곳곳에서 반복되면
+   첫 번째(총 횟수 표시)와 마지막만 남긴다.
+3. 예산 맞추기 (예산 초과 시): 앞/뒤 구간과 예외 헤더 → 스택 프레임 순으로 남기고 나머지는 생략 표시로 바꾼다.
+
+토큰 수는 UTF-8 바이트 / 4 로 추정한다. (영문 ~4자, 한글 ~1.3자당 1토큰)
+input_mode별 예산: CONDENSE_BUDGET_LOG, CONDENSE_BUDGET_LOG_CODE, CONDENSE_BUDGET_CODE (0이면 3단계 생략)
+"""
+import os
+import re
+from collections import Counter
+from dataclasses import asdict, dataclass
+from typing import List, Optional
+
+from dev.app.fingerprint import normalize, trace_line_kind
+
+MAX_PERIOD = 4
+MIN_REPEAT = 4
+SCATTER_MIN = 3
+LINE_MAX_CHARS = 2000
+KEY_BLOCK = 4096
+
+DEFAULT_BUDGETS = {"log": 6000, "log_code": 4000, "code": 1500}
+
+# 예산 안에서 앞/뒤 구간이 차지하는 비율 (나머지는 중간의 예외/스택 트레이스 줄)
+HEAD_RATIO = 0.2
+TAIL_RATIO = 0.3
+
+_PRIORITY = {"header": 2, "frame": 1}
+_DIGITS = re.compile(r'\d+')
+
+
+def estimate_tokens(text: str) -> int:
+    return (len(text.encode("utf-8")) + 3) // 4
+
+
+def budget_for(input_mode: str) -> int:
+    default = DEFAULT_BUDGETS.get(input_mode, DEFAULT_BUDGETS["log"])
+    return int(os.getenv(f"CONDENSE_BUDGET_{input_mode.upper()}", str(default)))
+
+
+@dataclass
+class CondensedLog:
+    text: str
+    original_chars: int
+    condensed_chars: int
+    original_tokens: int
+    condensed_tokens: int
+    original_lines: int
+    condensed_lines: int
+    budget: int
+
+    def metadata(self) -> dict:
+        meta = asdict(self)
+        meta.pop("text")
+        return meta
+
+
+@dataclass
+class _Line:
+    text: str
+    key: Optional[str]      # 반복 판단용 정규화 형태. 생략 표시 줄은 None
+    priority: int = 0       # 2: 예외 헤더, 1: 스택 프레임, 0: 그 외
+
+
+def _normalized_keys(lines: List[str]) -> List[str]:
+    # 여러 줄을 한 번에 정규화하는 편이 줄마다 호출하는 것보다 훨씬 빠르다. 줄 수가 달라지면 줄 단위로 다시 한다.
+    # 로그 전체를 한 문자열로 다시 붙이지 않도록 KEY_BLOCK 줄씩 나눠서 한다.
+    keys: List[str] = []
+    for start in range(0, len(lines), KEY_BLOCK):
+        block = lines[start:start + KEY_BLOCK]
+        normalized = normalize("\n".join(block)).split("\n")
+        if len(normalized) != len(block):
+            normalized = [normalize(line) for line in block]
+        keys.extend(normalized)
+    # 시도 횟수/포트 같은 숫자만 다른 줄도 같은 형태로 본다. (남는 첫/마지막 줄은 원문 그대로)
+    return [_DIGITS.sub("#", " ".join(k.split())) for k in keys]
+
+
+def _classify(lines: List[str], keys: List[str]) -> List[_Line]:
+    out: List[_Line] = []
+    prev_frame_indent = None
+    for line, key in zip(lines, keys):
+        if len(line) > LINE_MAX_CHARS:
+            line = line[:LINE_MAX_CHARS] + f" …(+{len(line) - LINE_MAX_CHARS}자)"
+        kind = trace_line_kind(line) if key else None
+        indent = len(line) - len(line.lstrip())
+        # Python 트레이스백에서 프레임 바로 아래 들여쓴 소스 줄도 프레임의 일부로 본다.
+        if kind is None and prev_frame_indent is not None and key and indent > prev_frame_indent:
+            kind = "frame"
+        prev_frame_indent = indent if kind == "frame" else None
+        out.append(_Line(line, key, _PRIORITY.get(kind, 0)))
+    return out
+
+
+def _collapse_runs(lines: List[_Line]) -> List[_Line]:
+    keys = [l.key for l in lines]
+    n = len(lines)
+    out: List[_Line] = []
+    i = 0
+    while i < n:
+        best_p, best_r = 1, 1
+        for p in range(1, MAX_PERIOD + 1):
+            if i + MIN_REPEAT * p > n:
+                break
+            block = keys[i:i + p]
+            r = 1
+            while i + (r + 1) * p <= n and keys[i + r * p:i + (r + 1) * p] == block:
+                r += 1
+            if r >= MIN_REPEAT and r * p > best_r * best_p:
+                best_p, best_r = p, r
+        if best_r < MIN_REPEAT:
+            out.append(lines[i])
+            i += 1
+            continue
+
+        if not any(keys[i:i + best_p]):
+            out.append(lines[i])  # 빈 줄 반복은 한 줄로
+        else:
+            out.extend(lines[i:i + best_p])
+            unit = "줄" if best_p == 1 else f"{best_p}줄 블록"
+            out.append(_Line(f"    ... (위 {unit}이 {best_r - 2}번 더 반복되어 생략) ...", None))
+            out.extend(lines[i + (best_r - 1) * best_p:i + best_r * best_p])
+        i += best_p * best_r
+    return out
+
+
+def _collapse_scattered(lines: List[_Line]) -> List[_Line]:
+    counts = Counter(l.key for l in lines if l.key and l.priority == 0)
+    last = {}
+    for idx, l in enumerate(lines):
+        if l.key and l.priority == 0:
+            last[l.key] = idx
+    seen = set()
+    out: List[_Line] = []
+    for idx, l in enumerate(lines):
+        if not l.key or l.priority or counts[l.key] < SCATTER_MIN:
+            out.append(l)
+        elif l.key not in seen:
+            seen.add(l.key)
+            out.append(_Line(f"{l.text}  (같은 형태의 줄 총 {counts[l.key]}회)", l.key))
+        elif idx == last[l.key]:
+            out.append(l)
+    return out
+
+
+def _trim(lines: List[_Line], budget: int) -> List[_Line]:
+    cost = [estimate_tokens(l.text) + 1 for l in lines]
+    n = len(lines)
+    keep = [False] * n
+
+    used, head_end = 0, 0
+    while head_end < n and used + cost[head_end] <= budget * HEAD_RATIO:
+        used += cost[head_end]
+        keep[head_end] = True
+        head_end += 1
+    tail_start = n
+    while tail_start > head_end and used + cost[tail_start - 1] <= budget * (HEAD_RATIO + TAIL_RATIO):
+        tail_start -= 1
+        used += cost[tail_start]
+        keep[tail_start] = True
+
+    # 생략 표시 줄 몫으로 남은 예산의 10%를 떼어 둔다.
+    remaining = (budget - used) * 0.9
+    middle = sorted(range(head_end, tail_start), key=lambda i: (-lines[i].priority, i))
+    for i in middle:
+        if lines[i].priority == 0:
+            break
+        if cost[i] <= remaining:
+            keep[i] = True
+            remaining -= cost[i]
+
+    out: List[_Line] = []
+    skipped = 0
+    for i, l in enumerate(lines):
+        if keep[i]:
+            if skipped:
+                out.append(_Line(f"    ... ({skipped}줄 생략) ...", None))
+                skipped = 0
+            out.append(l)
+        else:
+            skipped += 1
+    if skipped:
+        out.append(_Line(f"    ... ({skipped}줄 생략) ...", None))
+    return out
+
+
+def condense_log(text: str, input_mode: str = "log", budget: Optional[int] = None) -> CondensedLog:
+    """마스킹된 로그를 압축한다. 플레이스홀더는 그대로 보존된다."""
+    text = text or ""
+    raw_lines = text.splitlines()
+    result = condense_lines(raw_lines, input_mode, budget)
+    if result.text == "\n".join(raw_lines):
+        result.text = text  # 바뀐 것이 없으면 원문 그대로 (줄바꿈 형식 포함)
+    result.original_chars = len(text)
+    result.original_tokens = estimate_tokens(text)
+    result.condensed_chars = len(result.text)
+    result.condensed_tokens = estimate_tokens(result.text)
+    return result
+
+
+def condense_lines(raw_lines: List[str], input_mode: str = "log", budget: Optional[int] = None) -> CondensedLog:
+    """이미 줄 단위로 나뉜 마스킹 로그를 압축한다. (업로드처럼 조각으로 받은 로그를 한 문자열로 붙이지 않고 넘길 때)
+
+    반복 횟수 세기와 앞/뒤 구간 판단에 로그 전체가 필요하므로 줄 목록은 한 번에 받는다.
+    """
+    budget = budget_for(input_mode) if budget is None else budget
+
+    lines = _collapse_runs(_classify(raw_lines, _normalized_keys(raw_lines)))
+    if budget > 0 and sum(estimate_tokens(l.text) + 1 for l in lines) > budget:
+        lines = _collapse_scattered(lines)
+        if sum(estimate_tokens(l.text) + 1 for l in lines) > budget:
+            lines = _trim(lines, budget)
+
+    condensed = "\n".join(l.text for l in lines)
+    newlines = max(0, len(raw_lines) - 1)
+    return CondensedLog(
+        text=condensed,
+        original_chars=sum(map(len, raw_lines)) + newlines,
+        condensed_chars=len(condensed),
+        original_tokens=(sum(len(l.encode("utf-8")) for l in raw_lines) + newlines + 3) // 4,
+        condensed_tokens=estimate_tokens(condensed),
+        original_lines=len(raw_lines),
+        condensed_lines=len(lines),
+        budget=budget,
+    )
@@ -0,0 +1,155 @@
+"""
+fingerprint.py
+
+에러 로그 정규화 / 시그니처(fingerprint) 생성.
+
+같은 버그에서 나온 두 로그는 타임스탬프, PID, 메모리 주소, 줄 번호, 임시 경로,
+요청 ID 정도만 다르다. 이런 잡음을 지우고 예외 헤더 + 상위 스택 프레임만 남긴
+"canonical error" 문자열과 그 해시(signature)를 만든다.
+
+- rag_search 검색 질의 텍스트 (잡음 섞인 원본 로그 대신), fast path 답변 저장소 키
+- 결과 캐시 키 (/analyze/log): signature 는 검색용으로 짧게 줄인 것(헤더 처음/끝, 에러 줄 5개)이라
+  뒤쪽 에러 줄이나 중간 Caused by 만 다른 로그가 같아진다. 캐시는 모든 헤더/프레임/에러 줄을 담은
+  full_signature 를 쓴다.
+Python / JavaScript(Node) / Java 스택 트레이스를 인식한다.
+"""
+import hashlib
+import os
+import re
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+MAX_FRAMES = 5
+MAX_FALLBACK_LINES = 5
+
+# --- 잡음 제거 규칙 (순서 중요) ---
+_NOISE_RULES = [
+    # 2024-01-02T03:04:05.123Z, 2024/01/02 03:04:05,123
+    (re.compile(r'\d{4}[-/]\d{2}[-/]\d{2}[T ]\d{2}:\d{2}:\d{2}(?:[.,]\d+)?(?:Z|[+-]\d{2}:?\d{2})?'), '<TS>'),
+    (re.compile(r'\b\d{2}:\d{2}:\d{2}(?:[.,]\d+)?\b'), '<TS>'),
+    (re.compile(r'\b[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}\b'), '<UUID>'),
+    (re.compile(r'\b0x[0-9a-fA-F]+\b'), '<ADDR>'),
+    (re.compile(r'(?i)\b(request[_-]?id|req[_-]?id|trace[_-]?id|span[_-]?id|correlation[_-]?id)(["\']?\s*[=:]\s*["\']?)[\w-]+'), r'\1\2<ID>'),
+    (re.compile(r'(?i)\b(pid|tid|thread|process)(\s*[=:#]?\s*)\d+'), r'\1\2<N>'),
+    (re.compile(r'(?:/tmp|/var/tmp|/private/var/folders|/var/folders)/[^\s\'":,)]+'), '<TMP>'),
+    (re.compile(r'(?i)[a-z]:\\Users\\[^\\\s]+\\AppData\\Local\\Temp\\[^\s\'":,)]+'), '<TMP>'),
+    (re.compile(r'\b[0-9a-f]{12,}\b'), '<HEX>'),
+    # 마스킹 플레이스홀더는 번호만 다르므로 번호를 지운다: [IP_ADDR_3] -> [IP_ADDR]
+    (re.compile(r'\[([A-Z][A-Z0-9]*(?:_[A-Z0-9]+)*?)_\d+\]'), r'[\1]'),
+    # 줄/컬럼 번호
+    (re.compile(r'\bline \d+'), 'line <N>'),
+    (re.compile(r'(\.(?:java|kt|scala|groovy)):\d+\)'), r'\1:<N>)'),
+    (re.compile(r'(\.(?:[cm]?js|jsx|ts|tsx|vue|html)):\d+(?::\d+)?'), r'\1:<N>'),
+    (re.compile(r'\b\d+(?:\.\d+)?\s?(ms|s|sec|seconds)\b'), r'<N>\1'),
+]
+
+# --- 스택 프레임 ---
+_PY_FRAME = re.compile(r'File "([^"]+)", line (?:\d+|<N>), in (\S+)')
+_JS_FRAME = re.compile(r'^\s*at (?:(?:async )?([^\s(]+) )?\(?([^\s()]+?)(?::(?:\d+|<N>))+\)?\s*$')
+_JAVA_FRAME = re.compile(r'^\s*at ([\w$.]+)\.([\w$<>]+)\(([^)]*)\)')
+
+# --- 예외 헤더 ---
+_EXC_HEADER = re.compile(
+    r'^\s*(?:Uncaught |Exception in thread "[^"]*" |Caused by: )?'
+    r'((?:[A-Za-z_$][\w$]*\.)*[A-Za-z_$][\w$]*(?:Error|Exception|Warning|Fault|Interrupt|Exit))\b(?::\s*(.*))?$'
+)
+_ERROR_WORDS = re.compile(r'(?i)\b(error|exception|fatal|panic|fail(?:ed|ure)?|traceback|denied|refused|timeout)\b')
+
+
+@dataclass(frozen=True)
+class ErrorFingerprint:
+    signature: str
+    canonical: str
+    language: str = "unknown"
+    exception: Optional[str] = None
+    frames: List[str] = field(default_factory=list)
+    full_signature: str = ""  # 잡음만 지우고 줄이지 않은 헤더 + 프레임 + 에러 줄 전체의 해시 (결과 캐시 키)
+
+
+def normalize(text: str) -> str:
+    """타임스탬프/ID/주소/줄번호/임시경로 등 잡음을 토큰으로 치환한다."""
+    for pattern, repl in _NOISE_RULES:
+        text = pattern.sub(repl, text)
+    return text
+
+
+def _frame(line: str):
+    m = _PY_FRAME.search(line)
+    if m:
+        return "python", f"{os.path.basename(m.group(1))}:{m.group(2)}"
+    m = _JAVA_FRAME.match(line)
+    if m and re.search(r'\.(?:java|kt|scala|groovy)|Native Method|Unknown Source', m.group(3)):
+        cls = m.group(1)
+        return "java", f"{cls}.{m.group(2)}"
+    m = _JS_FRAME.match(line)
+    if m:
+        func = m.group(1) or "<anonymous>"
+        return "javascript", f"{os.path.basename(m.group(2))}:{func}"
+    return None, None
+
+
+def trace_line_kind(line: str) -> Optional[str]:
+    """예외 헤더 줄이면 "header", 스택 프레임 줄이면 "frame", 둘 다 아니면 None."""
+    if _frame(line)[1]:
+        return "frame"
+    if "Traceback (most recent call last)" in line or "During handling of the above exception" in line:
+        return "header"
+    if _EXC_HEADER.match(line):
+        return "header"
+    return None
+
+
+def fingerprint(text: str) -> ErrorFingerprint:
+    """로그 텍스트의 정규화된 시그니처와 canonical error 문자열을 만든다."""
+    lines = [line.rstrip() for line in normalize(text or "").splitlines() if line.strip()]
+
+    language = "unknown"
+    headers: List[str] = []
+    frames: List[str] = []
+    for line in lines:
+        lang, frame = _frame(line)
+        if frame:
+            language = language if language != "unknown" else lang
+            frames.append(frame)
+            continue
+        if "Traceback (most recent call last)" in line:
+            language = "python"
+            continue
+        m = _EXC_HEADER.match(line)
+        if m:
+            message = (m.group(2) or "").strip()
+            headers.append(f"{m.group(1)}: {message}" if message else m.group(1))
+
+    # Python은 가장 안쪽 프레임이 마지막, JS/Java는 처음에 온다.
+    if language == "python":
+        frames = frames[-MAX_FRAMES:][::-1]
+    else:
+        frames = frames[:MAX_FRAMES]
+
+    # 에러 키워드가 있는 줄 (없으면 전체). canonical 은 앞 MAX_FALLBACK_LINES 개만, full_signature 는 전부
+    picked = [line.strip() for line in lines if _ERROR_WORDS.search(line)] or [l.strip() for l in lines]
+
+    exception = None
+    if headers:
+        # Java의 "Caused by" 체인은 마지막이 근본 원인, Python은 마지막 줄이 실제 예외
+        exception = headers[-1].split(":", 1)[0]
+        parts = [headers[0]] if len(headers) == 1 else [headers[0], headers[-1]]
+        canonical_lines = parts + [f"  at {f}" for f in frames]
+    elif frames:
+        canonical_lines = [f"  at {f}" for f in frames]
+    else:
+        # 스택 트레이스가 없으면 에러 키워드가 있는 줄(없으면 앞부분)만 남긴다.
+        canonical_lines = picked[:MAX_FALLBACK_LINES]
+
+    canonical = "\n".join(re.sub(r'[ \t]+', ' ', l) for l in canonical_lines).strip()
+    signature = hashlib.sha1(f"{language}\n{canonical}".encode("utf-8")).hexdigest()[:16]
+    full = hashlib.sha1(language.encode("utf-8"))
+    for part in ("headers", *headers, "frames", *frames, "lines", *picked):
+        full.update(b"\0" + re.sub(r'[ \t]+', ' ', part).encode("utf-8"))
+    return ErrorFingerprint(signature=signature, canonical=canonical, language=language,
+                            exception=exception, frames=frames, full_signature=full.hexdigest()[:24])
+
+
+def canonical_error(text: str) -> str:
+    """검색 질의용 canonical 문자열. 아무것도 추출하지 못하면 원문(공백 정리)을 돌려준다."""
+    return fingerprint(text).canonical or (text or "").strip()
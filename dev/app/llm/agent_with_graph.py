@@ -1,33 +1,89 @@
-from typing import Optional, Literal
+from typing import Dict, Optional, Literal, Tuple
+from concurrent.futures import Future, ThreadPoolExecutor
 from dotenv import load_dotenv
+import asyncio
+import json
 import os
+import threading
+import time
+import uuid
 from langgraph.graph import StateGraph, START, END, MessagesState
-from langgraph.prebuilt import ToolNode, tools_condition
 from langchain_core.messages import SystemMessage, HumanMessage, ToolMessage, AIMessage
-from langchain_anthropic import ChatAnthropic
+from langchain_core.runnables import RunnableLambda
+from dev.app.llm.answer_store import adapt, get_answer_store
+from dev.app.metrics import rag_route, record_tokens, stage_errors, timed
 from dev.app.llm.prompts import PROMPTS
+from dev.app.llm import tools as rag_tools
 from dev.app.llm.tools import rag_search_tool
 
 load_dotenv()
 
-# LLM 설정
-llm = ChatAnthropic(
-    model=os.getenv("ANTHROPIC_MODEL_ID"),
-    api_key=os.getenv("ANTHROPIC_API_KEY"),
-    temperature=0.4,
-    max_tokens=1500,
-)
+# llm / llm_with_tools / graph / app 은 처음 쓸 때 만든다 (get_*() 또는 ag.app 같은 속성 접근).
+# import 만으로는 Anthropic 클라이언트 생성이나 그래프 컴파일이 일어나지 않는다.
+# 만들어진 객체는 모듈 전역에 두므로 테스트에서 monkeypatch.setattr(ag, "llm", fake) 로 바꿔 끼울 수 있다.
+_LAZY = ("llm", "llm_with_tools", "graph", "app")
+for _name in _LAZY:
+    globals().pop(_name, None)  # importlib.reload 시 이전 인스턴스를 버린다
+_lazy_lock = threading.RLock()
 
 class AgentState(MessagesState):
     persona: str
     input_mode: str
     log_text: str | None
     code_text: str | None
+    rag_ticket: str | None
+    served_by: str | None
 
 # Tool 설정
 tools = [rag_search_tool]
-llm_with_tools = llm.bind_tools(tools)
-tool_node = ToolNode(tools)
+# 검색은 tools 노드가 직접 하므로 모델이 tool_use 를 내지 않게 한다. tools 는 draft/final 모두 같은 목록으로
+# 묶어 두어야 Anthropic 캐시 prefix(tools → system)가 두 단계에서 같아진다. (tool_choice 는 prefix 에 안 들어간다)
+NO_TOOL_CALLS = {"type": "none"}
+
+def _make_llm():
+    from langchain_anthropic import ChatAnthropic
+    return ChatAnthropic(
+        model=os.getenv("ANTHROPIC_MODEL_ID"),
+        api_key=os.getenv("ANTHROPIC_API_KEY"),
+        temperature=0.4,
+        max_tokens=1500,
+    )
+
+# RAG_SPECULATIVE=1: 초안 LLM 호출과 동시에 rag_search 를 시작한다.
+# 초안이 검색이 필요하다고 판단하면 tools 노드가 이미 끝났거나 진행 중인 결과를 받아 쓰고,
+# 아니면 결과를 버린다. (검색 비용은 늘지만 RAG 경로 지연에서 임베딩+조회 시간이 빠진다)
+SPECULATIVE_RAG = os.getenv("RAG_SPECULATIVE", "0") == "1"
+RAG_TOP_K = 5
+# 맡겨 둔 검색을 tools 노드가 이 시간(초) 안에 꺼내 가지 않으면 버린다.
+# (스트리밍 중 클라이언트가 초안과 tools 사이에서 끊으면 아무도 꺼내 가지 않는다)
+SPECULATIVE_TTL = float(os.getenv("RAG_SPECULATIVE_TTL", "60"))
+_rag_pool: Optional[ThreadPoolExecutor] = None
+_speculative: Dict[str, Tuple[float, Future]] = {}   # rag_ticket -> (만료 시각, 진행 중인 검색). 넣은 순서 = 만료 순서
+_speculative_lock = threading.Lock()
+
+def _lazy(name: str):
+    g = globals()
+    if name not in g:
+        with _lazy_lock:
+            if name not in g:
+                g[name] = _FACTORIES[name]()
+    return g[name]
+
+def get_llm():
+    return _lazy("llm")
+
+def get_llm_with_tools():
+    return _lazy("llm_with_tools")
+
+def get_app():
+    """컴파일된 그래프."""
+    return _lazy("app")
+
+def __getattr__(name: str):
+    # 기존 코드의 `from agent_with_graph import app` / `ag.llm` 호환
+    if name in _FACTORIES:
+        return _lazy(name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 def build_user_prompt(mode: str, log_text: str, code_text: str) -> str:
     # 텍스트가 있을 경우 양끝 공백을 먼저 제거합니다.
@@ -43,68 +99,247 @@ def build_user_prompt(mode: str, log_text: str, code_text: str) -> str:
     
     return content.strip()
 
-def agent_draft(state: AgentState):
+# --- 시스템 메시지 ---
+# (persona, mode, stage) 별 SystemMessage 를 import 시 한 번만 만든다. 요청마다 문자열을 붙이지 않는다.
+# 긴 페르소나 프롬프트(PROMPTS) 블록에 cache_control 을 달아 Anthropic 프롬프트 캐시를 탄다.
+# (캐시 prefix = tools + 이 블록까지. 모델별 최소 길이(약 1024 tokens)보다 짧으면 제공자가 무시한다)
+# 단계별 지시문은 캐시 지점 뒤의 작은 블록으로 붙는다. PROMPT_CACHE=0 이면 cache_control 없이 보낸다.
+PROMPT_CACHE = os.getenv("PROMPT_CACHE", "1") == "1"
+DEFAULT_PROMPT = "분석가 페르소나로 동작하세요."
+STAGE_INSTRUCTIONS = {
+    "draft": "[중요] 1차 답변에서는 rag_search를 절대 호출하지 말고, 입력만으로 가능한 분석을 먼저 작성하라.",
+    "final": "검색된 지식을 바탕으로 최종 답변을 작성하세요. 추가 도구 호출은 중단하세요.",
+}
+
+def build_system_message(persona: str, mode: str, stage: str, cache: bool = PROMPT_CACHE) -> SystemMessage:
+    base = PROMPTS.get((persona, mode), DEFAULT_PROMPT).strip()
+    base_block = {"type": "text", "text": base}
+    if cache:
+        base_block["cache_control"] = {"type": "ephemeral"}
+    return SystemMessage(content=[base_block, {"type": "text", "text": STAGE_INSTRUCTIONS[stage]}])
+
+SYSTEM_MESSAGES = {
+    (persona, mode, stage): build_system_message(persona, mode, stage)
+    for persona, mode in PROMPTS
+    for stage in STAGE_INSTRUCTIONS
+}
+
+def system_message(state: AgentState, stage: str) -> SystemMessage:
     persona = state.get("persona", "junior")
     mode = state.get("input_mode", "log")
-    
-    # 시스템 프롬프트 조립 시 줄바꿈 뒤에 공백이 생기지 않도록 strip()
-    base_prompt = PROMPTS.get((persona, mode), "분석가 페르소나로 동작하세요.")
-    system_prompt = (base_prompt + "\n\n[중요] 1차 답변에서는 rag_search를 절대 호출하지 말고, 입력만으로 가능한 분석을 먼저 작성하라.").strip()
-    
-    msgs = state.get("messages", [])
-    if not msgs:
+    return SYSTEM_MESSAGES.get((persona, mode, stage)) or build_system_message(persona, mode, stage)
+
+def _stripped(message):
+    # Anthropic 은 끝 공백이 있는 assistant 메시지를 400으로 거절한다. 원본(state)은 건드리지 않고 사본을 만든다.
+    content = message.content
+    if isinstance(content, str) and content != content.strip():
+        return message.model_copy(update={"content": content.strip()})
+    return message
+
+def _conversation(state: AgentState) -> list:
+    """사용자 입력(첫 HumanMessage) + 지금까지의 메시지. 입력 메시지는 state 에 없으면 새로 만든다."""
+    msgs = list(state.get("messages", []))
+    if not msgs or not isinstance(msgs[0], HumanMessage):
+        mode = state.get("input_mode", "log")
         user_content = build_user_prompt(mode, state.get("log_text") or "", state.get("code_text") or "")
-        msgs = [HumanMessage(content=user_content)]
-    
-    # [핵심] Anthropic 400 에러 방지: 모든 메시지의 끝 공백 강제 제거
-    formatted_msgs = [SystemMessage(content=system_prompt)] + msgs
-    for m in formatted_msgs:
-        if hasattr(m, "content") and isinstance(m.content, str):
-            m.content = m.content.strip()
+        msgs.insert(0, HumanMessage(content=user_content))
+    return [_stripped(m) for m in msgs]
+
+def _draft_messages(state: AgentState) -> list:
+    return [system_message(state, "draft")] + _conversation(state)
+
+def rag_query(state: AgentState) -> str:
+    # rag_search 가 canonical_error 로 잡음을 걷어내므로 원문 로그(없으면 코드)를 그대로 넘긴다.
+    return (state.get("log_text") or state.get("code_text") or "").strip()
+
+def _start_speculative_rag(state: AgentState) -> Optional[Future]:
+    global _rag_pool
+    query = rag_query(state)
+    if not SPECULATIVE_RAG or not query:
+        return None
+    with _lazy_lock:
+        if _rag_pool is None:
+            _rag_pool = ThreadPoolExecutor(max_workers=int(os.getenv("RAG_SPECULATIVE_WORKERS", "8")),
+                                           thread_name_prefix="rag-speculative")
+    return _rag_pool.submit(rag_tools.rag_search, query, RAG_TOP_K)
+
+def _draft_result(resp, pending: Optional[Future]) -> dict:
+    if pending is None:
+        return {"messages": [resp], "served_by": "draft"}
+    if not wants_rag(resp.content):
+        pending.cancel()  # 아직 시작 전이면 취소, 이미 돌고 있으면 결과만 버린다
+        return {"messages": [resp], "served_by": "draft"}
+    return {"messages": [resp], "rag_ticket": _park_speculative(pending), "served_by": "draft"}
+
+def _park_speculative(pending: Future) -> str:
+    now = time.monotonic()
+    ticket = uuid.uuid4().hex
+    with _speculative_lock:
+        for old, (deadline, stale) in list(_speculative.items()):
+            if deadline > now:
+                break
+            del _speculative[old]
+            stale.cancel()
+        _speculative[ticket] = (now + SPECULATIVE_TTL, pending)
+    return ticket
 
-    resp = llm.invoke(formatted_msgs)
-    return {"messages": [resp]}
+def discard_speculative(ticket: Optional[str]) -> Optional[Future]:
+    """맡겨 둔 검색을 꺼낸다. tools 노드가 받아 가거나, 실행이 중간에 끝났을 때 버리는 용도."""
+    with _speculative_lock:
+        entry = _speculative.pop(ticket or "", None)
+    return entry[1] if entry else None
+
+@timed("fast_path")
+def fast_path(state: AgentState):
+    # 검증된 답변이 있는 에러 시그니처면 LLM 없이 바로 답한다 (answer_store.py)
+    store = get_answer_store()
+    log_text = state.get("log_text") or ""
+    answer = store.match(log_text) if (store is not None and state.get("input_mode") != "code") else None
+    if answer is None:
+        return {}
+    fields = adapt(answer, state.get("persona", "junior"))
+    return {"messages": [AIMessage(content=json.dumps(fields, ensure_ascii=False))], "served_by": "fast_path"}
+
+def after_fast_path(state: AgentState) -> str:
+    return END if state.get("served_by") == "fast_path" else "draft"
+
+@timed("draft")
+def agent_draft(state: AgentState):
+    pending = _start_speculative_rag(state)
+    resp = get_llm().invoke(_draft_messages(state))
+    record_usage("draft", resp)
+    return _draft_result(resp, pending)
+
+@timed("draft")
+async def aagent_draft(state: AgentState):
+    # 비동기 경로: 이벤트 루프를 막지 않고 LLM 응답을 기다린다.
+    pending = _start_speculative_rag(state)
+    try:
+        resp = await get_llm().ainvoke(_draft_messages(state))
+    except BaseException:
+        if pending is not None:
+            pending.cancel()  # 초안 도중 취소/실패: 맡기기 전이므로 여기서 정리한다
+        raise
+    record_usage("draft", resp)
+    return _draft_result(resp, pending)
+
+def wants_rag(content) -> bool:
+    if not content or not isinstance(content, str):
+        return False
+    last = content.lower()
+    triggers = ["모르겠", "불확실", "추정", "추가 정보", "확인이 필요", "가능성이", "근거 부족"]
+    return any(t in last for t in triggers)
 
 def need_rag(state: AgentState) -> str:
     # 1차 답변을 보고 RAG 호출 여부 판단
-    last_content = state["messages"][-1].content
-    if not last_content:
-        return END
-    
-    last = last_content.lower()
-    triggers = ["모르겠", "불확실", "추정", "추가 정보", "확인이 필요", "가능성이", "근거 부족"]
-    return "tools" if any(t in last for t in triggers) else END
+    route = "tools" if wants_rag(state["messages"][-1].content) else END
+    rag_route.inc(route="rag" if route == "tools" else "end")
+    return route
+
+def _knowledge_message(found: str) -> dict:
+    if not found:
+        return {"messages": [], "rag_ticket": None}
+    return {"messages": [HumanMessage(content=f"[검색된 지식]\n{found}")], "rag_ticket": None}
+
+@timed("retrieve")
+def retrieve(state: AgentState):
+    pending = discard_speculative(state.get("rag_ticket"))
+    try:
+        found = pending.result() if pending is not None else rag_tools.rag_search(rag_query(state), RAG_TOP_K)
+    except Exception as e:
+        print(f"⚠️ [RAG] 검색 실패: {e}")
+        stage_errors.inc(stage="retrieve")
+        found = ""
+    return _knowledge_message(found)
+
+@timed("retrieve")
+async def aretrieve(state: AgentState):
+    pending = discard_speculative(state.get("rag_ticket"))
+    try:
+        if pending is not None:
+            found = await asyncio.wrap_future(pending)
+        else:
+            found = await asyncio.to_thread(rag_tools.rag_search, rag_query(state), RAG_TOP_K)
+    except Exception as e:
+        print(f"⚠️ [RAG] 검색 실패: {e}")
+        stage_errors.inc(stage="retrieve")
+        found = ""
+    return _knowledge_message(found)
 
+def _final_messages(state: AgentState) -> list:
+    return [system_message(state, "final")] + _conversation(state)
+
+# --- 토큰 사용량 (프롬프트 캐시 확인용) ---
+_usage_lock = threading.Lock()
+_usage: Dict[str, Dict[str, int]] = {}
+
+def record_usage(stage: str, message) -> None:
+    """응답의 usage_metadata 에서 입력 토큰을 캐시 읽기/캐시 쓰기/비캐시로 나눠 누적한다."""
+    usage = getattr(message, "usage_metadata", None) or {}
+    if not usage:
+        return
+    record_tokens(stage, usage)
+    details = usage.get("input_token_details") or {}
+    cache_read = int(details.get("cache_read") or 0)
+    cache_creation = int(details.get("cache_creation") or 0)
+    with _usage_lock:
+        totals = _usage.setdefault(stage, {"calls": 0, "input_tokens": 0, "cache_read": 0,
+                                           "cache_creation": 0, "uncached": 0, "output_tokens": 0})
+        totals["calls"] += 1
+        totals["input_tokens"] += int(usage.get("input_tokens") or 0)
+        totals["cache_read"] += cache_read
+        totals["cache_creation"] += cache_creation
+        totals["uncached"] += max(0, int(usage.get("input_tokens") or 0) - cache_read - cache_creation)
+        totals["output_tokens"] += int(usage.get("output_tokens") or 0)
+
+def usage_stats() -> dict:
+    with _usage_lock:
+        stages = {stage: dict(totals) for stage, totals in _usage.items()}
+    for totals in stages.values():
+        totals["cache_hit_ratio"] = round(totals["cache_read"] / totals["input_tokens"], 4) if totals["input_tokens"] else 0.0
+    return {"prompt_cache": PROMPT_CACHE, "stages": stages}
+
+@timed("final")
 def agent_final(state: AgentState):
-    persona = state.get("persona", "junior")
-    mode = state.get("input_mode", "log")
-    
-    base_prompt = PROMPTS.get((persona, mode), "분석가 페르소나로 동작하세요.")
-    system_prompt = (base_prompt + "\n\n검색된 지식을 바탕으로 최종 답변을 작성하세요. 추가 도구 호출은 중단하세요.").strip()
-    
-    msgs = state.get("messages", [])
-    
-    # 모든 메시지의 content에서 trailing whitespace 제거
-    formatted_msgs = [SystemMessage(content=system_prompt)] + msgs
-    for m in formatted_msgs:
-        if hasattr(m, "content") and isinstance(m.content, str):
-            m.content = m.content.strip()
+    resp = get_llm_with_tools().invoke(_final_messages(state))
+    record_usage("final", resp)
+    return {"messages": [resp], "served_by": "final"}
 
-    resp = llm_with_tools.invoke(formatted_msgs)
-    return {"messages": [resp]}
+@timed("final")
+async def aagent_final(state: AgentState):
+    resp = await get_llm_with_tools().ainvoke(_final_messages(state))
+    record_usage("final", resp)
+    return {"messages": [resp], "served_by": "final"}
 
 # 그래프 정의
-graph = StateGraph(AgentState)
-graph.add_node("draft", agent_draft)
-graph.add_node("tools", tool_node)
-graph.add_node("final", agent_final)
+def build_graph() -> StateGraph:
+    graph = StateGraph(AgentState)
+    graph.add_node("fast_path", fast_path)
+    # 노드마다 sync/async 구현을 함께 등록: invoke()는 sync, ainvoke()/astream()은 async 경로를 탄다.
+    graph.add_node("draft", RunnableLambda(agent_draft, afunc=aagent_draft))
+    # tools: 초안에는 tool_call 이 없으므로 ToolNode 대신 직접 검색해서 결과를 메시지로 넣는다.
+    graph.add_node("tools", RunnableLambda(retrieve, afunc=aretrieve))
+    graph.add_node("final", RunnableLambda(agent_final, afunc=aagent_final))
 
-graph.add_edge(START, "draft")
-graph.add_conditional_edges("draft", need_rag, {"tools": "tools", END: END})
-graph.add_edge("tools", "final")
-graph.add_edge("final", END)
+    graph.add_edge(START, "fast_path")
+    graph.add_conditional_edges("fast_path", after_fast_path, {"draft": "draft", END: END})
+    graph.add_conditional_edges("draft", need_rag, {"tools": "tools", END: END})
+    graph.add_edge("tools", "final")
+    graph.add_edge("final", END)
+    return graph
+
+_FACTORIES = {
+    "llm": lambda: _make_llm().bind_tools(tools, tool_choice=NO_TOOL_CALLS),
+    # final 용. draft 와 같은 바인딩을 그대로 쓰고, 전역을 따로 두는 것은 단계별로 바꿔 끼우기(녹화/테스트) 위해서다
+    "llm_with_tools": lambda: get_llm(),
+    "graph": build_graph,
+    "app": lambda: _lazy("graph").compile(),
+}
 
-app = graph.compile()
+def warmup() -> None:
+    """LLM 클라이언트 생성과 그래프 컴파일을 미리 해 둔다. (main.py lifespan 에서 호출)"""
+    get_llm_with_tools()
+    get_app()
 
 if __name__ == "__main__":
     # 테스트 시에도 불필요한 공백이 포함되지 않도록 strip() 적용
@@ -126,7 +361,7 @@ showUserName();
         "code_text": ""
     }
 
-    out = app.invoke(test_state)
+    out = get_app().invoke(test_state)
     print("\n=== OUTPUT ===")
     if out["messages"]:
         print(out["messages"][-1].content)
\ No newline at end of file
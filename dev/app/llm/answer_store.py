@@ -0,0 +1,233 @@
+"""
+answer_store.py
+
+검증된 답변 저장소 (fast path).
+
+자주 들어오는 에러는 매번 LLM에 물을 필요가 없다. 에러 시그니처(fingerprint.signature)별로
+검증된 cause/solution/prevention 을 JSON 파일(VETTED_ANSWERS_PATH)에 두고,
+그래프의 첫 노드(fast_path)가 여기서 찾으면 LLM 호출 없이 바로 답한다.
+
+- 확실한 경우에만 답한다: 예외 헤더가 있는 로그이고, 시그니처와 canonical 문자열이 모두 같으며,
+  저장된 confidence 가 FAST_PATH_MIN_CONFIDENCE 이상일 때
+- 페르소나별 문구가 있으면 그것을, 없으면 senior 는 번호 항목 앞부분만 추려서(adapt) 돌려준다.
+- FAST_PATH=0 이면 끈다.
+
+저장소 만들기 (seed):
+  python -m dev.app.llm.answer_store seed --local data/local_index        # 로컬 스냅샷의 user_contribution
+  python -m dev.app.llm.answer_store seed                                   # Pinecone 네임스페이스
+  python -m dev.app.llm.answer_store seed --jsonl data/kb_answers.jsonl     # KB 런북에서 뽑은 {"error", "cause", ...}
+  python -m dev.app.llm.answer_store vet <id> [<id> ...] [--local PATH]     # 검토한 기여에 vetted 표시
+user_contribution 은 사람이 검토해 vetted 로 표시했고, /save/result 가 남긴 error_sample(마스킹된 로그)이 있으며
+merged_count(compact.py 가 합친, 같은 답을 낸 기여 수)가 --min-merged 이상인 것만 쓴다.
+(로그가 비슷한 기여가 많다는 것만으로는 답이 맞다는 근거가 되지 않으므로 검토 전 기여는 fast path 에 올리지 않는다)
+다시 마스킹했을 때 바뀌는 필드가 있는 기여(마스킹 전에 저장된 옛 기록 등)는 다른 사용자에게
+원문이 나갈 수 있으므로 건너뛴다.
+"""
+import argparse
+import json
+import os
+import re
+import threading
+from typing import Dict, Iterable, Optional
+
+from dev.app.fingerprint import fingerprint
+from dev.app.masking import MaskingManager
+from dev.app.response_parser import FIELDS
+
+STORE_VERSION = 1
+MIN_CONFIDENCE = float(os.getenv("FAST_PATH_MIN_CONFIDENCE", "0.8"))
+SENIOR_MAX_ITEMS = 3
+
+_ITEM = re.compile(r'^\s*\d+[.)]\s')
+_SENTENCE_END = re.compile(r'(?<=[.!?다요])\s+')
+
+
+def _condense(text: str, max_items: int = SENIOR_MAX_ITEMS) -> str:
+    """번호 항목이 있으면 앞의 max_items 개 항목의 첫 줄만, 없으면 앞 두 문장만 남긴다."""
+    lines = [line for line in text.splitlines() if line.strip()]
+    items = [line.strip() for line in lines if _ITEM.match(line)]
+    if items:
+        return "\n".join(items[:max_items])
+    sentences = _SENTENCE_END.split(text.strip())
+    return " ".join(sentences[:2])
+
+
+def adapt(answer: dict, persona: str) -> dict:
+    variant = (answer.get("personas") or {}).get(persona) or {}
+    if variant:
+        return {f: variant.get(f) or answer.get(f, "") for f in FIELDS}
+    if persona == "senior":
+        return {f: _condense(answer.get(f, "")) for f in FIELDS}
+    return {f: answer.get(f, "") for f in FIELDS}
+
+
+class AnswerStore:
+    def __init__(self, answers: Optional[Dict[str, dict]] = None, min_confidence: float = MIN_CONFIDENCE):
+        self.answers: Dict[str, dict] = dict(answers or {})
+        self.min_confidence = min_confidence
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self.answers)
+
+    @classmethod
+    def load(cls, path: str, **kw) -> "AnswerStore":
+        if not path or not os.path.exists(path):
+            return cls(**kw)
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return cls(data.get("answers", {}), **kw)
+
+    def save(self, path: str) -> None:
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"version": STORE_VERSION, "answers": self.answers}, f, ensure_ascii=False, indent=1)
+        os.replace(tmp, path)
+
+    def add(self, error_text: str, answer: dict, source: str, confidence: float = 1.0) -> Optional[str]:
+        """에러 텍스트의 시그니처로 답변을 등록한다. 예외 헤더가 없거나 필드가 비어 있으면 건너뛴다."""
+        fp = fingerprint(error_text)
+        if not fp.exception or not all((answer.get(f) or "").strip() for f in FIELDS):
+            return None
+        current = self.answers.get(fp.signature)
+        if current and current.get("confidence", 0) > confidence:
+            return fp.signature
+        self.answers[fp.signature] = {
+            "canonical": fp.canonical,
+            **{f: answer[f].strip() for f in FIELDS},
+            **({"personas": answer["personas"]} if answer.get("personas") else {}),
+            "source": source,
+            "confidence": confidence,
+        }
+        return fp.signature
+
+    def match(self, error_text: str) -> Optional[dict]:
+        """확실한 경우에만 저장된 답변을 돌려준다."""
+        if not self.answers or not error_text:
+            return None
+        fp = fingerprint(error_text)
+        answer = self.answers.get(fp.signature) if fp.exception else None
+        if answer is None or answer.get("canonical") != fp.canonical \
+                or answer.get("confidence", 0) < self.min_confidence:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return answer
+
+    def stats(self) -> dict:
+        return {"answers": len(self), "hits": self.hits, "misses": self.misses,
+                "min_confidence": self.min_confidence}
+
+
+_store: Optional[AnswerStore] = None
+_store_lock = threading.Lock()
+
+
+def get_answer_store() -> Optional[AnswerStore]:
+    """VETTED_ANSWERS_PATH(기본 data/vetted_answers.json) 를 한 번만 읽는다. FAST_PATH=0 이면 None."""
+    global _store
+    if os.getenv("FAST_PATH", "1") == "0":
+        return None
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = AnswerStore.load(os.getenv("VETTED_ANSWERS_PATH", "data/vetted_answers.json"))
+    return _store
+
+
+# --- seed ---
+
+def contribution_confidence(merged_count: int, min_merged: int) -> float:
+    # 여러 사람이 같은 답을 저장했을수록 신뢰. min_merged 에서 0.8, 그 이후 완만히 1.0 으로
+    return min(1.0, 0.8 + 0.05 * (merged_count - min_merged))
+
+
+def unmasked_fields(md: dict) -> list:
+    """마스킹 규칙에 아직 걸리는 값이 남아 있는 필드 이름들."""
+    masker = MaskingManager()
+    return [f for f in ("error_sample", *FIELDS) if md.get(f) and masker.mask(md[f]) != md[f]]
+
+
+def seed_from_contributions(store: AnswerStore, records: Iterable[dict], min_merged: int = 2) -> int:
+    added = 0
+    for md in records:
+        if md.get("doc_type") != "user_contribution" or not md.get("error_sample") or not md.get("vetted"):
+            continue
+        merged = int(md.get("merged_count", 1))
+        if merged < min_merged:
+            continue
+        leaked = unmasked_fields(md)
+        if leaked:
+            print(f"⚠️ [seed] 마스킹되지 않은 기여 건너뜀: {', '.join(leaked)}")
+            continue
+        if store.add(md["error_sample"], md, f"user_contribution x{merged}",
+                     contribution_confidence(merged, min_merged)):
+            added += 1
+    return added
+
+
+def vet_contributions(index, ids, namespace: Optional[str] = None) -> None:
+    """검토를 마친 기여에 vetted 표시를 한다. (Pinecone Index 또는 LocalIndex)"""
+    for id_ in ids:
+        index.update(id=id_, set_metadata={"vetted": True}, namespace=namespace)
+
+
+def seed_from_jsonl(store: AnswerStore, path: str) -> int:
+    added = 0
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            row = json.loads(line)
+            if store.add(row["error"], row, row.get("source", "kb"), float(row.get("confidence", 1.0))):
+                added += 1
+    return added
+
+
+def main():
+    parser = argparse.ArgumentParser(description="fast path 검증 답변 저장소")
+    sub = parser.add_subparsers(dest="command", required=True)
+    seed = sub.add_parser("seed", help="user_contribution / KB 답변으로 저장소를 채운다")
+    seed.add_argument("--out", default=os.getenv("VETTED_ANSWERS_PATH", "data/vetted_answers.json"))
+    seed.add_argument("--local", metavar="PATH", help="Pinecone 대신 로컬 인덱스 스냅샷에서 읽기")
+    seed.add_argument("--namespace", default=os.getenv("PINECONE_NAMESPACE", "dev"))
+    seed.add_argument("--jsonl", help="KB 런북에서 정리한 {error, cause, solution, prevention} JSONL")
+    seed.add_argument("--min-merged", type=int, default=2, help="이 수 이상 합쳐진 기여만 사용")
+    vet = sub.add_parser("vet", help="검토를 마친 user_contribution 에 vetted 표시")
+    vet.add_argument("ids", nargs="+")
+    vet.add_argument("--local", metavar="PATH", help="Pinecone 대신 로컬 인덱스 스냅샷에 표시")
+    vet.add_argument("--namespace", default=os.getenv("PINECONE_NAMESPACE", "dev"))
+    args = parser.parse_args()
+
+    if args.command == "vet":
+        if args.local:
+            from dev.app.llm.local_index import LocalIndex
+            local = LocalIndex.load(args.local, mmap=False)
+            vet_contributions(local, args.ids)
+            local.save(args.local)
+        else:
+            from dev.app.llm.tools import get_pinecone_index
+            vet_contributions(get_pinecone_index(), args.ids, args.namespace)
+        print(f"[vet] {len(args.ids)} contributions marked vetted")
+        return
+
+    store = AnswerStore.load(args.out)
+    before = len(store)
+    if args.jsonl:
+        print(f"[seed] jsonl +{seed_from_jsonl(store, args.jsonl)}")
+    if args.local or not args.jsonl:
+        from dev.app.llm.local_index import LocalIndex, sync_from_pinecone
+        if args.local:
+            local = LocalIndex.load(args.local)
+        else:
+            from dev.app.llm.tools import get_pinecone_index
+            local = sync_from_pinecone(get_pinecone_index(), args.namespace)
+        print(f"[seed] contributions +{seed_from_contributions(store, local.metadata, args.min_merged)}")
+    store.save(args.out)
+    print(f"[done] {before} -> {len(store)} answers -> {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+"""
+compact.py
+
+user_contribution 벡터 중복 정리 (오프라인 작업).
+
+같은 에러에 대한 저장 결과가 쌓이면 인덱스가 커지고 rag_search 의 top_k 를 비슷한 결과가 차지한다.
+- doc_type == "user_contribution" 벡터를 모두 읽어 코사인 유사도 threshold 이상인 것끼리 묶는다.
+  (leader 방식: 대표와 직접 비슷한 것만 묶어서, A~B~C 식으로 주제가 번져 가는 연쇄 병합을 막는다)
+- 묶음마다 대표(다른 멤버와의 유사도 합이 가장 큰 벡터)를 남기고 metadata 를 합친다.
+  로그가 비슷해도 답(cause/solution)이 대표와 다른 멤버는 합치지 않고 그대로 남긴다. (answers_agree)
+  merged_count: 대표와 같은 답을 낸 기여 수 (이전 정리 결과 누적), personas: 저장한 페르소나 목록
+- 합쳐진 나머지 ID는 삭제한다.
+
+실행:
+  python -m dev.app.llm.compact --dry-run                        # Pinecone, 보고서만
+  python -m dev.app.llm.compact --threshold 0.95                 # Pinecone 에 적용
+  python -m dev.app.llm.compact --local data/local_index         # 로컬 스냅샷에 적용 (대역/리허설용)
+"""
+import argparse
+import json
+import os
+import re
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+import numpy as np
+
+from dev.app.llm.ingest import DELETE_BATCH, _batches, with_backoff
+from dev.app.llm.local_index import LocalIndex, sync_from_pinecone
+
+DOC_TYPE = "user_contribution"
+DEFAULT_THRESHOLD = float(os.getenv("COMPACT_THRESHOLD", "0.95"))
+BLOCK = 1024
+# 대표와 답이 "같다"고 볼 cause+solution 단어 집합 Jaccard 유사도
+ANSWER_AGREEMENT = float(os.getenv("COMPACT_ANSWER_AGREEMENT", "0.5"))
+
+_WORD = re.compile(r'\w+')
+
+
+@dataclass
+class Cluster:
+    canonical: str
+    members: List[str]
+    min_score: float
+    metadata: dict = field(default_factory=dict)   # 대표에 쓸 합쳐진 metadata
+    conflicts: List[str] = field(default_factory=list)  # 로그는 비슷하지만 답이 달라 남겨 둔 ID
+
+    @property
+    def duplicates(self) -> List[str]:
+        return [m for m in self.members if m != self.canonical]
+
+
+@dataclass
+class CompactionPlan:
+    scanned: int
+    threshold: float
+    clusters: List[Cluster]
+
+    @property
+    def to_delete(self) -> List[str]:
+        return [d for c in self.clusters for d in c.duplicates]
+
+    def summary(self) -> dict:
+        return {
+            "scanned": self.scanned,
+            "threshold": self.threshold,
+            "clusters": len(self.clusters),
+            "delete": len(self.to_delete),
+            "remaining": self.scanned - len(self.to_delete),
+        }
+
+
+def contributions(local: LocalIndex):
+    """(ids, 정규화된 float32 행렬, metadata) — user_contribution 만."""
+    snap = local.snapshot()
+    rows = [i for i, md in enumerate(snap.metadata) if md.get("doc_type") == DOC_TYPE]
+    matrix = snap.rows(rows) if rows else np.zeros((0, local.dim), dtype=np.float32)
+    return [snap.ids[i] for i in rows], matrix, [snap.metadata[i] for i in rows]
+
+
+def answer_words(md: dict) -> set:
+    return set(_WORD.findall(f"{md.get('cause') or ''} {md.get('solution') or ''}".lower()))
+
+
+def answers_agree(a: dict, b: dict, threshold: float = ANSWER_AGREEMENT) -> bool:
+    """두 기여의 cause/solution 이 같은 답인지. 한쪽이라도 비어 있으면 같다고 보지 않는다."""
+    wa, wb = answer_words(a), answer_words(b)
+    return bool(wa and wb) and len(wa & wb) / len(wa | wb) >= threshold
+
+
+def merge_metadata(canonical: dict, members: List[dict]) -> dict:
+    """members 는 대표를 포함해 대표와 답이 같은 기여들."""
+    personas = set()
+    for md in members:
+        personas.update(md.get("personas") or [])
+        if md.get("persona"):
+            personas.add(md["persona"])
+    merged = {
+        "merged_count": sum(int(md.get("merged_count", 1)) for md in members),
+        "personas": sorted(personas),
+    }
+    # 대표의 원인/해결이 비어 있으면 다른 멤버 것으로 채운다
+    for key in ("cause", "solution"):
+        if not canonical.get(key):
+            merged[key] = next((md[key] for md in members if md.get(key)), "")
+    return merged
+
+
+def plan_compaction(local: LocalIndex, threshold: float = DEFAULT_THRESHOLD) -> CompactionPlan:
+    ids, matrix, metadata = contributions(local)
+    n = len(ids)
+    # 이미 합쳐진(merged_count 큰) 기록이 먼저 대표 후보가 되도록 순서를 정한다
+    order = sorted(range(n), key=lambda i: -int(metadata[i].get("merged_count", 1)))
+    assigned = np.zeros(n, dtype=bool)
+    clusters = []
+    for start in range(0, n, BLOCK):
+        block = order[start:start + BLOCK]
+        sims = matrix[block] @ matrix.T
+        for row, leader in enumerate(block):
+            if assigned[leader]:
+                continue
+            hits = np.flatnonzero((sims[row] >= threshold) & ~assigned)
+            assigned[hits] = True
+            assigned[leader] = True
+            if len(hits) < 2:
+                continue
+            sub = matrix[hits] @ matrix[hits].T
+            # 대표: 답이 있는 기여 중 가장 중심에 가까운 것 (모두 비었으면 그냥 가장 중심)
+            centrality = sub.sum(axis=1) + np.array([0 if answer_words(metadata[h]) else -len(hits) for h in hits])
+            canonical = int(hits[int(np.argmax(centrality))])
+            agree = [h == canonical or answers_agree(metadata[canonical], metadata[h]) for h in hits]
+            members = [int(h) for h, ok in zip(hits, agree) if ok]
+            conflicts = [int(h) for h, ok in zip(hits, agree) if not ok]
+            # 답이 다른 기여는 이번 묶음에서 빼고, 뒤의 대표 후보가 다시 묶을 수 있게 한다
+            assigned[conflicts] = False
+            if len(members) < 2:
+                continue
+            clusters.append(Cluster(
+                canonical=ids[canonical],
+                members=[ids[m] for m in members],
+                min_score=float(sub[np.ix_(agree, agree)].min()),
+                metadata=merge_metadata(metadata[canonical], [metadata[m] for m in members]),
+                conflicts=[ids[c] for c in conflicts],
+            ))
+    clusters.sort(key=lambda c: -len(c.members))
+    return CompactionPlan(scanned=n, threshold=threshold, clusters=clusters)
+
+
+def apply_compaction(plan: CompactionPlan, index, namespace: Optional[str] = None, log=print) -> None:
+    """대표 metadata 를 먼저 갱신하고 나머지를 지운다. (중간에 끊겨도 기여가 사라지지 않는 순서)"""
+    for cluster in plan.clusters:
+        with_backoff(lambda: index.update(id=cluster.canonical, set_metadata=cluster.metadata, namespace=namespace))
+    for batch in _batches(plan.to_delete, DELETE_BATCH):
+        with_backoff(lambda: index.delete(ids=batch, namespace=namespace))
+        log(f"[delete] -{len(batch)}")
+
+
+def print_report(plan: CompactionPlan, local: LocalIndex, limit: int = 20) -> None:
+    print(f"[compact] {json.dumps(plan.summary(), ensure_ascii=False)}")
+    by_id = dict(zip(local.ids, local.metadata))
+    for cluster in plan.clusters[:limit]:
+        cause = (by_id.get(cluster.canonical, {}).get("cause") or "").replace("\n", " ")[:80]
+        conflicts = f" [{len(cluster.conflicts)} conflicting kept]" if cluster.conflicts else ""
+        print(f"  x{len(cluster.members):<3} keep {cluster.canonical[:12]} (min sim {cluster.min_score:.3f}) {cause}{conflicts}")
+    if len(plan.clusters) > limit:
+        print(f"  ... {len(plan.clusters) - limit} more clusters")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="user_contribution 근사 중복 정리")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="코사인 유사도 기준")
+    parser.add_argument("--dry-run", action="store_true", help="보고서만 출력")
+    parser.add_argument("--local", metavar="PATH", help="Pinecone 대신 로컬 인덱스 스냅샷을 대상으로 실행")
+    parser.add_argument("--namespace", default=os.getenv("PINECONE_NAMESPACE", "dev"))
+    args = parser.parse_args()
+
+    if args.local:
+        target = LocalIndex.load(args.local, mmap=False)
+        local = target
+    else:
+        from dev.app.llm.tools import get_pinecone_index
+        target = get_pinecone_index()
+        local = sync_from_pinecone(target, args.namespace, dtype="float32")
+
+    plan = plan_compaction(local, args.threshold)
+    print_report(plan, local)
+    if args.dry_run or not plan.clusters:
+        return
+
+    apply_compaction(plan, target, namespace=args.namespace)
+    if args.local:
+        target.save(args.local)
+    print(f"[done] kept {len(plan.clusters)} canonical records, deleted {len(plan.to_delete)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,217 @@
+"""
+embedding_cache.py
+
+임베딩 캐시. 같은 문자열을 다시 임베딩할 때 Bedrock 왕복(~100-300ms)을 건너뛴다.
+
+- 키: sha256(모델 ID + query/document 구분 + 텍스트). 모델이 바뀌면 자연히 다른 키가 된다.
+  (Cohere 등은 질의/문서 임베딩이 다르므로 구분해서 저장)
+- 메모리 LRU (EMBEDDING_CACHE_SIZE, 0이면 비활성) + 선택적 SQLite 파일 (EMBEDDING_CACHE_PATH)
+  벡터는 메모리에서는 array('f'), 파일에서는 float32 BLOB으로 저장한다. (1024차원 기준 항목당 4 KB,
+  list[float] 로 두면 ~33 KB) 호출자에게는 매번 새 list 를 돌려주므로 캐시된 값을 바꿀 수 없다.
+- CachedEmbeddings 는 langchain Embeddings 인터페이스를 그대로 따르므로
+  get_embedder() 를 쓰는 곳(rag_search, /save/result)은 수정 없이 캐시를 탄다.
+- embed_documents 는 캐시에 없는 텍스트만 모아 한 번에 요청한다.
+"""
+import hashlib
+import os
+import sqlite3
+import threading
+from array import array
+from collections import OrderedDict
+from typing import Dict, List, Optional, Sequence
+
+from langchain_core.embeddings import Embeddings
+
+
+def embedding_key(model_id: str, text: str, kind: str = "query") -> str:
+    return hashlib.sha256(f"{model_id}\0{kind}\0{text}".encode("utf-8")).hexdigest()
+
+
+def as_vector(values: Sequence[float]) -> array:
+    """float32 array 로 바꾼다. 이미 array('f') 면 그대로 쓴다."""
+    return values if isinstance(values, array) and values.typecode == "f" else array("f", values)
+
+
+class _SqliteVectors:
+    """key -> float32 벡터. 오래된 행부터 지워 disk_max_entries 를 유지한다."""
+
+    PRUNE_EVERY = 256
+
+    def __init__(self, path: str, max_entries: int):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._inserts = 0
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embedding_cache (key TEXT PRIMARY KEY, vector BLOB NOT NULL)"
+        )
+        self._conn.commit()
+
+    def get_many(self, keys: List[str]) -> Dict[str, array]:
+        if not keys:
+            return {}
+        found = {}
+        with self._lock:
+            # SQLite 바인딩 변수 개수 제한(기본 999)을 넘지 않게 나눠서 조회
+            for i in range(0, len(keys), 500):
+                part = keys[i:i + 500]
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embedding_cache WHERE key IN ({','.join('?' * len(part))})", part
+                ).fetchall()
+                for key, blob in rows:
+                    vec = array("f")
+                    vec.frombytes(blob)
+                    found[key] = vec
+        return found
+
+    def set_many(self, items: Dict[str, array]) -> None:
+        if not items:
+            return
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embedding_cache (key, vector) VALUES (?, ?)",
+                [(k, v.tobytes()) for k, v in items.items()],
+            )
+            self._inserts += len(items)
+            if self._inserts >= self.PRUNE_EVERY:
+                self._inserts = 0
+                self._conn.execute(
+                    "DELETE FROM embedding_cache WHERE rowid <= (SELECT MAX(rowid) FROM embedding_cache) - ?",
+                    (self.max_entries,),
+                )
+            self._conn.commit()
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM embedding_cache").fetchone()[0]
+
+
+class EmbeddingCache:
+    """모델과 무관한 저장소 부분. 여러 CachedEmbeddings 가 공유할 수 있다."""
+
+    def __init__(self, max_entries: int = 4096, path: Optional[str] = None,
+                 disk_max_entries: Optional[int] = None):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, array]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._disk = _SqliteVectors(path, disk_max_entries or max(max_entries, 1) * 25) if path else None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    def get_many(self, keys: List[str]) -> Dict[str, array]:
+        """key -> 캐시된 float32 벡터. 저장된 객체 그대로이므로 호출자는 바꾸지 말고 tolist() 로 복사해 쓴다."""
+        if not self.enabled:
+            return {}
+        found = {}
+        with self._lock:
+            for key in keys:
+                vec = self._entries.get(key)
+                if vec is not None:
+                    self._entries.move_to_end(key)
+                    found[key] = vec
+
+        rest = [k for k in keys if k not in found]
+        from_disk = self._disk.get_many(rest) if (self._disk and rest) else {}
+        with self._lock:
+            for key, vec in from_disk.items():
+                self._put(key, vec)
+            found.update(from_disk)
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+        return found
+
+    def set_many(self, items: Dict[str, Sequence[float]]) -> None:
+        if not self.enabled or not items:
+            return
+        items = {k: as_vector(v) for k, v in items.items()}
+        with self._lock:
+            for key, vec in items.items():
+                self._put(key, vec)
+        if self._disk:
+            self._disk.set_many(items)
+
+    def _put(self, key: str, vec: array) -> None:
+        self._entries[key] = vec
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        with self._lock:
+            vector_bytes = sum(v.itemsize * len(v) for v in self._entries.values())
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "vector_bytes": vector_bytes,
+            "persistent": self._disk is not None,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": round(self.hits / total, 4) if total else 0.0,
+        }
+
+
+class CachedEmbeddings(Embeddings):
+    def __init__(self, inner: Embeddings, model_id: str, cache: EmbeddingCache):
+        self.inner = inner
+        self.model_id = model_id
+        self.cache = cache
+
+    def _lookup(self, texts: List[str], kind: str):
+        keys = [embedding_key(self.model_id, t, kind) for t in texts]
+        found = self.cache.get_many(list(dict.fromkeys(keys)))
+        # 캐시에 없는 텍스트 (중복 제거, 순서 유지)
+        missing: Dict[str, str] = {}
+        for key, text in zip(keys, texts):
+            if key not in found and key not in missing:
+                missing[key] = text
+        return keys, found, missing
+
+    def _store(self, found: Dict[str, array], missing: Dict[str, str], vectors: List[List[float]]):
+        # 새로 받은 벡터도 float32 로 맞춰 두어야 캐시 적중 때와 같은 값이 나간다
+        fresh = {k: as_vector(v) for k, v in zip(missing.keys(), vectors)}
+        self.cache.set_many(fresh)
+        found.update(fresh)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys, found, missing = self._lookup(texts, "document")
+        if missing:
+            self._store(found, missing, self.inner.embed_documents(list(missing.values())))
+        return [found[k].tolist() for k in keys]
+
+    def embed_query(self, text: str) -> List[float]:
+        keys, found, missing = self._lookup([text], "query")
+        if missing:
+            self._store(found, missing, [self.inner.embed_query(text)])
+        return found[keys[0]].tolist()
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys, found, missing = self._lookup(texts, "document")
+        if missing:
+            self._store(found, missing, await self.inner.aembed_documents(list(missing.values())))
+        return [found[k].tolist() for k in keys]
+
+    async def aembed_query(self, text: str) -> List[float]:
+        keys, found, missing = self._lookup([text], "query")
+        if missing:
+            self._store(found, missing, [await self.inner.aembed_query(text)])
+        return found[keys[0]].tolist()
+
+
+def embedding_cache_from_env() -> EmbeddingCache:
+    return EmbeddingCache(
+        max_entries=int(os.getenv("EMBEDDING_CACHE_SIZE", "4096")),
+        path=os.getenv("EMBEDDING_CACHE_PATH") or None,
+    )
@@ -0,0 +1,402 @@
+"""
+ingest.py
+
+KB 문서 증분 적재 로직. (rag_store.py 가 CLI로 사용)
+
+manifest(JSON)에 파일별 내용 해시와 청크별 ID/해시를 기록해 두고, 다음 실행에서는
+- 내용이 같은 파일은 분할/임베딩하지 않는다.
+- 바뀐 파일은 새로 생긴 청크만 임베딩하고, 위치만 바뀐 청크는 metadata(chunk_index)만 고친다.
+- 사라진 청크/파일의 ID는 인덱스에서 지운다.
+
+청크 ID는 sha1(source | 청크 해시 | 같은 파일 안 동일 청크 순번)으로 내용 기반이다.
+(이전의 source|chunk_index|text 방식은 앞에 문단 하나만 끼어도 뒤 청크 ID가 모두 바뀌었다)
+
+분할 설정이나 임베딩 모델이 바뀌면 manifest 가 무효화되어 전체를 다시 적재한다.
+
+적용(apply_plan)은 파이프라인으로 동작한다.
+- 임베딩할 청크를 파일 경계와 상관없이 INGEST_EMBED_BATCH 개씩 묶어 INGEST_EMBED_WORKERS 개 스레드가 동시에 임베딩
+- 임베딩이 끝난 벡터는 UPSERT_BATCH 개가 모이는 대로 백그라운드 스레드가 업서트 (다음 배치 임베딩과 겹침)
+- 스로틀링/일시 오류는 지수 백오프(+jitter)로 재시도
+- 진행률과 처리량(chunks/s)을 주기적으로 출력
+
+문서는 load_docs() 제너레이터로 하나씩 읽고(.md/.txt/.rst/.log, .gz, 하위 디렉터리 포함),
+iter_plans() 가 INGEST_WINDOW 개 청크 단위의 부분 계획으로 나눠 주므로
+메모리는 코퍼스 크기가 아니라 창 크기에 비례한다. (manifest 의 해시 목록은 예외)
+"""
+import gzip
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+CHUNK_SIZE = 1500       # 대략 400~800 tokens 수준(경험치)
+CHUNK_OVERLAP = 200
+METADATA_TEXT_LIMIT = 1500
+UPSERT_BATCH = 100
+DELETE_BATCH = 1000
+MANIFEST_VERSION = 1
+
+# 한 번의 embed_documents 요청에 넣을 청크 수 (프로바이더 배치 한도에 맞춤)와 동시 임베딩 수
+EMBED_BATCH = int(os.getenv("INGEST_EMBED_BATCH", "64"))
+EMBED_WORKERS = int(os.getenv("INGEST_EMBED_WORKERS", "4"))
+# 부분 계획 하나에 담을 임베딩 대상 청크 수
+INGEST_WINDOW = int(os.getenv("INGEST_WINDOW", str(EMBED_BATCH * EMBED_WORKERS * 4)))
+MAX_RETRIES = 6
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 20.0
+PROGRESS_INTERVAL = 5.0
+
+
+DOC_EXTENSIONS = (".md", ".txt", ".rst", ".log")
+
+
+def iter_doc_paths(folder: str, extensions: Tuple[str, ...] = DOC_EXTENSIONS) -> Iterator[str]:
+    """folder 아래(하위 디렉터리 포함)의 문서 경로. 같은 확장자의 .gz 도 포함한다. 순서는 경로 정렬 순."""
+    for root, dirs, files in os.walk(folder):
+        dirs[:] = sorted(d for d in dirs if not d.startswith("."))
+        for name in sorted(files):
+            base = name[:-3] if name.endswith(".gz") else name
+            if base.lower().endswith(extensions):
+                yield os.path.join(root, name)
+
+
+def read_doc(path: str) -> str:
+    if path.endswith(".gz"):
+        with gzip.open(path, "rt", encoding="utf-8", errors="replace") as f:
+            return f.read()
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        return f.read()
+
+
+def load_docs(folder: str, extensions: Tuple[str, ...] = DOC_EXTENSIONS) -> Iterator[Tuple[str, str]]:
+    """(source, text) 를 하나씩 읽어 내보낸다. 코퍼스 전체를 메모리에 올리지 않는다."""
+    for path in iter_doc_paths(folder, extensions):
+        try:
+            yield path, read_doc(path)
+        except (OSError, EOFError) as e:
+            print(f"[load] skip {path}: {e}")
+
+
+def make_splitter():
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+    return RecursiveCharacterTextSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
+
+
+def sha1(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+def legacy_chunk_id(source: str, chunk_index: int, text: str) -> str:
+    """manifest 도입 이전 rag_store.make_id 와 같은 ID."""
+    return sha1(f"{source}|{chunk_index}|{text}")
+
+
+def chunk_id(source: str, chunk_hash: str, occurrence: int = 0) -> str:
+    return sha1(f"{source}|{chunk_hash}|{occurrence}")
+
+
+def chunk_metadata(source: str, chunk_index: int, text: str) -> dict:
+    return {
+        "source": source,
+        "chunk_index": chunk_index,
+        # 너무 길면 잘라서 넣어(메타데이터 과다 방지)
+        "text": text[:METADATA_TEXT_LIMIT],
+        "doc_type": "kb_md",
+    }
+
+
+@dataclass
+class Chunk:
+    id: str
+    source: str
+    index: int
+    text: str
+
+    @property
+    def metadata(self) -> dict:
+        return chunk_metadata(self.source, self.index, self.text)
+
+
+@dataclass
+class IngestPlan:
+    new_files: List[str] = field(default_factory=list)
+    changed_files: List[str] = field(default_factory=list)
+    unchanged_files: List[str] = field(default_factory=list)
+    removed_files: List[str] = field(default_factory=list)
+    to_embed: List[Chunk] = field(default_factory=list)
+    to_move: List[Chunk] = field(default_factory=list)      # 내용은 같고 chunk_index만 바뀐 청크
+    to_delete: List[str] = field(default_factory=list)
+    kept_chunks: int = 0
+    manifest: dict = field(default_factory=dict)            # 적용 후 저장할 manifest
+
+    @property
+    def empty(self) -> bool:
+        return not (self.to_embed or self.to_move or self.to_delete)
+
+    def summary(self) -> dict:
+        return {
+            "files": {
+                "new": len(self.new_files), "changed": len(self.changed_files),
+                "unchanged": len(self.unchanged_files), "removed": len(self.removed_files),
+            },
+            "chunks": {
+                "embed": len(self.to_embed), "move": len(self.to_move),
+                "delete": len(self.to_delete), "keep": self.kept_chunks,
+            },
+        }
+
+
+def _settings(model_id: str) -> dict:
+    return {"chunk_size": CHUNK_SIZE, "chunk_overlap": CHUNK_OVERLAP, "model_id": model_id or ""}
+
+
+def load_manifest(path: str) -> Optional[dict]:
+    if not path or not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_manifest(path: str, manifest: dict) -> None:
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=1, sort_keys=True)
+    os.replace(tmp, path)  # 중간에 죽어도 이전 manifest 가 깨지지 않게
+
+
+def split_chunks(source: str, text: str, split: Callable[[str], List[str]]) -> List[Chunk]:
+    chunks, seen = [], {}
+    for i, piece in enumerate(split(text)):
+        h = sha1(piece)
+        occurrence = seen.get(h, 0)
+        seen[h] = occurrence + 1
+        chunks.append(Chunk(chunk_id(source, h, occurrence), source, i, piece))
+    return chunks
+
+
+def plan_ingest(docs: Iterable[Tuple[str, str]], manifest: Optional[dict], split: Callable[[str], List[str]],
+                model_id: str = "", full: bool = False) -> IngestPlan:
+    """(source, text) 문서 목록과 이전 manifest 를 비교해 적재 계획을 만든다. 외부 호출은 하지 않는다."""
+    return next(iter_plans(docs, manifest, split, model_id, full))
+
+
+def iter_plans(docs: Iterable[Tuple[str, str]], manifest: Optional[dict], split: Callable[[str], List[str]],
+               model_id: str = "", full: bool = False, max_chunks: Optional[int] = None) -> Iterator[IngestPlan]:
+    """plan_ingest 의 스트리밍 버전.
+
+    docs 를 하나씩 소비하면서, 임베딩할 청크가 max_chunks 개 이상 모이면 부분 계획을 내보낸다.
+    (그래서 메모리에는 문서 하나 + 청크 max_chunks 개 정도만 남는다. None 이면 계획 하나)
+    사라진 파일의 삭제는 docs 를 다 읽어야 알 수 있으므로 마지막 계획에 들어간다.
+    모든 부분 계획은 같은 manifest dict 를 공유하며, 마지막 계획까지 적용한 뒤 저장해야 한다.
+    """
+    settings = _settings(model_id)
+    valid = (manifest is not None and not full and manifest.get("version") == MANIFEST_VERSION
+             and manifest.get("settings") == settings)
+    old_files: Dict[str, dict] = manifest.get("files", {}) if manifest else {}
+    new_manifest = {"version": MANIFEST_VERSION, "settings": settings, "files": {}}
+    plan = IngestPlan(manifest=new_manifest)
+
+    seen_sources = set()
+    for source, text in docs:
+        if max_chunks and len(plan.to_embed) >= max_chunks:
+            yield plan
+            plan = IngestPlan(manifest=new_manifest)
+        seen_sources.add(source)
+        file_hash = sha1(text)
+        old = old_files.get(source)
+        if valid and old and old.get("sha1") == file_hash:
+            plan.unchanged_files.append(source)
+            plan.kept_chunks += len(old.get("chunks", []))
+            plan.manifest["files"][source] = old
+            continue
+
+        chunks = split_chunks(source, text, split)
+        old_index = {c["id"]: i for i, c in enumerate(old.get("chunks", []))} if (valid and old) else {}
+        if old is None:
+            plan.new_files.append(source)
+        else:
+            plan.changed_files.append(source)
+
+        for chunk in chunks:
+            pos = old_index.pop(chunk.id, None)
+            if pos is None:
+                plan.to_embed.append(chunk)
+            elif pos != chunk.index:
+                plan.to_move.append(chunk)
+            else:
+                plan.kept_chunks += 1
+        if valid:
+            plan.to_delete.extend(old_index)
+        elif old:
+            # manifest 가 무효화된 경우 이전 ID는 모두 지운다 (새 ID와 겹치는 것은 제외)
+            new_ids = {c.id for c in chunks}
+            plan.to_delete.extend(c["id"] for c in old.get("chunks", []) if c["id"] not in new_ids)
+        if manifest is None:
+            # 첫 실행: manifest 이전 방식(source|index|text)으로 올라간 ID를 정리한다.
+            plan.to_delete.extend(legacy_chunk_id(source, c.index, c.text) for c in chunks)
+
+        plan.manifest["files"][source] = {
+            "sha1": file_hash,
+            "chunks": [{"id": c.id, "sha1": sha1(c.text)} for c in chunks],
+        }
+
+    for source, old in old_files.items():
+        if source not in seen_sources:
+            plan.removed_files.append(source)
+            plan.to_delete.extend(c["id"] for c in old.get("chunks", []))
+    yield plan
+
+
+def merge_summaries(total: Optional[dict], summary: dict) -> dict:
+    """부분 계획들의 summary() 를 합친다."""
+    if total is None:
+        return {group: dict(counts) for group, counts in summary.items()}
+    for group, counts in summary.items():
+        for key, value in counts.items():
+            total[group][key] += value
+    return total
+
+
+def _batches(items: list, size: int):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+_RETRYABLE = ("throttl", "toomanyrequests", "too many requests", "rate exceeded", "429",
+              "serviceunavailable", "service unavailable", "503", "timeout", "timed out")
+
+
+def is_retryable(error: Exception) -> bool:
+    """Bedrock ThrottlingException, Pinecone 429, 일시적 503/타임아웃 등."""
+    text = f"{type(error).__name__} {error}".lower()
+    return any(marker in text for marker in _RETRYABLE)
+
+
+def with_backoff(fn: Callable, *, retries: int = MAX_RETRIES, base: float = BACKOFF_BASE,
+                 on_retry: Optional[Callable[[Exception, float], None]] = None):
+    """fn()을 실행하고, 재시도 가능한 오류면 base * 2^n (+jitter, 최대 BACKOFF_MAX)초 쉬었다가 다시 시도한다."""
+    for attempt in range(retries + 1):
+        try:
+            return fn()
+        except Exception as e:
+            if attempt == retries or not is_retryable(e):
+                raise
+            delay = min(BACKOFF_MAX, base * (2 ** attempt)) * (0.5 + random.random() / 2)
+            if on_retry:
+                on_retry(e, delay)
+            time.sleep(delay)
+
+
+class IngestProgress:
+    def __init__(self, total: int, log=print, interval: float = PROGRESS_INTERVAL):
+        self.total = total
+        self.log = log
+        self.interval = interval
+        self.embedded = 0
+        self.upserted = 0
+        self.retries = 0
+        self.started = time.perf_counter()
+        self._last_report = self.started
+        self._lock = threading.Lock()
+
+    def add(self, embedded: int = 0, upserted: int = 0, retries: int = 0) -> None:
+        with self._lock:
+            self.embedded += embedded
+            self.upserted += upserted
+            self.retries += retries
+            now = time.perf_counter()
+            due = now - self._last_report >= self.interval
+            if due:
+                self._last_report = now
+        if due:
+            self.log(self.line())
+
+    @property
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    def line(self) -> str:
+        rate = self.upserted / self.elapsed if self.elapsed else 0.0
+        return (f"[progress] embedded {self.embedded}/{self.total} upserted {self.upserted}/{self.total} "
+                f"({rate:.1f} chunks/s, retries={self.retries})")
+
+    def report(self) -> dict:
+        elapsed = self.elapsed
+        return {
+            "chunks": self.upserted,
+            "seconds": round(elapsed, 3),
+            "chunks_per_s": round(self.upserted / elapsed, 2) if elapsed else 0.0,
+            "retries": self.retries,
+        }
+
+
+def embed_and_upsert(chunks: List[Chunk], embedder, index, namespace: str, log=print,
+                     workers: int = EMBED_WORKERS, embed_batch: int = EMBED_BATCH,
+                     upsert_batch: int = UPSERT_BATCH, backoff_base: float = BACKOFF_BASE) -> dict:
+    """청크를 파이프라인으로 임베딩/업서트하고 처리량 보고서를 돌려준다."""
+    progress = IngestProgress(len(chunks), log)
+
+    def retried(fn):
+        return with_backoff(fn, base=backoff_base,
+                            on_retry=lambda e, d: (progress.add(retries=1),
+                                                   log(f"[retry] {type(e).__name__}: {e} (wait {d:.1f}s)")))
+
+    def embed(batch):
+        return batch, retried(lambda: embedder.embed_documents([c.text for c in batch]))
+
+    def upsert(vectors):
+        retried(lambda: index.upsert(vectors=vectors, namespace=namespace))
+        progress.add(upserted=len(vectors))
+
+    batches = list(_batches(chunks, max(1, embed_batch)))
+    max_in_flight = max(1, workers) * 2  # 임베딩 결과가 메모리에 너무 쌓이지 않도록
+    pending_vectors = []
+    upserts = []
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="embed") as embed_pool, \
+            ThreadPoolExecutor(max_workers=1, thread_name_prefix="upsert") as upsert_pool:
+        in_flight = set()
+        next_batch = 0
+        while next_batch < len(batches) or in_flight:
+            while next_batch < len(batches) and len(in_flight) < max_in_flight:
+                in_flight.add(embed_pool.submit(embed, batches[next_batch]))
+                next_batch += 1
+            done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                batch, vectors = future.result()
+                progress.add(embedded=len(batch))
+                pending_vectors.extend((c.id, vec, c.metadata) for c, vec in zip(batch, vectors))
+            while len(pending_vectors) >= upsert_batch:
+                upserts.append(upsert_pool.submit(upsert, pending_vectors[:upsert_batch]))
+                pending_vectors = pending_vectors[upsert_batch:]
+        if pending_vectors:
+            upserts.append(upsert_pool.submit(upsert, pending_vectors))
+        for future in upserts:
+            future.result()  # 업서트 실패를 호출자에게 전달
+
+    report = progress.report()
+    log(f"[throughput] {report['chunks']} chunks in {report['seconds']}s "
+        f"({report['chunks_per_s']} chunks/s, retries={report['retries']})")
+    return report
+
+
+def apply_plan(plan: IngestPlan, embedder, index, namespace: str, log=print, **pipeline) -> dict:
+    """계획대로 임베딩/업서트/metadata 갱신/삭제를 수행한다. 성공하면 호출자가 manifest 를 저장한다."""
+    report = {"chunks": 0, "seconds": 0.0, "chunks_per_s": 0.0, "retries": 0}
+    if plan.to_embed:
+        report = embed_and_upsert(plan.to_embed, embedder, index, namespace, log, **pipeline)
+
+    for chunk in plan.to_move:
+        with_backoff(lambda: index.update(id=chunk.id, set_metadata={"chunk_index": chunk.index}, namespace=namespace))
+    if plan.to_move:
+        log(f"[update] chunk_index x{len(plan.to_move)}")
+
+    for batch in _batches(plan.to_delete, DELETE_BATCH):
+        with_backoff(lambda: index.delete(ids=batch, namespace=namespace))
+        log(f"[delete] -{len(batch)}")
+    return report
@@ -0,0 +1,157 @@
+"""
+lexical_index.py
+
+KB 청크에 대한 BM25 역색인. 벡터 검색이 약한 리터럴 토큰
+(ERR_CONNECTION_RESET, ORA-12541, java.lang.NullPointerException ...)을 정확히 찾는다.
+
+- 청크는 로컬 인덱스 스냅샷(rag_store / local_index 가 만든 records.jsonl 의 metadata.text)에서 가져온다.
+- 토큰화: 소문자 단어/숫자/한글 + 에러 코드처럼 생긴 복합 토큰은 통째로도 색인한다.
+  (ORA-12541 → "ora-12541", "ora", "12541")
+  마스킹 플레이스홀더([IP_ADDR_0], [DOC_REF_1] ...)는 원문과 무관한 번호라 토큰/코드로 보지 않는다.
+- rrf_fuse(): 여러 검색 결과를 reciprocal rank fusion 으로 합친다.
+"""
+import math
+import re
+from collections import Counter, defaultdict
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from dev.app.masking_rules import default_registry
+
+K1 = 1.2
+B = 0.75
+RRF_K = 60
+
+_TOKEN = re.compile(r'[A-Za-z_$][\w$]*(?:[.\-:][\w$]+)*|\d+|[가-힣]+')
+_PARTS = re.compile(r'[.\-:]')
+# 에러 코드/예외 클래스처럼 생긴 토큰: ERR_CONNECTION_RESET, ORA-12541, E1102, NullPointerException
+_CODE = re.compile(
+    r'^(?:[A-Z][A-Z0-9]*(?:_[A-Z0-9]+)+'
+    r'|[A-Za-z]{1,10}-\d{2,}'
+    r'|[A-Z]{1,4}\d{3,}'
+    r'|(?:[\w$]+\.)*[A-Z]\w*(?:Error|Exception|Fault))$'
+)
+
+
+@lru_cache(maxsize=8)
+def _placeholder_pattern(names: Tuple[str, ...]) -> re.Pattern:
+    # [IP_ADDR_0] (마스킹 결과) 와 [IP_ADDR] (fingerprint 정규화 결과) 둘 다
+    return re.compile(r'\[(?:' + "|".join(names) + r')(?:_\d+)?\]')
+
+
+def strip_placeholders(text: str) -> str:
+    """마스킹 플레이스홀더를 지운다. ERR_CONNECTION_RESET 과 모양이 같아 _CODE 에 걸리기 때문."""
+    names = tuple(default_registry().compiled().names)
+    return _placeholder_pattern(names).sub(" ", text or "") if names else (text or "")
+
+
+def tokenize(text: str) -> List[str]:
+    tokens = []
+    for m in _TOKEN.finditer(strip_placeholders(text)):
+        tok = m.group().lower()
+        tokens.append(tok)
+        if _PARTS.search(tok):
+            tokens.extend(p for p in _PARTS.split(tok) if p)
+    return tokens
+
+
+def code_tokens(text: str) -> Set[str]:
+    """텍스트 안의 에러 코드/예외 클래스 토큰 (소문자)."""
+    return {m.group().lower() for m in _TOKEN.finditer(strip_placeholders(text)) if _CODE.match(m.group())}
+
+
+@dataclass
+class LexicalHit:
+    id: str
+    score: float
+    metadata: dict
+    matched_codes: Set[str] = field(default_factory=set)
+
+
+class BM25Index:
+    def __init__(self):
+        self.ids: List[str] = []
+        self.metadata: List[dict] = []
+        self._codes: List[Set[str]] = []
+        self._lengths: List[int] = []
+        self._postings: Dict[str, List[Tuple[int, int]]] = defaultdict(list)
+        self._positions: Dict[str, int] = {}
+        self._avgdl = 0.0
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __contains__(self, id_: str) -> bool:
+        return id_ in self._positions
+
+    @classmethod
+    def build(cls, docs: Iterable[Tuple[str, str, dict]]) -> "BM25Index":
+        """(id, text, metadata) 목록으로 색인한다."""
+        index = cls()
+        index.add(docs)
+        return index
+
+    def add(self, docs: Iterable[Tuple[str, str, dict]]) -> None:
+        """새 문서를 색인에 더한다. (이미 있는 id 를 바꾸려면 색인을 다시 만든다)
+
+        search 와 겹쳐도 되도록 postings 에 위치를 넣기 전에 그 위치의 id/metadata/길이를 먼저 채운다.
+        """
+        for id_, text, md in docs:
+            tokens = tokenize(text)
+            if not tokens:
+                continue
+            pos = len(self.ids)
+            self.ids.append(id_)
+            self.metadata.append(md)
+            self._codes.append(code_tokens(text))
+            self._lengths.append(len(tokens))
+            for tok, tf in Counter(tokens).items():
+                self._postings[tok].append((pos, tf))
+            self._positions[id_] = pos
+        self._avgdl = sum(self._lengths) / len(self._lengths) if self._lengths else 0.0
+
+    @classmethod
+    def from_local_index(cls, local) -> "BM25Index":
+        return cls.build((id_, md.get("text", ""), md) for id_, md in zip(local.ids, local.metadata) if md.get("text"))
+
+    def _idf(self, tok: str) -> float:
+        df = len(self._postings.get(tok, ()))
+        return math.log(1 + (len(self.ids) - df + 0.5) / (df + 0.5))
+
+    def search(self, query: str, top_k: int = 5) -> List[LexicalHit]:
+        if not self.ids:
+            return []
+        scores: Dict[int, float] = defaultdict(float)
+        for tok in set(tokenize(query)):
+            postings = self._postings.get(tok)
+            if not postings:
+                continue
+            idf = self._idf(tok)
+            for pos, tf in postings:
+                norm = K1 * (1 - B + B * self._lengths[pos] / self._avgdl)
+                scores[pos] += idf * tf * (K1 + 1) / (tf + norm)
+
+        wanted = code_tokens(query)
+        best = sorted(scores.items(), key=lambda kv: -kv[1])[:top_k]
+        return [LexicalHit(self.ids[pos], score, self.metadata[pos], wanted & self._codes[pos]) for pos, score in best]
+
+
+def confident_hits(query: str, hits: List[LexicalHit]) -> Optional[List[LexicalHit]]:
+    """질의의 에러 코드를 모두 포함한 청크가 1위면, 코드가 하나라도 맞은 청크만 돌려준다. 아니면 None."""
+    wanted = code_tokens(query)
+    if not wanted or not hits or hits[0].matched_codes != wanted:
+        return None
+    return [h for h in hits if h.matched_codes]
+
+
+def rrf_fuse(rankings: List[List[Tuple[str, dict]]], top_k: int, k: int = RRF_K) -> List[Tuple[str, float, dict]]:
+    """여러 순위 목록 [(id, metadata), ...] 을 reciprocal rank fusion 으로 합친다."""
+    scores: Dict[str, float] = defaultdict(float)
+    metadata: Dict[str, dict] = {}
+    for ranking in rankings:
+        for rank, (id_, md) in enumerate(ranking):
+            scores[id_] += 1.0 / (k + rank + 1)
+            metadata.setdefault(id_, md)
+    best = sorted(scores.items(), key=lambda kv: -kv[1])[:top_k]
+    return [(id_, score, metadata[id_]) for id_, score in best]
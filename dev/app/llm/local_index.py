@@ -0,0 +1,386 @@
+"""
+local_index.py
+
+Pinecone 네임스페이스를 프로세스 안에 그대로 옮겨 둔 NumPy 벡터 인덱스.
+
+- 벡터는 L2 정규화 후 float16 또는 int8(벡터별 scale)로 압축 저장 → 코사인 유사도 = 내적
+  (질의 시에는 BLOCK_ROWS 행씩 float32 로 풀어 내적한다. 풀어 둔 블록은 LOCAL_INDEX_WORK_CACHE_MB 까지만 캐시)
+- upsert/delete 는 (ids, vectors, metadata) 스냅샷을 통째로 교체하므로 query 는 잠금 없이 일관된 한 벌을 본다.
+  새 id 만 추가하는 upsert 는 여유 행을 둔 버퍼 뒤에 써서 행렬 전체를 복사하지 않는다. (기존 스냅샷은 앞부분만 본다)
+- 스냅샷 디렉터리: vectors.npy (+ scales.npy) / records.jsonl (id, metadata) / manifest.json
+  로드 시 vectors.npy 를 mmap 으로 열어, 여러 워커가 같은 파일을 공유하고 기동도 빠르다.
+  save() 는 옆의 임시 디렉터리에 다 쓴 뒤 이름을 바꿔 끼우므로, 중간에 죽어도 반쯤 쓴 스냅샷이 남지 않고
+  같은 파일을 mmap 으로 열고 있는 프로세스도 깨지지 않는다.
+- query() 는 Pinecone Index.query 와 같은 모양 {"matches": [{"id", "score", "metadata"}]} 을 돌려준다.
+
+만드는 방법:
+  python -m dev.app.llm.local_index build --docs data/kb_docs --out data/local_index   # 문서를 직접 임베딩
+  python -m dev.app.llm.local_index sync --out data/local_index                         # Pinecone 네임스페이스 복사
+
+rag_search 에서의 사용은 tools.py 의 RAG_BACKEND 참고.
+"""
+import argparse
+import json
+import os
+import shutil
+import threading
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+DTYPES = ("float16", "int8", "float32")
+
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def _compress(matrix: np.ndarray, dtype: str) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    if dtype == "int8":
+        scales = np.abs(matrix).max(axis=1)
+        scales[scales == 0] = 1.0
+        q = np.round(matrix / scales[:, None] * 127).astype(np.int8)
+        return q, (scales / 127).astype(np.float32)
+    return matrix.astype(dtype), None
+
+
+# 질의 시 압축 행렬을 이 행 수 단위로 float32 로 풀어 내적한다. (1024차원 기준 블록당 8 MB)
+BLOCK_ROWS = 2048
+# 풀어 둔 float32 블록을 이 크기까지 캐시한다. float16 풀기는 질의마다 하기엔 느리다 (2000×1024 에 ~7 ms).
+# 작은 인덱스는 전부 캐시되어 기존처럼 빠르고, 큰 인덱스는 압축본이 유일한 전체 사본으로 남는다. 0이면 캐시 안 함
+WORK_CACHE_MB = float(os.getenv("LOCAL_INDEX_WORK_CACHE_MB", "64"))
+# upsert 버퍼를 늘릴 때 필요한 행 수에 더 잡아 두는 여유 비율 (추가가 평균 O(추가 행 수)가 되도록)
+GROWTH = 0.25
+MIN_SPARE_ROWS = 256
+
+
+class _Snapshot:
+    """(ids, vectors, scales, metadata) 한 벌. 만든 뒤에는 바꾸지 않고 upsert/delete 가 통째로 교체한다.
+
+    query 는 시작할 때 참조 하나를 잡으므로 저장 큐 스레드의 upsert 와 겹쳐도 id/metadata/점수가 서로 맞는다.
+    """
+
+    def __init__(self, ids: List[str], vectors: np.ndarray, scales: Optional[np.ndarray], metadata: List[dict],
+                 positions: Optional[dict] = None):
+        self.ids = ids
+        self.vectors = vectors
+        self.scales = scales
+        self.metadata = metadata
+        self.positions = {id_: i for i, id_ in enumerate(ids)} if positions is None else positions
+        self._blocks: dict = {}      # 시작 행 -> 풀어 둔 float32 블록 (scale 적용 전)
+        self._cached_bytes = 0
+        self._lock = threading.Lock()
+
+    def inherit_blocks(self, old: "_Snapshot", rows: int) -> None:
+        """old 의 앞 rows 행이 이 스냅샷과 같을 때, 그 안에 완전히 들어가는 풀어 둔 블록을 물려받는다."""
+        for start, block in old._blocks.items():
+            if start + BLOCK_ROWS <= rows:
+                self._blocks[start] = block
+                self._cached_bytes += block.nbytes
+
+    def _block(self, start: int) -> np.ndarray:
+        block = self._blocks.get(start)
+        if block is not None:
+            return block
+        block = np.asarray(self.vectors[start:start + BLOCK_ROWS], dtype=np.float32)
+        with self._lock:
+            if self._cached_bytes + block.nbytes <= WORK_CACHE_MB * 1024 * 1024 and start not in self._blocks:
+                self._blocks[start] = block
+                self._cached_bytes += block.nbytes
+        return block
+
+    def scores(self, q: np.ndarray) -> np.ndarray:
+        if self.vectors.dtype == np.float32:
+            return np.asarray(self.vectors @ q)  # 압축하지 않은 행렬은 그대로 BLAS 를 탄다
+        out = np.empty(len(self.ids), dtype=np.float32)
+        for start in range(0, len(self.ids), BLOCK_ROWS):
+            out[start:start + BLOCK_ROWS] = self._block(start) @ q
+        if self.scales is not None:
+            out *= self.scales
+        return out
+
+    def rows(self, positions: Sequence[int]) -> np.ndarray:
+        """지정한 행들의 정규화된 float32 벡터 (int8 은 scale 적용)."""
+        rows = np.asarray(self.vectors[list(positions)], dtype=np.float32)
+        if self.scales is not None and len(rows):
+            rows = rows * self.scales[list(positions)][:, None]
+        return rows
+
+    def warm(self) -> int:
+        """캐시 한도까지 블록을 미리 풀어 둔다. 캐시된 바이트 수를 돌려준다."""
+        if self.vectors.dtype != np.float32:
+            for start in range(0, len(self.ids), BLOCK_ROWS):
+                self._block(start)
+                if self._cached_bytes + BLOCK_ROWS * self.vectors.shape[1] * 4 > WORK_CACHE_MB * 1024 * 1024:
+                    break
+        return self._cached_bytes
+
+
+class LocalIndex:
+    def __init__(self, ids: List[str], vectors: np.ndarray, metadata: List[dict],
+                 dtype: str = "float16", scales: Optional[np.ndarray] = None):
+        if dtype not in DTYPES:
+            raise ValueError(f"unsupported dtype: {dtype} (choose from {DTYPES})")
+        self.dtype = dtype
+        self._lock = threading.Lock()   # upsert/update/delete 직렬화 (query 는 잠그지 않는다)
+        self._snap = _Snapshot(list(ids), vectors, scales, list(metadata))
+        # upsert 용 여유 행이 있는 버퍼. 현재 스냅샷의 vectors/scales 가 이 버퍼의 앞부분일 때만 이어 쓴다
+        self._vector_buf: Optional[np.ndarray] = None
+        self._scale_buf: Optional[np.ndarray] = None
+
+    def snapshot(self) -> _Snapshot:
+        """현재 (ids, vectors, scales, metadata). 여러 필드를 함께 읽을 때는 이것 하나를 잡고 쓴다."""
+        return self._snap
+
+    @property
+    def ids(self) -> List[str]:
+        return self._snap.ids
+
+    @property
+    def vectors(self) -> np.ndarray:
+        return self._snap.vectors
+
+    @property
+    def scales(self) -> Optional[np.ndarray]:
+        return self._snap.scales
+
+    @property
+    def metadata(self) -> List[dict]:
+        return self._snap.metadata
+
+    @property
+    def dim(self) -> int:
+        snap = self._snap
+        return int(snap.vectors.shape[1]) if snap.vectors.ndim == 2 and len(snap.ids) else 0
+
+    def __len__(self) -> int:
+        return len(self._snap.ids)
+
+    @classmethod
+    def build(cls, items: Iterable[Tuple[str, Sequence[float], dict]], dtype: str = "float16") -> "LocalIndex":
+        """(id, vector, metadata) 목록으로 인덱스를 만든다. 같은 id는 마지막 값이 남는다."""
+        latest = {}
+        for id_, vec, md in items:
+            latest[id_] = (vec, md or {})
+        ids = list(latest)
+        if not ids:
+            return cls([], np.zeros((0, 0), dtype=dtype), [], dtype)
+        matrix = _normalize(np.asarray([latest[i][0] for i in ids], dtype=np.float32))
+        vectors, scales = _compress(matrix, dtype)
+        return cls(ids, vectors, [latest[i][1] for i in ids], dtype, scales)
+
+    # --- 스냅샷 ---
+
+    def save(self, path: str) -> None:
+        """path 에 스냅샷을 쓴다. 옆의 임시 디렉터리에 다 쓴 뒤 이름을 바꿔 기존 디렉터리와 바꾼다."""
+        snap = self._snap
+        path = os.path.abspath(path)
+        tmp, old = f"{path}.tmp-{os.getpid()}", f"{path}.old-{os.getpid()}"
+        shutil.rmtree(tmp, ignore_errors=True)
+        os.makedirs(tmp)
+        try:
+            np.save(os.path.join(tmp, "vectors.npy"), np.ascontiguousarray(snap.vectors))
+            if snap.scales is not None:
+                np.save(os.path.join(tmp, "scales.npy"), snap.scales)
+            with open(os.path.join(tmp, "records.jsonl"), "w", encoding="utf-8") as f:
+                for id_, md in zip(snap.ids, snap.metadata):
+                    f.write(json.dumps({"id": id_, "metadata": md}, ensure_ascii=False) + "\n")
+            with open(os.path.join(tmp, "manifest.json"), "w", encoding="utf-8") as f:
+                json.dump({"dtype": self.dtype, "dim": self.dim, "count": len(snap.ids)}, f)
+        except BaseException:
+            shutil.rmtree(tmp, ignore_errors=True)
+            raise
+        # 디렉터리는 비어 있지 않은 대상 위로 rename 할 수 없으므로 기존 것을 먼저 비켜 둔다.
+        # 기존 파일은 지워져도 mmap 으로 열고 있는 프로세스에서는 그대로 읽힌다.
+        if os.path.exists(path):
+            shutil.rmtree(old, ignore_errors=True)
+            os.replace(path, old)
+        os.replace(tmp, path)
+        shutil.rmtree(old, ignore_errors=True)
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = True) -> "LocalIndex":
+        with open(os.path.join(path, "manifest.json"), "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        vectors = np.load(os.path.join(path, "vectors.npy"), mmap_mode="r" if mmap else None)
+        scales_path = os.path.join(path, "scales.npy")
+        scales = np.load(scales_path) if os.path.exists(scales_path) else None
+        ids, metadata = [], []
+        with open(os.path.join(path, "records.jsonl"), "r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    record = json.loads(line)
+                    ids.append(record["id"])
+                    metadata.append(record.get("metadata") or {})
+        return cls(ids, vectors, metadata, manifest["dtype"], scales)
+
+    def warm(self) -> int:
+        """첫 질의 전에 float32 블록 캐시를 채운다. (기동 워밍업용)"""
+        return self._snap.warm()
+
+    # --- Pinecone 호환 API ---
+
+    def query(self, vector: Sequence[float], top_k: int = 3, include_metadata: bool = True,
+              namespace: Optional[str] = None, filter: Optional[dict] = None, **_) -> dict:
+        """코사인 유사도 상위 top_k. filter 는 metadata 동등 비교만 지원한다 ({"doc_type": "kb_md"})."""
+        snap = self._snap
+        if not len(snap.ids) or top_k <= 0:
+            return {"matches": [], "namespace": namespace or ""}
+        q = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(q)
+        if norm:
+            q = q / norm
+        scores = snap.scores(q)
+        if filter:
+            mask = np.array([all(md.get(k) == v for k, v in filter.items()) for md in snap.metadata])
+            scores = np.where(mask, scores, -np.inf)
+
+        k = min(top_k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        matches = []
+        for i in top:
+            if not np.isfinite(scores[i]):
+                continue
+            match = {"id": snap.ids[i], "score": float(scores[i])}
+            if include_metadata:
+                match["metadata"] = snap.metadata[i]
+            matches.append(match)
+        return {"matches": matches, "namespace": namespace or ""}
+
+    def upsert(self, vectors: Iterable[Tuple[str, Sequence[float], dict]], namespace: Optional[str] = None, **_) -> dict:
+        """메모리 상의 인덱스에 추가/갱신한다. (스냅샷 파일은 save() 해야 바뀐다)"""
+        items = list(vectors)
+        if not items:
+            return {"upserted_count": 0}
+        added = LocalIndex.build(items, self.dtype)
+        with self._lock:
+            old = self._snap
+            n = len(old.ids)
+            new_rows = [j for j, id_ in enumerate(added.ids) if id_ not in old.positions]
+            replaced = [(old.positions[id_], j) for j, id_ in enumerate(added.ids) if id_ in old.positions]
+            # 새 행은 버퍼의 n 번째 행부터 쓴다. 진행 중인 query 는 [:n] 만 보므로 건드리지 않는다.
+            # 기존 행을 바꾸는 경우에는 그 query 가 보는 행이므로 새 버퍼로 복사한 뒤 고친다.
+            vectors_, scales = self._reserve(old, added, n + len(new_rows), copy=bool(replaced))
+            vectors_[n:] = added.vectors[new_rows]
+            if scales is not None:
+                scales[n:] = added.scales[new_rows]
+            ids, metadata, positions = list(old.ids), list(old.metadata), dict(old.positions)
+            for pos, j in replaced:
+                vectors_[pos] = added.vectors[j]
+                metadata[pos] = added.metadata[j]
+                if scales is not None:
+                    scales[pos] = added.scales[j]
+            for k, j in enumerate(new_rows):
+                ids.append(added.ids[j])
+                metadata.append(added.metadata[j])
+                positions[added.ids[j]] = n + k
+            snap = _Snapshot(ids, vectors_, scales, metadata, positions)
+            if not replaced:
+                snap.inherit_blocks(old, n)
+            self._snap = snap
+        return {"upserted_count": len(items)}
+
+    def _reserve(self, old: _Snapshot, added: "LocalIndex", rows: int, copy: bool):
+        """old 의 행을 앞에 담고 rows 행을 쓸 수 있는 (vectors, scales) 뷰. 가능하면 기존 버퍼를 이어 쓴다."""
+        n = len(old.ids)
+        buf = self._vector_buf
+        if (not copy and buf is not None and old.vectors.base is buf and len(buf) >= rows
+                and (old.scales is None or old.scales.base is self._scale_buf)):
+            return buf[:rows], None if self._scale_buf is None else self._scale_buf[:rows]
+        capacity = rows + max(int(rows * GROWTH), MIN_SPARE_ROWS)
+        dim = added.dim if not n else old.vectors.shape[1]
+        buf = np.empty((capacity, dim), dtype=added.vectors.dtype)
+        scale_buf = None if added.scales is None else np.empty(capacity, dtype=np.float32)
+        if n:
+            buf[:n] = old.vectors
+            if scale_buf is not None:
+                scale_buf[:n] = old.scales
+        self._vector_buf, self._scale_buf = buf, scale_buf
+        return buf[:rows], None if scale_buf is None else scale_buf[:rows]
+
+    def update(self, id: str, set_metadata: Optional[dict] = None, namespace: Optional[str] = None, **_) -> dict:
+        """metadata 일부를 바꾼다. (Pinecone Index.update 의 set_metadata 와 같은 병합 방식)"""
+        with self._lock:
+            old = self._snap
+            pos = old.positions.get(id)
+            if pos is not None and set_metadata:
+                metadata = list(old.metadata)
+                metadata[pos] = {**metadata[pos], **set_metadata}
+                snap = _Snapshot(old.ids, old.vectors, old.scales, metadata)
+                snap._blocks, snap._cached_bytes = old._blocks, old._cached_bytes  # 벡터는 그대로
+                self._snap = snap
+        return {}
+
+    def delete(self, ids: Iterable[str], namespace: Optional[str] = None, **_) -> dict:
+        with self._lock:
+            old = self._snap
+            drop = {old.positions[i] for i in ids if i in old.positions}
+            if not drop:
+                return {}
+            keep = [pos for pos in range(len(old.ids)) if pos not in drop]
+            self._vector_buf = self._scale_buf = None
+            self._snap = _Snapshot(
+                [old.ids[pos] for pos in keep],
+                np.asarray(old.vectors)[keep],
+                None if old.scales is None else np.asarray(old.scales)[keep],
+                [old.metadata[pos] for pos in keep],
+            )
+        return {}
+
+
+# --- 스냅샷 만들기 ---
+
+def build_from_docs(folder: str, embedder, dtype: str = "float16") -> LocalIndex:
+    """rag_store.py 와 같은 문서 로더/분할/ID/metadata 규칙(ingest.py)으로 문서를 임베딩해 인덱스를 만든다."""
+    from dev.app.llm.ingest import load_docs, make_splitter, split_chunks
+
+    splitter = make_splitter()
+    items = []
+    for source, text in load_docs(folder):
+        chunks = split_chunks(source, text, splitter.split_text)
+        vectors = embedder.embed_documents([c.text for c in chunks]) if chunks else []
+        items.extend((c.id, vec, c.metadata) for c, vec in zip(chunks, vectors))
+    return LocalIndex.build(items, dtype)
+
+
+def sync_from_pinecone(index, namespace: str, dtype: str = "float16", batch_size: int = 100) -> LocalIndex:
+    """Pinecone 네임스페이스의 모든 벡터를 받아 인덱스를 만든다. (serverless index.list 필요)"""
+    items = []
+    for ids in index.list(namespace=namespace, limit=batch_size):
+        if not ids:
+            continue
+        fetched = index.fetch(ids=list(ids), namespace=namespace)
+        vectors = fetched["vectors"] if isinstance(fetched, dict) else fetched.vectors
+        for id_, v in vectors.items():
+            values = v["values"] if isinstance(v, dict) else v.values
+            md = (v.get("metadata") if isinstance(v, dict) else v.metadata) or {}
+            items.append((id_, values, dict(md)))
+    return LocalIndex.build(items, dtype)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="로컬 벡터 인덱스 스냅샷 생성")
+    sub = parser.add_subparsers(dest="command", required=True)
+    build = sub.add_parser("build", help="문서를 임베딩해서 생성")
+    build.add_argument("--docs", default="data/kb_docs")
+    sync = sub.add_parser("sync", help="Pinecone 네임스페이스에서 복사")
+    sync.add_argument("--namespace", default=os.getenv("PINECONE_NAMESPACE", "dev"))
+    for p in (build, sync):
+        p.add_argument("--out", default=os.getenv("LOCAL_INDEX_PATH", "data/local_index"))
+        p.add_argument("--dtype", choices=DTYPES, default="float16")
+    args = parser.parse_args()
+
+    from dev.app.llm.tools import get_embedder, get_pinecone_index
+    if args.command == "build":
+        local = build_from_docs(args.docs, get_embedder(), args.dtype)
+    else:
+        local = sync_from_pinecone(get_pinecone_index(), args.namespace, args.dtype)
+    local.save(args.out)
+    print(f"[local_index] {args.command}: {len(local)} vectors (dim={local.dim}, {args.dtype}) -> {args.out}")
+
+
+if __name__ == "__main__":
+    main()
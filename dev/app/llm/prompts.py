@@ -1,4 +1,5 @@
 # prompts.py
+import hashlib
 
 # 1. 출력 형식 정의
 JSON_FORMAT_INSTRUCTION = """
@@ -208,4 +209,10 @@ rag_search 결과가 존재함에도 “로그 부재/분석 불가”로 결론
 {RAG_DECISION_RULE}
 {JSON_FORMAT_INSTRUCTION}
 """
-}
\ No newline at end of file
+}
+
+
+def prompt_version(persona: str, mode: str) -> str:
+    """(persona, mode) 프롬프트 내용이 바뀌면 달라지는 짧은 버전 문자열. 결과 캐시 키에 사용한다."""
+    text = PROMPTS.get((persona, mode), "")
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()[:12]
@@ -1,84 +1,80 @@
-from langchain_community.vectorstores import FAISS
-from langchain_aws import BedrockEmbeddings
-import boto3
-import os, glob, hashlib
+import argparse
+import json
+import os
 from dotenv import load_dotenv
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from pinecone import Pinecone
 
-load_dotenv()
-
-# 1) Embedder
-
-embedder = BedrockEmbeddings(model_id=os.getenv('BEDROCK_EMBEDDING_MODEL_ID'),
-                            region_name=os.getenv('AWS_REGION'),
-                            aws_access_key_id=os.getenv("AWS_ACCESS_KEY_ID"),
-                            aws_secret_access_key=os.getenv("AWS_SECRET_ACCESS_KEY")
+from dev.app.llm.ingest import (
+    EMBED_BATCH, EMBED_WORKERS, INGEST_WINDOW, apply_plan, iter_plans, legacy_chunk_id, load_docs, load_manifest,
+    make_splitter, merge_summaries, save_manifest,
 )
 
-# 2) Splitter
-
-splitter = RecursiveCharacterTextSplitter(
-    chunk_size=1500,      # 대략 400~800 tokens 수준(경험치)
-    chunk_overlap=200
-)
+load_dotenv()
 
-# 3) Pinecone init
+# 실행: python -m dev.app.llm.rag_store [--dry-run] [--full]
+# Embedder / Pinecone 은 tools.py 의 지연 싱글톤을 사용한다 (dry-run 은 외부 연결 없음)
+# 문서는 --docs 아래를 재귀적으로 스트리밍한다 (.md/.txt/.rst/.log, .gz 포함)
 
-pc = Pinecone(api_key=os.getenv("PINECONE_API_KEY"))
-index = pc.Index(os.getenv("PINECONE_INDEX"))
 namespace = os.getenv("PINECONE_NAMESPACE", "dev")
+MANIFEST_PATH = os.getenv("KB_MANIFEST_PATH", "data/kb_manifest.json")
 
 
 def load_md_docs(folder="data/kb_docs"):
-    paths = sorted(glob.glob(os.path.join(folder, "*.md")))
-    docs = []
-    for p in paths:
-        with open(p, "r", encoding="utf-8") as f:
-            docs.append((p, f.read()))
-    return docs
+    """하위 호환용. 새 코드는 ingest.load_docs() 제너레이터를 쓴다."""
+    return list(load_docs(folder, (".md",)))
 
-def make_id(source: str, chunk_index: int, text: str) -> str:
-    # 중복방지: 같은 내용이면 같은 id로 업서트(갱신)
-    h = hashlib.sha1(f"{source}|{chunk_index}|{text}".encode("utf-8")).hexdigest()
-    return h
+# manifest 도입 이전의 ID 규칙 (첫 증분 적재 때 이 ID들을 정리한다)
+make_id = legacy_chunk_id
 
 def main():
-    docs = load_md_docs("data/kb_docs")
-    print(f"[load] docs={len(docs)}")
-
-    upserts = []
-    total_chunks = 0
-
-    for source, doc_text in docs:
-        chunks = splitter.split_text(doc_text)
-        total_chunks += len(chunks)
-
-        vectors = embedder.embed_documents(chunks)  # List[List[float]]
-
-        for i, (chunk, vec) in enumerate(zip(chunks, vectors)):
-            _id = make_id(source, i, chunk)
-            metadata = {
-                "source": source,
-                "chunk_index": i,
-                # 너무 길면 잘라서 넣어(메타데이터 과다 방지)
-                "text": chunk[:1500],
-                "doc_type": "kb_md",
-            }
-            upserts.append((_id, vec, metadata))
-
-        # 너무 많이 쌓이면 배치 업서트
-        if len(upserts) >= 100:
-            index.upsert(vectors=upserts, namespace=namespace)
-            print(f"[upsert] +{len(upserts)}")
-            upserts.clear()
-
-    # 남은 것 업서트
-    if upserts:
-        index.upsert(vectors=upserts, namespace=namespace)
-        print(f"[upsert] +{len(upserts)}")
-
-    print(f"[done] total_chunks={total_chunks}")
+    parser = argparse.ArgumentParser(description="data/kb_docs 를 Pinecone 에 증분 적재")
+    parser.add_argument("--docs", default="data/kb_docs")
+    parser.add_argument("--manifest", default=MANIFEST_PATH)
+    parser.add_argument("--dry-run", action="store_true", help="변경 계획만 출력하고 아무 것도 쓰지 않음")
+    parser.add_argument("--full", action="store_true", help="manifest 를 무시하고 전체 재적재")
+    parser.add_argument("--workers", type=int, default=EMBED_WORKERS, help="동시 임베딩 요청 수")
+    parser.add_argument("--embed-batch", type=int, default=EMBED_BATCH, help="embed_documents 1회당 청크 수")
+    parser.add_argument("--window", type=int, default=INGEST_WINDOW, help="한 번에 메모리에 올릴 임베딩 대상 청크 수")
+    args = parser.parse_args()
+
+    splitter = make_splitter()
+    model_id = os.getenv("BEDROCK_EMBEDDING_MODEL_ID", "")
+    plans = iter_plans(load_docs(args.docs), load_manifest(args.manifest), splitter.split_text, model_id,
+                       full=args.full, max_chunks=args.window)
+
+    summary, manifest = None, None
+    totals = {"chunks": 0, "seconds": 0.0, "retries": 0}
+    embedder = index = None
+    for plan in plans:
+        summary = merge_summaries(summary, plan.summary())
+        manifest = plan.manifest
+        if args.dry_run:
+            for chunk in plan.to_embed:
+                print(f"  + {chunk.source}#{chunk.index}")
+            for chunk in plan.to_move:
+                print(f"  ~ {chunk.source}#{chunk.index}")
+            for _id in plan.to_delete:
+                print(f"  - {_id}")
+            continue
+        if plan.empty:
+            continue
+        if embedder is None:
+            from dev.app.llm.tools import get_embedder, get_pinecone_index
+            embedder, index = get_embedder(), get_pinecone_index()
+        report = apply_plan(plan, embedder, index, namespace, workers=args.workers, embed_batch=args.embed_batch)
+        for key in totals:
+            totals[key] += report[key]
+
+    files = sum(summary["files"].values())
+    print(f"[load] docs={files}")
+    print(f"[plan] {json.dumps(summary, ensure_ascii=False)}")
+    if args.dry_run:
+        return
+
+    save_manifest(args.manifest, manifest)
+    rate = round(totals["chunks"] / totals["seconds"], 2) if totals["seconds"] else 0.0
+    chunks = summary["chunks"]
+    print(f"[done] embedded={chunks['embed']} deleted={chunks['delete']} kept={chunks['keep']} "
+          f"chunks/s={rate} retries={totals['retries']}")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,183 @@
+"""
+recorder.py
+
+부하 테스트용 트래픽 녹화 (dev/benchmarks/replay.py 와 짝).
+
+RECORD_PATH 를 주고 서버를 띄우면 실제 요청과 외부 호출 결과를 JSONL 한 파일에 이어 쓴다.
+- request: 마스킹/압축이 끝난 그래프 입력 (persona, input_mode, log, code). 원문은 남기지 않는다.
+- llm    : 단계(draft/final), 사용자 프롬프트 해시, 응답 content, usage_metadata, 지연(ms)
+- embed  : 질의 텍스트 해시, 결과 벡터 해시, 지연(ms)  (벡터 자체는 남기지 않는다)
+- query  : 벡터 해시, top_k, matches(id/score/source/chunk_index/text), 지연(ms)
+
+ChatAnthropic / BedrockEmbeddings / Pinecone 인덱스를 감싸서 기록하므로 그래프와 rag_search 는 그대로다.
+임베딩은 CachedEmbeddings 안쪽(Bedrock)을 감싸서 캐시 히트는 녹화되지 않는다.
+RAG_BACKEND=local 의 로컬 인덱스 조회는 녹화하지 않는다.
+
+실행: RECORD_PATH=data/replay/corpus.jsonl uvicorn dev.app.main:app
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Optional
+
+import numpy as np
+
+MATCH_FIELDS = ("source", "chunk_index", "text")
+
+
+def text_key(text: str) -> str:
+    return hashlib.sha1((text or "").encode("utf-8")).hexdigest()[:16]
+
+
+def vector_key(vector) -> str:
+    return hashlib.sha1(np.asarray(vector, dtype=np.float32).tobytes()).hexdigest()[:16]
+
+
+def prompt_key(messages) -> str:
+    """LLM 입력의 사용자 프롬프트(첫 HumanMessage) 해시. 시스템 프롬프트와 이후 메시지는 보지 않는다."""
+    for m in messages:
+        if getattr(m, "type", None) == "human":
+            content = m.content if isinstance(m.content, str) else json.dumps(m.content, ensure_ascii=False)
+            return text_key(content)
+    return text_key("")
+
+
+def compact_matches(res) -> list:
+    matches = res.get("matches", []) if isinstance(res, dict) else getattr(res, "matches", [])
+    out = []
+    for m in matches:
+        md = (m.get("metadata") if isinstance(m, dict) else getattr(m, "metadata", None)) or {}
+        out.append({
+            "id": m["id"] if isinstance(m, dict) else m.id,
+            "score": round(float(m["score"] if isinstance(m, dict) else m.score), 5),
+            "metadata": {k: md[k] for k in MATCH_FIELDS if k in md},
+        })
+    return out
+
+
+class Recorder:
+    def __init__(self, path: str):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self._file = open(path, "a", encoding="utf-8")
+        self._lock = threading.Lock()
+        self.counts = {}
+
+    def write(self, event: dict) -> None:
+        line = json.dumps(event, ensure_ascii=False, default=str)
+        with self._lock:
+            if self._file.closed:
+                return
+            self._file.write(line + "\n")
+            self._file.flush()
+            self.counts[event["type"]] = self.counts.get(event["type"], 0) + 1
+
+    def close(self) -> None:
+        with self._lock:
+            self._file.close()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"path": self.path, **self.counts}
+
+
+def _ms(start: float) -> float:
+    return round((time.perf_counter() - start) * 1000, 2)
+
+
+class RecordingLLM:
+    """ChatAnthropic(또는 bind_tools 결과)을 감싼다. draft 는 llm, final 은 llm_with_tools 를 쓴다."""
+
+    def __init__(self, inner, recorder: Recorder, stage: str = "draft"):
+        self.inner, self.recorder, self.stage = inner, recorder, stage
+
+    def bind_tools(self, tools, **kwargs):
+        return RecordingLLM(self.inner.bind_tools(tools, **kwargs), self.recorder, "final")
+
+    def _record(self, messages, resp, start: float) -> None:
+        self.recorder.write({
+            "type": "llm", "stage": self.stage, "key": prompt_key(messages), "content": resp.content,
+            "usage": getattr(resp, "usage_metadata", None), "ms": _ms(start),
+        })
+
+    def invoke(self, messages, *args, **kwargs):
+        start = time.perf_counter()
+        resp = self.inner.invoke(messages, *args, **kwargs)
+        self._record(messages, resp, start)
+        return resp
+
+    async def ainvoke(self, messages, *args, **kwargs):
+        start = time.perf_counter()
+        resp = await self.inner.ainvoke(messages, *args, **kwargs)
+        self._record(messages, resp, start)
+        return resp
+
+
+class RecordingEmbeddings:
+    def __init__(self, inner, recorder: Recorder):
+        self.inner, self.recorder = inner, recorder
+
+    def embed_query(self, text: str):
+        start = time.perf_counter()
+        vector = self.inner.embed_query(text)
+        self.recorder.write({"type": "embed", "key": text_key(text), "vector_key": vector_key(vector), "ms": _ms(start)})
+        return vector
+
+    def embed_documents(self, texts):
+        return self.inner.embed_documents(texts)
+
+
+class RecordingIndex:
+    def __init__(self, inner, recorder: Recorder):
+        self.inner, self.recorder = inner, recorder
+
+    def query(self, vector=None, top_k: int = 3, **kwargs):
+        start = time.perf_counter()
+        res = self.inner.query(vector=vector, top_k=top_k, **kwargs)
+        self.recorder.write({"type": "query", "vector_key": vector_key(vector), "top_k": top_k,
+                             "matches": compact_matches(res), "ms": _ms(start)})
+        return res
+
+    def __getattr__(self, name):
+        # upsert / update / delete / describe_index_stats 는 그대로 넘긴다
+        return getattr(self.inner, name)
+
+
+_active: Optional[Recorder] = None
+
+
+def active() -> Optional[Recorder]:
+    return _active
+
+
+def record_request(state: dict) -> None:
+    if _active is None:
+        return
+    _active.write({"type": "request", "persona": state["persona"], "input_mode": state["input_mode"],
+                   "log": state.get("log_text") or "", "code": state.get("code_text") or ""})
+
+
+def install(recorder: Recorder) -> Recorder:
+    """LLM / Bedrock 임베딩 / Pinecone 인덱스 싱글톤을 녹화 래퍼로 바꿔 끼운다. (클라이언트를 먼저 만든다)"""
+    global _active
+    from dev.app.llm import agent_with_graph as ag
+    from dev.app.llm import tools
+
+    llm, llm_with_tools = ag.get_llm(), ag.get_llm_with_tools()
+    ag.llm = RecordingLLM(llm, recorder, "draft")
+    ag.llm_with_tools = RecordingLLM(llm_with_tools, recorder, "final")
+    embedder = tools.get_embedder()
+    embedder.inner = RecordingEmbeddings(embedder.inner, recorder)
+    tools._pinecone_index = RecordingIndex(tools.get_pinecone_index(), recorder)
+    _active = recorder
+    print(f"⏺️ [Recorder] {recorder.path} 에 녹화 시작")
+    return recorder
+
+
+def uninstall() -> None:
+    global _active
+    if _active is not None:
+        _active.close()
+        _active = None
@@ -8,9 +8,18 @@ LangGraph Agent에서 사용하는 외부 Tool 정의 모듈.
 
 현재 포함된 Tool:
 - rag_search:
-    Pinecone 벡터 DB를 사용해
+    Pinecone 벡터 DB(또는 로컬 스냅샷 인덱스)를 사용해
     에러 로그 / 코드 / 질문과 관련된 지식(KB)을 검색한다.
 
+검색 저장소 선택 (RAG_BACKEND):
+- pinecone (기본): Pinecone만 사용
+- local: LOCAL_INDEX_PATH 의 로컬 인덱스만 사용 (오프라인/테스트)
+- local_fallback: Pinecone 우선, 실패하면 로컬 인덱스
+
+로컬 스냅샷이 있으면 같은 청크에 대한 BM25 검색을 먼저 수행한다 (RAG_HYBRID=0 으로 끔).
+질의의 에러 코드를 모두 포함한 청크가 1위면 임베딩 호출 없이 바로 돌려주고,
+아니면 벡터 결과와 RRF로 합친다.
+
 역할 분리 원칙:
 - Agent(LLM)는 '언제 검색할지'만 판단한다.
 - tools.py는 '어떻게 검색할지'만 책임진다.
@@ -19,12 +28,18 @@ import os
 from dotenv import load_dotenv
 load_dotenv()
 import sys
-from langchain_aws import BedrockEmbeddings
-from pinecone import Pinecone
 from langchain_core.tools import tool
 from typing import Optional
-
-_embedder: Optional[BedrockEmbeddings] = None
+from dev.app.fingerprint import canonical_error
+from dev.app.metrics import stage_timer, timed
+from dev.app.llm.embedding_cache import CachedEmbeddings, EmbeddingCache, embedding_cache_from_env
+from dev.app.llm.local_index import LocalIndex
+from dev.app.llm.lexical_index import BM25Index, confident_hits, rrf_fuse
+
+_embedder: Optional[CachedEmbeddings] = None
+_embedding_cache: Optional[EmbeddingCache] = None
+_local_index: Optional[LocalIndex] = None
+_lexical_index: Optional[BM25Index] = None
 _pinecone_index = None
 _namespace: Optional[str] = None
 
@@ -37,20 +52,30 @@ def _require_env(name: str) -> str:
         )
     return v
 
-def get_embedder() -> BedrockEmbeddings:
+def get_embedding_cache() -> EmbeddingCache:
+    """임베딩 캐시 (EMBEDDING_CACHE_SIZE, EMBEDDING_CACHE_PATH). Bedrock 클라이언트 없이도 통계 조회 가능."""
+    global _embedding_cache
+    if _embedding_cache is None:
+        _embedding_cache = embedding_cache_from_env()
+    return _embedding_cache
+
+def get_embedder() -> CachedEmbeddings:
+    """BedrockEmbeddings 를 임베딩 캐시로 감싼 싱글톤. 같은 텍스트는 Bedrock을 다시 호출하지 않는다."""
     global _embedder
     if _embedder is not None:
         return _embedder
 
     model_id = _require_env("BEDROCK_EMBEDDING_MODEL_ID")
     region = _require_env("AWS_REGION")
+    from langchain_aws import BedrockEmbeddings  # import 비용이 커서 처음 쓸 때 불러온다
 
-    _embedder = BedrockEmbeddings(
+    bedrock = BedrockEmbeddings(
         model_id=model_id,
         region_name=region,
         aws_access_key_id=os.getenv("AWS_ACCESS_KEY_ID"),
         aws_secret_access_key=os.getenv("AWS_SECRET_ACCESS_KEY"),
     )
+    _embedder = CachedEmbeddings(bedrock, model_id, get_embedding_cache())
     return _embedder
 
 
@@ -62,34 +87,133 @@ def get_pinecone_index():
     api_key = _require_env("PINECONE_API_KEY")
     index_name = _require_env("PINECONE_INDEX")
     _namespace = os.getenv("PINECONE_NAMESPACE", "dev")
+    from pinecone import Pinecone
 
     pc = Pinecone(api_key=api_key)
     _pinecone_index = pc.Index(index_name)
     return _pinecone_index
 
+def get_local_index() -> LocalIndex:
+    """LOCAL_INDEX_PATH(기본 data/local_index) 스냅샷을 mmap으로 한 번만 연다."""
+    global _local_index
+    if _local_index is None:
+        path = os.getenv("LOCAL_INDEX_PATH", "data/local_index")
+        if not os.path.exists(os.path.join(path, "manifest.json")):
+            raise RuntimeError(
+                f"Local index snapshot not found at {path}. "
+                f"Build it with `python -m dev.app.llm.local_index build|sync`."
+            )
+        _local_index = LocalIndex.load(path)
+    return _local_index
+
+def get_lexical_index() -> Optional[BM25Index]:
+    """로컬 스냅샷의 청크 텍스트로 만든 BM25 색인. 스냅샷이 없거나 RAG_HYBRID=0 이면 None."""
+    global _lexical_index
+    if os.getenv("RAG_HYBRID", "1") == "0":
+        return None
+    if _lexical_index is None:
+        try:
+            local = get_local_index()
+        except RuntimeError:
+            return None
+        _lexical_index = BM25Index.from_local_index(local)
+    return _lexical_index
+
+def warmup() -> dict:
+    """RAG_BACKEND 에 필요한 클라이언트/인덱스를 미리 열어 둔다. 단계별 소요 시간(ms)을 돌려준다.
+
+    - pinecone: describe_index_stats() 한 번으로 HTTP 커넥션 풀을 연다.
+    - local: 스냅샷 mmap + float32 작업 사본 + BM25 색인
+    - WARMUP_EMBED=1 이면 짧은 질의를 임베딩해 Bedrock 커넥션도 미리 연다. (호출 비용이 있어 기본은 끔)
+    """
+    import time
+
+    timings = {}
+
+    def step(name, fn):
+        start = time.perf_counter()
+        fn()
+        timings[name] = round((time.perf_counter() - start) * 1000, 1)
+
+    backend = os.getenv("RAG_BACKEND", "pinecone")
+    step("embedder", get_embedder)
+    if backend in ("local", "local_fallback") or os.path.exists(
+            os.path.join(os.getenv("LOCAL_INDEX_PATH", "data/local_index"), "manifest.json")):
+        step("local_index", lambda: get_local_index().warm())
+        step("lexical_index", get_lexical_index)
+    if backend != "local":
+        step("pinecone", lambda: get_pinecone_index().describe_index_stats())
+    if os.getenv("WARMUP_EMBED", "0") == "1":
+        step("embed_query", lambda: get_embedder().embed_query("warmup"))
+    return timings
+
+def mirror_upsert(vectors: list) -> None:
+    """Pinecone에 올린 벡터를 (이미 열려 있는) 로컬 인덱스와 BM25 색인에도 반영한다."""
+    global _lexical_index
+    if _local_index is not None:
+        _local_index.upsert(vectors)
+    lexical = _lexical_index
+    if lexical is not None:
+        if any(id_ in lexical for id_, _, _ in vectors):
+            _lexical_index = None  # 기존 문서가 바뀌었으면 다음 검색 때 로컬 인덱스에서 다시 만든다
+        else:
+            lexical.add((id_, md.get("text", ""), md) for id_, _, md in vectors if md and md.get("text"))
+
+def query_index(qvec: list, top_k: int) -> dict:
+    backend = os.getenv("RAG_BACKEND", "pinecone")
+    if backend == "local":
+        return get_local_index().query(vector=qvec, top_k=top_k, include_metadata=True)
+    try:
+        index = get_pinecone_index()
+        return index.query(vector=qvec, top_k=top_k, namespace=_namespace or "dev", include_metadata=True)
+    except Exception as e:
+        if backend != "local_fallback":
+            raise
+        print(f"⚠️ [RAG] Pinecone 조회 실패, 로컬 인덱스 사용: {e}")
+        return get_local_index().query(vector=qvec, top_k=top_k, include_metadata=True)
+
+@timed("rag_search")
 def rag_search(query: str, top_k: int = 3) -> str:
     """
     RAG 검색 도구
     - query: 사용자 질문 또는 에러 시그니처
     - return: LLM 프롬프트에 바로 넣을 수 있는 문자열
+
+    로그가 그대로 들어오면 타임스탬프/ID 같은 잡음 대신
+    예외 헤더 + 상위 프레임(canonical error)으로 임베딩한다.
     """
-    embedder = get_embedder()
-    index = get_pinecone_index()
-    qvec = embedder.embed_query(query)
-    namespace = _namespace or "dev"
-
-    res = index.query(
-        vector=qvec,
-        top_k=top_k,
-        namespace=namespace,
-        include_metadata=True,
-    )
+    text = canonical_error(query)
+
+    lexical = get_lexical_index()
+    with stage_timer("rag_lexical"):
+        lex_hits = lexical.search(text, top_k) if lexical is not None else []
+    exact = confident_hits(text, lex_hits)
+    if exact:
+        print(f"[RAG] lexical exact match ({', '.join(sorted(exact[0].matched_codes))}), skip embedding")
+        return format_matches([(h.id, h.score, h.metadata) for h in exact], label="exact code match")
 
+    embedder = get_embedder()
+    with stage_timer("rag_embed"):
+        qvec = embedder.embed_query(text)
+    with stage_timer("rag_query"):
+        res = query_index(qvec, top_k)
+    matches = [(m["id"], m["score"], m.get("metadata", {}) or {}) for m in res["matches"]]
+    if lex_hits:
+        # RRF 점수(1/(k+rank) 합)는 코사인과 척도가 달라 순위로만 보여 준다
+        fused = rrf_fuse([[(i, md) for i, _, md in matches], [(h.id, h.metadata) for h in lex_hits]], top_k)
+        return format_matches(fused, label="hybrid")
+    return format_matches(matches)
+
+def format_matches(matches: list, label: Optional[str] = None) -> str:
+    """검색 결과를 프롬프트용 문자열로 만든다.
+
+    label 이 없으면 score 는 코사인 유사도. BM25/RRF 처럼 척도가 다른 결과는 점수 대신 "#순위 label" 로 적는다.
+    """
     chunks = []
-    for m in res["matches"]:
-        md = m.get("metadata", {}) or {}
+    for rank, (_id, score, md) in enumerate(matches, 1):
+        head = f"#{rank} {label}" if label else f"{score:.3f}"
         chunks.append(
-            f"- ({m['score']:.3f}) {md.get('source','?')}#{md.get('chunk_index','?')}\n"
+            f"- ({head}) {md.get('source','?')}#{md.get('chunk_index','?')}\n"
             f"{md.get('text','')}"
         )
 
@@ -1,14 +1,32 @@
+import time
+_STARTED = time.perf_counter()
+
 import sys
 import os
 import re
-import uuid
-from fastapi import FastAPI, HTTPException
+import json
+import asyncio
+import codecs
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
-from typing import Optional, Literal
+from typing import Optional, Literal, List, Tuple, Union
 from dotenv import load_dotenv
 
 # 가역적 마스킹 매니저 임포트
-from dev.app.masking import MaskingManager
+from dev.app.masking import ChunkedMasker, MaskingManager
+from dev.app.masking_rules import default_registry
+from dev.app.concurrency import AnalysisBusyError, limiter_from_env
+from dev.app.cache import analysis_cache_key, cache_from_env
+from dev.app.condenser import condense_lines, condense_log
+from dev.app.fingerprint import fingerprint
+from dev.app import metrics
+from dev.app.response_parser import FIELDS, parse_response
+from dev.app.save_queue import Contribution, SaveQueueFullError, contribution_id, save_queue_from_env
+from dev.app.streaming import (
+    STREAM_FIELDS, JsonFieldStreamParser, StreamingUnmasker, chunk_text, format_sse,
+)
 
 load_dotenv()
 
@@ -19,13 +37,81 @@ if root_dir not in sys.path:
     sys.path.insert(0, root_dir)
 
 try:
-    from dev.app.llm.agent_with_graph import app as app_graph
-    from dev.app.llm.tools import get_embedder, get_pinecone_index
+    from dev.app.llm import agent_with_graph
+    from dev.app.llm import tools as llm_tools
+    from dev.app.llm.tools import get_embedder, get_embedding_cache, get_pinecone_index, mirror_upsert
+    from dev.app.llm.prompts import prompt_version
+    from dev.app.llm.answer_store import get_answer_store
+    from dev.app.llm import recorder
 except ImportError as e:
     print(f"❌ Import Error: {e}")
     raise
 
-app = FastAPI()
+# 컴파일된 LangGraph. 첫 요청 또는 기동 warmup 때 만든다. (테스트는 monkeypatch 로 바꿔 끼운다)
+app_graph = None
+
+def get_app_graph():
+    global app_graph
+    if app_graph is None:
+        app_graph = agent_with_graph.get_app()
+    return app_graph
+
+# /ready 가 보고하는 기동 상태
+readiness = {"ready": False, "startup_ms": None, "warmup_ms": {}, "errors": {}}
+
+def warmup() -> None:
+    """그래프 컴파일 + LLM 클라이언트, RAG 클라이언트/인덱스 준비 (WARMUP_ON_STARTUP=0 이면 건너뜀).
+
+    그래프가 준비되면 ready. RAG 쪽 실패는 errors 에만 남긴다 (rag_search 는 초안이 불확실할 때만 쓰이므로).
+    """
+    start = time.perf_counter()
+    try:
+        agent_with_graph.warmup()
+        get_app_graph()
+        readiness["warmup_ms"]["graph"] = round((time.perf_counter() - start) * 1000, 1)
+    except Exception as e:
+        readiness["errors"]["graph"] = str(e)
+        print(f"❌ [Warmup] graph: {e}")
+        return
+    try:
+        readiness["warmup_ms"].update(llm_tools.warmup())
+    except Exception as e:
+        readiness["errors"]["rag"] = str(e)
+        print(f"⚠️ [Warmup] rag: {e}")
+    readiness["ready"] = True
+    readiness["startup_ms"] = round((time.perf_counter() - _STARTED) * 1000, 1)
+    print(f"✅ [Warmup] ready in {readiness['startup_ms']}ms {readiness['warmup_ms']}")
+
+@asynccontextmanager
+async def lifespan(_: FastAPI):
+    if os.getenv("RECORD_PATH"):
+        # 부하 테스트용 녹화 (llm/recorder.py). 클라이언트를 먼저 만들어야 해서 기동 중에 설치한다.
+        await asyncio.to_thread(recorder.install, recorder.Recorder(os.getenv("RECORD_PATH")))
+    if os.getenv("WARMUP_ON_STARTUP", "1") == "1":
+        # 워밍업은 백그라운드로 돌리고, 끝나기 전까지 /ready 는 503 을 돌려준다.
+        task = asyncio.create_task(asyncio.to_thread(warmup))
+    else:
+        task = None
+        readiness["ready"] = True
+        readiness["startup_ms"] = round((time.perf_counter() - _STARTED) * 1000, 1)
+    yield
+    if task is not None and not task.done():
+        task.cancel()
+    # 종료 전에 대기 중인 기여를 쓴다 (write-behind)
+    if not await asyncio.to_thread(save_queue.close, float(os.getenv("SAVE_QUEUE_SHUTDOWN_TIMEOUT", "10"))):
+        print(f"⚠️ [SaveQueue] 종료 시 미저장 {save_queue.stats()['depth']}건")
+    recorder.uninstall()
+
+app = FastAPI(lifespan=lifespan)
+
+# 워커당 동시 분석 수 / 대기열 길이 제한 (ANALYZE_MAX_CONCURRENCY, ANALYZE_MAX_QUEUE)
+analysis_limiter = limiter_from_env()
+
+# 마스킹된 입력 기준 결과 캐시 (ANALYSIS_CACHE_SIZE, ANALYSIS_CACHE_TTL, ANALYSIS_CACHE_PATH)
+analysis_cache = cache_from_env()
+# fingerprint: 타임스탬프/PID/줄번호 등 잡음만 제거한 에러 시그니처(full_signature: 모든 헤더/에러 줄)로 키를 만든다.
+# exact: 마스킹된 원문 그대로
+CACHE_KEY_MODE = os.getenv("ANALYSIS_CACHE_KEY_MODE", "fingerprint")
 
 class AnalyzeRequest(BaseModel):
     persona: Literal["junior", "senior"]
@@ -37,6 +123,13 @@ class AnalyzeResponse(BaseModel):
     cause: str
     solution: str
     prevention: str
+    # 응답을 만든 경로: cache / fast_path(검증 답변) / draft / final
+    served_by: Optional[str] = None
+    # 로그 압축 전/후 크기 (original_chars, condensed_chars, original_tokens, condensed_tokens, ...)
+    metadata: Optional[dict] = None
+
+class BatchAnalyzeRequest(BaseModel):
+    items: List[AnalyzeRequest]
 
 class SaveRequest(BaseModel):
     persona: str
@@ -44,123 +137,468 @@ class SaveRequest(BaseModel):
     code: str
     cause: str
     solution: str
+    prevention: Optional[str] = ""
+
+def make_state(persona: str, input_mode: str, masked_log: Union[str, List[str]], masked_code: str) -> Tuple[dict, dict]:
+    """마스킹된 입력으로 그래프 초기 상태를 만든다. 로그는 input_mode별 토큰 예산에 맞게 압축된다.
+
+    masked_log 는 문자열 또는 줄 목록(업로드 경로). (초기 상태, 응답 metadata) 를 돌려준다.
+    """
+    with metrics.stage_timer("condense"):
+        if isinstance(masked_log, list):
+            condensed = condense_lines(masked_log, input_mode)
+        else:
+            condensed = condense_log(masked_log, input_mode)
+    if condensed.condensed_chars != condensed.original_chars:
+        print(f"🗜️ [Condense] ~{condensed.original_tokens} → ~{condensed.condensed_tokens} tokens "
+              f"({condensed.original_lines} → {condensed.condensed_lines} lines)")
+    state = {
+        "messages": [],
+        "persona": persona,
+        "input_mode": input_mode,
+        "log_text": condensed.text,
+        "code_text": masked_code
+    }
+    recorder.record_request(state)  # RECORD_PATH 녹화 중일 때만 (마스킹/압축 후 입력)
+    return state, condensed.metadata()
+
+def build_initial_state(req: AnalyzeRequest, masker: MaskingManager) -> Tuple[dict, dict]:
+    """요청을 정제/마스킹/압축해 그래프 초기 상태와 metadata를 만든다."""
+    # 1. 입력 정제 및 400 에러 방지 (None 텍스트 할당)
+    raw_log = (req.error_log or "").strip()
+    raw_code = (req.code or "").strip()
+    
+    log_content = raw_log if raw_log else "No log content provided"
+    code_content = raw_code if raw_code else "No code content provided"
+    
+    # 마스킹 수행
+    masked_log = masker.mask(log_content).strip()
+    masked_code = masker.mask(code_content).strip()
+
+    return make_state(req.persona, req.input_mode, masked_log, masked_code)
+
+def message_text(message) -> str:
+    # [수정] 리스트 형태의 content 에러 해결 로직
+    response_content = message.content
+    if isinstance(response_content, list):
+        raw_text = ""
+        for block in response_content:
+            if isinstance(block, dict) and "text" in block:
+                raw_text += block["text"]
+            elif hasattr(block, "text"):
+                raw_text += block.text
+            else:
+                raw_text += str(block)
+        return raw_text
+    return str(response_content).strip()
+
+EXTRACT_FAILED = "[{field}] 분석 내용을 추출할 수 없습니다."
+
+# 3. 응답 파싱 (결과는 마스킹된 상태 그대로) - 전략: json → json_tolerant → keyword
+def extract_fields(text: str) -> dict:
+    """응답 텍스트에서 세 필드를 마스킹된 상태로 한 번에 추출한다. (캐시에는 이 값이 들어간다)"""
+    parsed = parse_response(text)
+    if parsed.strategy != "json":
+        print(f"⚠️ [Parser] strategy={parsed.strategy} missing={parsed.missing}")
+    return {f: parsed.fields.get(f, EXTRACT_FAILED.format(field=f)) for f in FIELDS}
+
+def robust_extract(field: str, text: str) -> str:
+    return extract_fields(text)[field]
+
+def robust_extract_and_unmask(field: str, text: str, masker: MaskingManager) -> str:
+    return masker.unmask(robust_extract(field, text))
+
+def unmask_fields(fields: dict, masker: MaskingManager) -> dict:
+    return {k: masker.unmask(v) for k, v in fields.items()}
+
+_PLACEHOLDER = re.compile(r'\[([A-Z][A-Z0-9]*(?:_[A-Z0-9]+)*_\d+)\]')
+
+def placeholder_order(masked_text: str) -> List[str]:
+    """마스킹된 텍스트에 처음 등장하는 순서대로의 플레이스홀더 목록. (중복 제거)"""
+    return list(dict.fromkeys(_PLACEHOLDER.findall(masked_text or "")))
+
+def cache_key_for(initial_state: dict) -> str:
+    persona, mode = initial_state["persona"], initial_state["input_mode"]
+    log_key = initial_state["log_text"]
+    if CACHE_KEY_MODE == "fingerprint":
+        # 캐시된 답변 속 플레이스홀더([IP_ADDR_1] 등)는 요청마다 자기 매핑으로 언마스킹된다.
+        # 시그니처가 같아도 플레이스홀더 구성/순서가 다르면 남의 값이나 풀리지 않은 토큰이 나가므로 키에 넣는다.
+        log_key = "fp:" + fingerprint(log_key).full_signature + ":" + ",".join(placeholder_order(log_key))
+    return analysis_cache_key(
+        log_key, initial_state["code_text"], persona, mode,
+        os.getenv("ANTHROPIC_MODEL_ID", ""), prompt_version(persona, mode),
+    )
+
+def served_by(final_state: dict) -> str:
+    return final_state.get("served_by") or "graph"
+
+def is_cacheable(fields: dict) -> bool:
+    # 추출에 실패한 필드가 있으면 다음 요청에서 다시 시도하도록 캐시하지 않는다.
+    return all(v != EXTRACT_FAILED.format(field=k) for k, v in fields.items())
+
+async def run_analysis(req: AnalyzeRequest) -> dict:
+    """요청 하나를 마스킹 → (캐시 조회) → 그래프 실행 → 추출/언마스킹까지 처리한다."""
+    masker = MaskingManager()
+    initial_state, metadata = build_initial_state(req, masker)
+    return await run_masked_analysis(initial_state, masker, metadata)
+
+@metrics.timed("analyze")
+async def run_masked_analysis(initial_state: dict, masker: MaskingManager, metadata: Optional[dict] = None) -> dict:
+    key = cache_key_for(initial_state)
+    cached = await analysis_cache.aget(key)
+    if cached is not None:
+        metrics.analysis_total.inc(served_by="cache")
+        return {**unmask_fields(cached, masker), "served_by": "cache", "metadata": metadata}
+
+    # LLM 호출 (비동기 그래프 실행 + 동시 실행 제한)
+    async with analysis_limiter.slot():
+        final_state = await get_app_graph().ainvoke(initial_state)
+    raw_text = message_text(final_state["messages"][-1])
+    served = served_by(final_state)
+
+    # 응답 전문은 RESPONSE_LOG_SAMPLE 비율만 남긴다 (마스킹된 상태)
+    metrics.log_sampled("llm_response", served_by=served, persona=initial_state["persona"],
+                        input_mode=initial_state["input_mode"], response=raw_text)
+
+    fields = extract_fields(raw_text)
+    if is_cacheable(fields):
+        await analysis_cache.aset(key, fields)
+    metrics.analysis_total.inc(served_by=served)
+    return {**unmask_fields(fields, masker), "served_by": served, "metadata": metadata}
 
 @app.post("/analyze/log", response_model=AnalyzeResponse)
 async def analyze_log(req: AnalyzeRequest):
     try:
         print(f"🚀 분석 요청 수신: {req.input_mode} 모드")
-        masker = MaskingManager()
-        
-        # 1. 입력 정제 및 400 에러 방지 (None 텍스트 할당)
-        raw_log = (req.error_log or "").strip()
-        raw_code = (req.code or "").strip()
-        
-        log_content = raw_log if raw_log else "No log content provided"
-        code_content = raw_code if raw_code else "No code content provided"
-        
-        # 마스킹 수행
-        masked_log = masker.mask(log_content).strip()
-        masked_code = masker.mask(code_content).strip()
-
-        initial_state = {
-            "messages": [], 
-            "persona": req.persona,
-            "input_mode": req.input_mode,
-            "log_text": masked_log,
-            "code_text": masked_code
-        }
-        
-        # 2. LLM 호출
-        final_state = app_graph.invoke(initial_state)
-        
-        # [수정] 리스트 형태의 content 에러 해결 로직
-        response_content = final_state["messages"][-1].content
-        if isinstance(response_content, list):
-            raw_text = ""
-            for block in response_content:
-                if isinstance(block, dict) and "text" in block:
-                    raw_text += block["text"]
-                elif hasattr(block, "text"):
-                    raw_text += block.text
-                else:
-                    raw_text += str(block)
-        else:
-            raw_text = str(response_content).strip()
-
-        # 터미널에서 LLM의 실제 답변을 확인하기 위한 로그
-        print("\n" + "="*30 + " [LLM RESPONSE] " + "="*30)
-        print(raw_text)
-        print("="*76 + "\n")
-
-        # 3. 공격적 추출 및 언마스킹 함수
-        def robust_extract_and_unmask(field, text):
-            # 문자열 안전 장치
-            if not isinstance(text, str):
-                text = str(text)
-                
-            # 패턴 1: 표준 JSON 또는 마크다운 형식
-            patterns = [
-                rf'"{field}"\s*:\s*"(.*?)"(?=\s*,\s*"|\s*}}\s*$|\s*}}?\s*```|$)',
-                rf'"{field}"\s*:\s*(.*?)(?=\n\s*"\w+"|$)',
-                rf'\*\*{field}\*\*[:\s]+(.*?)(?=\n\*\*|$)',
-                rf'{field}[:\s]+(.*?)(?=\n\w+[:\s]|$)'
-            ]
-            
-            for pattern in patterns:
-                m = re.search(pattern, text, re.DOTALL | re.IGNORECASE)
-                if m:
-                    val = m.group(1).strip().strip('"').replace('\\n', '\n').replace('\\"', '"')
-                    if len(val) > 2:
-                        return masker.unmask(val)
-            
-            # 패턴 2: 키워드 기반 강제 슬라이싱 (패턴 매칭 실패 시)
+        return await run_analysis(req)
+
+    except AnalysisBusyError as e:
+        print(f"⏳ [Busy] {str(e)}")
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+    except Exception as e:
+        print(f"❌ [Server Error] {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "500"))
+BATCH_MAX_PARALLEL = int(os.getenv("BATCH_MAX_PARALLEL", "8"))
+
+def batch_key(item: AnalyzeRequest) -> tuple:
+    # 앞뒤 공백만 다른 입력은 같은 분석으로 취급
+    return (item.persona, item.input_mode, (item.error_log or "").strip(), (item.code or "").strip())
+
+async def stream_batch(items: List[AnalyzeRequest]):
+    """중복 제거 후 고유 입력만 병렬 분석하고, 끝나는 순서대로 NDJSON 라인을 흘려보낸다."""
+    groups = {}
+    for i, item in enumerate(items):
+        groups.setdefault(batch_key(item), []).append(i)
+
+    sem = asyncio.Semaphore(max(1, BATCH_MAX_PARALLEL))
+
+    async def worker(key, first_index):
+        async with sem:
             try:
-                lower_text = text.lower()
-                field_lower = field.lower()
-                if field_lower in lower_text:
-                    idx = lower_text.find(field_lower) + len(field_lower)
-                    sub = text[idx:].lstrip(' :"\n')
-                    stop_words = ["solution", "prevention", "cause", "원인", "해결", "방지"]
-                    end_idx = len(sub)
-                    for word in stop_words:
-                        found = sub.lower().find(word)
-                        if 0 < found < end_idx:
-                            end_idx = found
-                    
-                    final_val = sub[:end_idx].strip(' ,}"\n')
-                    if len(final_val) > 2:
-                        return masker.unmask(final_val)
-            except:
-                pass
-
-            return f"[{field}] 분석 내용을 추출할 수 없습니다."
-
-        return {
-            "cause": robust_extract_and_unmask("cause", raw_text),
-            "solution": robust_extract_and_unmask("solution", raw_text),
-            "prevention": robust_extract_and_unmask("prevention", raw_text)
-        }
+                return key, await run_analysis(items[first_index]), None
+            except Exception as e:
+                print(f"❌ [Batch Item Error] #{first_index}: {str(e)}")
+                return key, None, str(e)
 
+    tasks = [asyncio.create_task(worker(key, indices[0])) for key, indices in groups.items()]
+    ok = failed = 0
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            key, result, error = await next_done
+            for n, index in enumerate(groups[key]):
+                line = {"type": "item", "index": index, "deduplicated": n > 0}
+                if error is None:
+                    ok += 1
+                    line.update(status="ok", result=result)
+                else:
+                    failed += 1
+                    line.update(status="error", error=error)
+                yield json.dumps(line, ensure_ascii=False) + "\n"
+
+        summary = {"type": "summary", "total": len(items), "unique": len(groups), "ok": ok, "error": failed}
+        yield json.dumps(summary, ensure_ascii=False) + "\n"
+    finally:
+        # 클라이언트가 중간에 끊으면 남은 분석은 취소
+        for task in tasks:
+            task.cancel()
+
+UPLOAD_MAX_BYTES = int(os.getenv("UPLOAD_MAX_BYTES", str(50 * 1024 * 1024)))
+
+async def mask_request_body(request: Request, masker: MaskingManager) -> List[str]:
+    """
+    요청 본문을 조각 단위로 받아 디코딩 → 마스킹 → 줄 단위로 나눈다.
+    원본 로그 전체를 한 번에 메모리에 올리지 않고, 마스킹된 결과도 하나의 문자열로 붙이지 않는다.
+    (압축 단계가 로그 전체를 보아야 하므로 줄 목록은 끝까지 모은다. 앞뒤 빈 줄/공백은 제거)
+    """
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    chunked = ChunkedMasker(masker)
+    lines: List[str] = []
+    # 아직 줄바꿈을 만나지 않은 마지막 줄의 조각들. 줄이 끝날 때만 붙인다.
+    # (조각마다 pending + piece 를 다시 만들면 줄바꿈 없는 긴 본문에서 O(n²) 복사가 된다)
+    pending: List[str] = []
+
+    def take(piece: str) -> None:
+        if not piece:
+            return
+        segments = piece.splitlines(keepends=True)
+        for k, segment in enumerate(segments):
+            pending.append(segment)
+            ended = len(segment.splitlines()[0]) < len(segment)
+            # 조각 끝의 "\r" 은 다음 조각이 "\n" 으로 시작할 수 있으므로(CRLF) 아직 줄이 끝난 것으로 보지 않는다
+            if ended and not (k == len(segments) - 1 and segment.endswith("\r")):
+                lines.extend("".join(pending).splitlines())
+                pending.clear()
+
+    received = 0
+    async for data in request.stream():
+        received += len(data)
+        if received > UPLOAD_MAX_BYTES:
+            raise HTTPException(status_code=413, detail=f"log is too large (max {UPLOAD_MAX_BYTES} bytes)")
+        take(chunked.feed(decoder.decode(data)))
+    take(chunked.feed(decoder.decode(b"", final=True)))
+    take(chunked.flush())
+    if pending:
+        lines.extend("".join(pending).splitlines())
+
+    while lines and not lines[-1].strip():
+        lines.pop()
+    start = next((i for i, line in enumerate(lines) if line.strip()), len(lines))
+    del lines[:start]
+    if lines:
+        lines[0], lines[-1] = lines[0].lstrip(), lines[-1].rstrip()
+    return lines
+
+@app.post("/analyze/log/upload", response_model=AnalyzeResponse)
+async def analyze_log_upload(request: Request, persona: Literal["junior", "senior"] = "junior"):
+    """
+    대용량 로그 업로드용 /analyze/log. 본문은 로그 원문(text/plain)이며 input_mode는 log로 고정된다.
+    본문을 조각 단위로 마스킹하므로 원본 로그 사본이 여러 벌 생기지 않는다.
+    """
+    try:
+        print(f"🚀 업로드 분석 요청 수신: {request.headers.get('content-length', '?')} bytes")
+        masker = MaskingManager()
+        masked_lines = await mask_request_body(request, masker)
+        initial_state, metadata = make_state(persona, "log", masked_lines or ["No log content provided"],
+                                             "No code content provided")
+        return await run_masked_analysis(initial_state, masker, metadata)
+
+    except HTTPException:
+        raise
+    except AnalysisBusyError as e:
+        print(f"⏳ [Busy] {str(e)}")
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
     except Exception as e:
         print(f"❌ [Server Error] {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/analyze/batch")
+async def analyze_batch(req: BatchAnalyzeRequest):
+    """여러 AnalyzeRequest를 한 번에 분석한다. 결과는 항목별 NDJSON 라인으로 스트리밍된다."""
+    if not req.items:
+        raise HTTPException(status_code=400, detail="items is empty")
+    if len(req.items) > BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"too many items (max {BATCH_MAX_ITEMS})")
+
+    print(f"🚀 배치 분석 요청 수신: {len(req.items)}건")
+    return StreamingResponse(stream_batch(req.items), media_type="application/x-ndjson")
+
+async def stream_analysis(initial_state: dict, masker: MaskingManager, cache_key: str, metadata: Optional[dict] = None):
+    """
+    그래프를 스트리밍 실행하며 SSE 이벤트를 만든다.
+
+    limiter 슬롯은 제너레이터 안에서 점유/반환한다. 핸들러에서 미리 잡아 두면 첫 순회 전에 클라이언트가
+    끊겼을 때 finally 가 돌지 않아 슬롯이 영영 반환되지 않는다.
+
+    - stage: LLM 단계(draft/final)가 시작됨. 클라이언트는 이 때 필드 버퍼를 비운다.
+    - done:  최종 답변에서 추출한 cause/solution/prevention (권위 있는 결과) + served_by + metadata
+    - error: {"detail"} (슬롯을 얻지 못한 경우 {"detail", "retry_after"})
+    """
+    try:
+        await analysis_limiter.acquire()
+    except AnalysisBusyError as e:
+        print(f"⏳ [Busy] {str(e)}")
+        yield format_sse("error", {"detail": str(e), "retry_after": 1})
+        return
+
+    last_state = None
+    try:
+        stage = None
+        parser = None
+        unmaskers = {}
+        async for mode, chunk in get_app_graph().astream(initial_state, stream_mode=["messages", "values"]):
+            if mode == "values":
+                last_state = chunk
+                continue
+
+            message, metadata = chunk
+            node = metadata.get("langgraph_node")
+            if node not in ("draft", "final"):
+                continue
+            text = chunk_text(message.content)
+            if not text:
+                continue
+
+            if node != stage:
+                stage = node
+                parser = JsonFieldStreamParser()
+                unmaskers = {f: StreamingUnmasker(masker) for f in STREAM_FIELDS}
+                yield format_sse("stage", {"stage": stage})
+
+            for field, delta, finished in parser.feed(text):
+                out = unmaskers[field].feed(delta)
+                if finished:
+                    out += unmaskers[field].flush()
+                if out:
+                    yield format_sse("field", {"field": field, "delta": out})
+
+        for field, unmasker in unmaskers.items():
+            rest = unmasker.flush()
+            if rest:
+                yield format_sse("field", {"field": field, "delta": rest})
+
+        raw_text = message_text(last_state["messages"][-1]) if last_state and last_state.get("messages") else ""
+        fields = extract_fields(raw_text)
+        if is_cacheable(fields):
+            await analysis_cache.aset(cache_key, fields)
+        served = served_by(last_state or {})
+        metrics.analysis_total.inc(served_by=served)
+        yield format_sse("done", {**unmask_fields(fields, masker), "served_by": served, "metadata": metadata})
+    except Exception as e:
+        print(f"❌ [Stream Error] {str(e)}")
+        yield format_sse("error", {"detail": str(e)})
+    finally:
+        # 초안 뒤 tools 노드 전에 끊기면 맡겨 둔 추측 검색이 남는다 (정상 종료면 이미 꺼내 가서 no-op)
+        pending = agent_with_graph.discard_speculative((last_state or {}).get("rag_ticket"))
+        if pending is not None:
+            pending.cancel()
+        analysis_limiter.release()
+
+@app.post("/analyze/log/stream")
+async def analyze_log_stream(req: AnalyzeRequest):
+    """/analyze/log 의 SSE 버전. 토큰이 도착하는 대로 필드 조각을 흘려보낸다."""
+    print(f"🚀 스트리밍 분석 요청 수신: {req.input_mode} 모드")
+    masker = MaskingManager()
+    initial_state, metadata = build_initial_state(req, masker)
+
+    key = cache_key_for(initial_state)
+    cached = await analysis_cache.aget(key)
+    if cached is not None:
+        metrics.analysis_total.inc(served_by="cache")
+        done = {**unmask_fields(cached, masker), "served_by": "cache", "metadata": metadata}
+        return StreamingResponse(
+            iter([format_sse("stage", {"stage": "cache"}), format_sse("done", done)]),
+            media_type="text/event-stream",
+        )
+
+    return StreamingResponse(
+        stream_analysis(initial_state, masker, key, metadata),
+        media_type="text/event-stream",
+        # nginx 프록시 버퍼링을 꺼야 토큰이 바로 전달된다.
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@app.get("/health")
+async def health():
+    """프로세스 생존 확인 (liveness). 워밍업 여부와 무관하다."""
+    return {"status": "ok"}
+
+@app.get("/ready")
+async def ready():
+    """워밍업이 끝나야 200 (readiness). 그 전에는 503."""
+    if not readiness["ready"]:
+        raise HTTPException(status_code=503, detail=readiness)
+    return readiness
+
+@app.get("/analyze/status")
+async def analyze_status():
+    return analysis_limiter.stats()
+
+@app.get("/cache/stats")
+async def cache_stats():
+    return analysis_cache.stats()
+
+@app.get("/cache/embeddings/stats")
+async def embedding_cache_stats():
+    return get_embedding_cache().stats()
+
+@app.get("/fast_path/stats")
+async def fast_path_stats():
+    store = get_answer_store()
+    return store.stats() if store is not None else {"enabled": False}
+
+@app.get("/llm/usage")
+async def llm_usage():
+    """단계(draft/final)별 입력 토큰과 프롬프트 캐시 읽기/쓰기 누적."""
+    return agent_with_graph.usage_stats()
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    """Prometheus 스크레이프용 지표 (dev/app/metrics.py)."""
+    return PlainTextResponse(metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+@app.get("/masking/stats")
+async def masking_stats():
+    """활성 마스킹 규칙(우선순위 순)과 규칙별 적중 횟수."""
+    return default_registry().stats()
+
+def write_contributions(batch: List[Contribution]) -> None:
+    """SaveQueue writer: 배치를 embed_documents 한 번 + upsert 한 번으로 쓴다."""
+    from dev.app.llm.ingest import with_backoff
+
+    embedder = get_embedder()
+    index = get_pinecone_index()
+    target_namespace = os.getenv("PINECONE_NAMESPACE", "dev")
+    vectors = embedder.embed_documents([item.text for item in batch])
+    records = [(item.id, vec, item.metadata) for item, vec in zip(batch, vectors)]
+    with_backoff(lambda: index.upsert(vectors=records, namespace=target_namespace), retries=3)
+    mirror_upsert(records)
+    print(f"💾 [SaveQueue] {len(records)}건 저장")
+
+# /save/result write-behind 큐 (SAVE_QUEUE_BATCH, SAVE_QUEUE_DELAY, SAVE_QUEUE_MAX)
+save_queue = save_queue_from_env(write_contributions)
+
+# 이미 stats() 가 있는 객체의 현재 값을 /metrics 에 gauge 로 함께 내보낸다 (호출 시점의 전역을 읽는다)
+metrics.REGISTRY.register_collector("troubleshooter_limiter", lambda: analysis_limiter.stats())
+metrics.REGISTRY.register_collector("troubleshooter_analysis_cache", lambda: analysis_cache.stats())
+metrics.REGISTRY.register_collector("troubleshooter_save_queue", lambda: save_queue.stats())
+
 @app.post("/save/result")
 async def save_result(req: SaveRequest):
-    try:
-        embedder = get_embedder()
-        index = get_pinecone_index()
-        target_namespace = os.getenv("PINECONE_NAMESPACE", "dev")
-        combined_text = f"Log: {req.error_log}\nCode: {req.code}"
-        vector = embedder.embed_query(combined_text)
-        metadata = {
+    """기여를 큐에 넣고 바로 돌아온다. 같은 내용은 같은 ID로 덮어쓴다."""
+    # fast path 저장소(answer_store seed)가 시그니처를 다시 계산할 수 있게 마스킹된 로그 일부를 남긴다.
+    # cause/solution 은 fast path·분석 캐시로 다른 사용자에게 나가므로 같은 masker 로 가린다
+    # (클라이언트가 unmask 된 결과를 돌려보내므로 로그의 IP/호스트가 그대로 들어 있다)
+    masker = MaskingManager()
+    masked_log = masker.mask(req.error_log or "")
+    item = Contribution(
+        id=contribution_id(req.error_log, req.code, req.cause, req.solution),
+        text=f"Log: {req.error_log}\nCode: {req.code}",
+        metadata={
             "persona": req.persona,
-            "cause": req.cause[:500],
-            "solution": req.solution[:500],
+            "cause": masker.mask(req.cause)[:500],
+            "solution": masker.mask(req.solution)[:500],
+            "prevention": masker.mask(req.prevention or "")[:500],
+            "error_sample": masked_log[:2000],
             "doc_type": "user_contribution"
-        }
-        index.upsert(vectors=[(str(uuid.uuid4()), vector, metadata)], namespace=target_namespace)
-        return {"status": "success", "message": "저장 완료"}
-    except Exception as e:
-        print(f"❌ [Save Error] {str(e)}")
-        raise HTTPException(status_code=500, detail=f"저장 실패: {str(e)}")
\ No newline at end of file
+        },
+    )
+    try:
+        coalesced = save_queue.submit(item)
+    except SaveQueueFullError as e:
+        raise HTTPException(status_code=503, detail=f"저장 대기열이 가득 찼습니다: {e}")
+    return {"status": "success", "queued": True, "id": item.id, "coalesced": coalesced, "message": "저장 요청 접수"}
+
+@app.post("/save/flush")
+async def save_flush(timeout: float = 30.0):
+    """대기 중인 기여를 바로 쓰고 결과를 돌려준다."""
+    done = await asyncio.to_thread(save_queue.flush, timeout)
+    stats = save_queue.stats()
+    if not done:
+        raise HTTPException(status_code=503, detail=stats)
+    return stats
+
+@app.get("/save/status")
+async def save_status():
+    return save_queue.stats()
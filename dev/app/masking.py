@@ -1,46 +1,132 @@
 import re
+from typing import Iterable, Iterator, Optional
+
+from dev.app.masking_rules import LEFT_CONTEXT, MaskRuleRegistry, default_registry
+from dev.app.metrics import timed
+
 
 class MaskingManager:
-    def __init__(self):
+    def __init__(self, registry: Optional[MaskRuleRegistry] = None):
         # 마스킹된 항목과 원본 데이터를 저장할 딕셔너리
         self.mapping_table = {}
+        # 원본 -> 플레이스홀더 (같은 값은 같은 플레이스홀더를 재사용)
+        self._reverse = {}
+        self._counters = {}
+        self._hits = {}
+        self.registry = registry or default_registry()
+        # 규칙은 인스턴스 생성 시점의 컴파일 결과로 고정 (요청 도중 규칙이 바뀌어도 일관성 유지)
+        self.rules = self.registry.compiled()
+
+    def _placeholder_for(self, kind: str, original: str) -> str:
+        placeholder = self._reverse.get(original)
+        if placeholder is None:
+            n = self._counters.get(kind, 0)
+            placeholder = f"{kind}_{n}"
+            self._counters[kind] = n + 1
+            self._reverse[original] = placeholder
+            self.mapping_table[placeholder] = original
+        return placeholder
+
+    def _replace(self, kind: str, m: re.Match) -> str:
+        self._hits[kind] = self._hits.get(kind, 0) + 1
+        # LLM이 구분하기 쉽도록 대괄호를 감싸서 교체합니다.
+        return f"[{self._placeholder_for(kind, m.group())}]"
+
+    def _flush_hits(self) -> None:
+        if self._hits:
+            self.registry.record_hits(self._hits)
+            self._hits = {}
 
+    def _sub_from(self, buf: str, start: int, end: Optional[int] = None):
+        """buf[start:] 를 마스킹한다. start 앞부분은 \\b/lookbehind 판단용 문맥으로만 쓰인다.
+
+        end가 주어지면 end 이후에 시작하는 매치는 건드리지 않고 (마스킹 결과, 처리한 위치)를 돌려준다.
+        """
+        out, pos = [], start
+        for kind, m in self.rules.finditer(buf, start):
+            if end is not None and m.start() >= end:
+                break
+            out.append(buf[pos:m.start()])
+            out.append(self._replace(kind, m))
+            pos = m.end()
+        stop = len(buf) if end is None else max(end, pos)
+        out.append(buf[pos:stop])
+        self._flush_hits()
+        return "".join(out), stop
+
+    @timed("mask")
     def mask(self, text: str) -> str:
-        """텍스트에서 민감 정보를 마스킹하고 매핑 테이블에 기록합니다."""
-        if not text:
+        """텍스트에서 민감 정보를 마스킹하고 매핑 테이블에 기록합니다.
+
+        번호는 등장 순서대로 붙고, 같은 인스턴스로 여러 번 호출해도(log, code) 매핑을 공유한다.
+        """
+        if not text or not self.rules.rules:
             return text
-            
-        masked_text = text
-        
-        # 1. IP 주소 패턴 추출 및 마스킹
-        ip_pattern = r'\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3}'
-        ips = re.findall(ip_pattern, masked_text)
-        for i, ip in enumerate(list(set(ips))): # 중복 제거
-            placeholder = f"IP_ADDR_{i}"
-            self.mapping_table[placeholder] = ip
-            # LLM이 구분하기 쉽도록 대괄호를 감싸서 교체합니다.
-            masked_text = masked_text.replace(ip, f"[{placeholder}]")
-
-        # 2. 매뉴얼/문서 번호 패턴 (예: ABC-123) 추출 및 마스킹
-        doc_pattern = r'[A-Z]{3}-\d{3}'
-        docs = re.findall(doc_pattern, masked_text)
-        for i, doc in enumerate(list(set(docs))):
-            placeholder = f"DOC_REF_{i}"
-            self.mapping_table[placeholder] = doc
-            masked_text = masked_text.replace(doc, f"[{placeholder}]")
-            
-        return masked_text
+        masked, _ = self._sub_from(text, 0)
+        return masked
+
+    def mask_chunks(self, chunks: Iterable[str]) -> Iterator[str]:
+        """텍스트 조각 이터레이터를 받아 마스킹된 조각을 순서대로 내보낸다.
+
+        mask("".join(chunks))와 결과가 같으며, 조각 경계에 걸친 매치도 올바르게 처리한다.
+        메모리는 로그 전체가 아니라 조각 크기에 비례한다.
+        """
+        chunked = ChunkedMasker(self)
+        for chunk in chunks:
+            out = chunked.feed(chunk)
+            if out:
+                yield out
+        rest = chunked.flush()
+        if rest:
+            yield rest
 
+    def _restore(self, m: re.Match) -> str:
+        name = m.group(1) or m.group(2)
+        return self.mapping_table.get(name, m.group())
+
+    @timed("unmask")
     def unmask(self, text: str) -> str:
         """LLM 답변 속의 플레이스홀더를 대괄호 유무와 상관없이 원본으로 복구합니다."""
-        if not text:
+        if not text or not self.mapping_table:
             return text
-            
-        unmasked_text = text
-        for placeholder, original in self.mapping_table.items():
-            # 케이스 1: LLM이 대괄호를 유지한 경우 [IP_ADDR_0] -> 192.168...
-            unmasked_text = unmasked_text.replace(f"[{placeholder}]", original)
-            # 케이스 2: LLM이 대괄호를 벗긴 경우 IP_ADDR_0 -> 192.168...
-            unmasked_text = unmasked_text.replace(placeholder, original)
-            
-        return unmasked_text
\ No newline at end of file
+        return self.rules.placeholder.sub(self._restore, text)
+
+
+class ChunkedMasker:
+    """조각을 밀어 넣는(push) 방식의 마스킹. 비동기 스트림(요청 본문 등)에서 사용한다.
+
+    조각마다 끝의 holdback 글자(가장 긴 규칙 매치보다 긴 길이)는 다음 조각과 합쳐 다시 검사하고,
+    \\b 나 lookbehind 판단을 위해 이미 내보낸 앞쪽 문맥도 조금 남겨 둔다.
+    플레이스홀더 테이블은 넘겨받은 MaskingManager와 공유한다.
+    """
+
+    def __init__(self, manager: MaskingManager):
+        self.manager = manager
+        self._context = ""
+        self._carry = ""
+
+    def feed(self, chunk: str) -> str:
+        if not chunk:
+            return ""
+        if not self.manager.rules.rules:
+            return chunk
+
+        start = len(self._context)
+        buf = self._context + self._carry + chunk
+        # limit 이후에 시작하는 매치는 다음 조각에 따라 달라질 수 있으므로 보류
+        limit = len(buf) - self.manager.rules.holdback
+        if limit <= start:
+            self._carry = buf[start:]
+            return ""
+
+        out, cut = self.manager._sub_from(buf, start, limit)
+        self._context = buf[max(0, cut - LEFT_CONTEXT):cut]
+        self._carry = buf[cut:]
+        return out
+
+    def flush(self) -> str:
+        rest, self._carry = self._carry, ""
+        if not rest or not self.manager.rules.rules:
+            return rest
+        out, _ = self.manager._sub_from(self._context + rest, len(self._context))
+        return out
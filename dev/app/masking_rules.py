@@ -0,0 +1,275 @@
+"""
+masking_rules.py
+
+MaskingManager가 사용하는 마스킹 규칙 레지스트리.
+
+- 내장 규칙 + 설정 파일(MASKING_RULES_PATH, JSON) 규칙을 우선순위 순으로 모은다.
+- 모든 규칙을 우선순위 순 named-group alternation 하나(CompiledRules)로 합쳐 텍스트를 한 번만 훑는다.
+  같은 위치에서 여러 규칙이 맞으면 우선순위가 높은 규칙이 이긴다. (m.lastgroup 이 규칙 이름)
+  파이썬 re 는 위치마다 모든 분기를 시도하므로 분기 수에 비례해 느려진다. 그래서 모든 규칙은 매치에 반드시
+  들어가는 문자열(literal anchor, 예: EMAIL 의 "@")을 가져야 하고, 텍스트에 없는 규칙은 빼고 합친
+  alternation 으로 훑는다. (부분집합별 컴파일 결과는 캐시) 이렇게 해야 텍스트에 나오지 않는 규칙은
+  몇 개를 등록하든 스캔 비용에 영향이 없다.
+  anchor 는 requires 로 직접 주거나, 없으면 패턴에서 뽑는다(required_literals). 둘 다 없는 규칙은 등록을 거절한다.
+  (규칙 패턴 안에서는 이름 있는 그룹/역참조/전역 인라인 플래그/빈 문자열 매치를 쓸 수 없다)
+- 규칙별 적중 횟수를 집계한다.
+
+설정 파일 형식:
+{
+  "rules": [
+    {"name": "SLACK_TOKEN", "pattern": "xox[baprs]-[A-Za-z0-9-]{10,200}", "priority": 90, "max_len": 210,
+     "requires": ["xox"]}
+  ],
+  "disable": ["HOSTNAME"]
+}
+"""
+import json
+import os
+import re
+import threading
+from collections import Counter
+from dataclasses import dataclass
+from re import _constants as sre_c, _parser as sre_parse
+from typing import Dict, FrozenSet, Iterable, Iterator, List, Optional, Tuple
+
+_NAME = re.compile(r'^[A-Z][A-Z0-9]*(?:_[A-Z0-9]+)*$')
+_BACKREF = re.compile(r'(?<!\\)(?:\\\\)*(?:\\[1-9]|\(\?P=)')
+
+# 청크 마스킹에서 경계 앞쪽으로 남겨 둘 문맥 길이 (\b, lookbehind 판단용). 가장 긴 lookbehind 보다 길어야 한다.
+LEFT_CONTEXT = 16
+
+
+@dataclass(frozen=True)
+class MaskRule:
+    name: str           # 플레이스홀더 접두어 (예: IP_ADDR -> [IP_ADDR_0])
+    pattern: str
+    priority: int = 0   # 높을수록 같은 위치에서 먼저 시도
+    max_len: int = 256  # 매치 최대 길이. 청크 마스킹의 보류 길이 계산에 쓰인다.
+    requires: Tuple[str, ...] = ()  # 매치에 반드시 들어가는 문자열 중 하나. 텍스트에 없으면 스캔에서 뺀다 (비우면 패턴에서 뽑음)
+
+
+# 내장 규칙. 길이가 정해지지 않는 토큰류는 반복 횟수 상한을 둬서 max_len을 보장한다.
+BUILTIN_RULES = (
+    MaskRule("JWT", r'eyJ[A-Za-z0-9_-]{5,2000}\.[A-Za-z0-9_-]{5,2000}\.[A-Za-z0-9_-]{0,2000}', 110, 6005, ("eyJ",)),
+    # 토큰은 숫자를 포함하거나 24자 이상이어야 한다. ("Bearer authentication required" 같은 문장 제외)
+    MaskRule("BEARER_TOKEN", r'(?i:bearer)[ \t]{1,4}(?=[A-Za-z._~+/-]*\d|[A-Za-z0-9._~+/-]{24})'
+                             r'[A-Za-z0-9._~+/-]{8,1024}={0,2}', 100, 1036),
+    MaskRule("AWS_KEY", r'\b(?:AKIA|ASIA)[0-9A-Z]{16}\b', 95, 20, ("AKIA", "ASIA")),
+    MaskRule("EMAIL", r'\b[A-Za-z0-9._%+-]{1,64}@[A-Za-z0-9-]{1,63}(?:\.[A-Za-z0-9-]{1,63}){0,6}\.[A-Za-z]{2,24}\b', 80, 600, ("@",)),
+    MaskRule("UUID", r'\b[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}\b', 70, 36, ("-",)),
+    # IPv6: 8그룹 전체 표기 또는 '::' 축약 표기. C++/Rust 의 'a::b' 는 앞뒤가 단어 문자라서 제외된다.
+    MaskRule("IPV6", r'(?<![\w:])(?:(?:[0-9A-Fa-f]{1,4}:){7}[0-9A-Fa-f]{1,4}'
+                     r'|(?:[0-9A-Fa-f]{1,4}:){1,6}:(?:[0-9A-Fa-f]{1,4}(?::[0-9A-Fa-f]{1,4}){0,5})?'
+                     r'|::(?:[0-9A-Fa-f]{1,4}:){0,6}[0-9A-Fa-f]{1,4})(?![\w:])', 60, 45, (":",)),
+    MaskRule("IP_ADDR", r'\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3}', 50, 15, (".",)),
+    # 호스트명. 점으로 이어진 식별자(java.io.FileNotFoundException, org.acme.dev.Handler)나
+    # 패키지/모듈 이름(import socket.io, require('chart.io'))은 제외한다.
+    MaskRule("HOSTNAME", r'(?<![\w$.-])(?<!import )(?<!require\(\')(?<!require\(")(?<!from \')(?<!from ")'
+                         r'(?!(?:java|javax|kotlin|org|com|io|net|sun)\.)'
+                         r'(?:[A-Za-z0-9](?:[A-Za-z0-9-]{0,61}[A-Za-z0-9])?\.){1,6}'
+                         r'(?:com|net|org|io|dev|cloud|internal|local|lan|corp|kr)(?![\w-])(?!\.[A-Za-z_$])', 40, 400, (".",)),
+    # 사내 문서 번호 (ABC-123). ORA-12541 같은 벤더 에러 코드의 앞부분을 잘라 먹지 않게 양쪽 경계를 둔다.
+    MaskRule("DOC_REF", r'(?<![\w-])(?!(?:ORA|TNS|PLS|IMP|EXP|SQL|ERR)-)[A-Z]{3}-\d{3}(?![\w-])', 10, 7, ("-",)),
+)
+
+
+_REPEATS = (sre_c.MAX_REPEAT, sre_c.MIN_REPEAT, sre_c.POSSESSIVE_REPEAT)
+_ZERO_WIDTH = (sre_c.AT, sre_c.ASSERT, sre_c.ASSERT_NOT)
+
+
+def _required(items, ignorecase: bool) -> Optional[FrozenSet[Tuple[str, bool]]]:
+    """items 의 모든 매치가 포함하는 (문자열, 대소문자 무시) 중 하나의 집합. 못 찾으면 None."""
+    options, run, run_ci = [], [], ignorecase
+
+    def flush():
+        if run:
+            options.append(frozenset({("".join(run).lower() if run_ci else "".join(run), run_ci)}))
+            run.clear()
+
+    for op, av in items:
+        if op is sre_c.LITERAL:
+            if run and run_ci != ignorecase:
+                flush()
+            run_ci = ignorecase
+            run.append(chr(av))
+            continue
+        if op in _ZERO_WIDTH:
+            continue  # 소비하는 문자가 없으므로 앞뒤 리터럴은 붙어 있다
+        flush()
+        found = None
+        if op is sre_c.SUBPATTERN:
+            _, add, remove, sub = av
+            found = _required(sub, (ignorecase or bool(add & re.I)) and not remove & re.I)
+        elif op is sre_c.ATOMIC_GROUP:
+            found = _required(av, ignorecase)
+        elif op is sre_c.BRANCH:
+            branches = [_required(b, ignorecase) for b in av[1]]
+            found = frozenset().union(*branches) if all(branches) else None
+        elif op in _REPEATS and av[0] >= 1:
+            found = _required(av[2], ignorecase)
+        if found:
+            options.append(found)
+    flush()
+    # 가장 짧은 후보가 가장 긴 것 = 텍스트에 우연히 들어 있을 가능성이 가장 낮은 것
+    return max(options, key=lambda o: min(len(lit) for lit, _ in o)) if options else None
+
+
+def required_literals(pattern: str) -> Optional[FrozenSet[Tuple[str, bool]]]:
+    """pattern 의 모든 매치에 들어가는 문자열 후보 {(문자열, 대소문자 무시)} 중 하나. 뽑을 수 없으면 None.
+
+    예: r'(?i:bearer)[ \\t]+\\S+' -> {("bearer", True)}, r'\\d+\\.\\d+' -> {(".", False)}
+    """
+    return _required(sre_parse.parse(pattern), False)
+
+
+def literal_anchor(rule: MaskRule) -> Optional[FrozenSet[Tuple[str, bool]]]:
+    if rule.requires:
+        return frozenset((lit, False) for lit in rule.requires)
+    return required_literals(rule.pattern)
+
+
+class CompiledRules:
+    """레지스트리의 한 시점 스냅샷을 컴파일한 결과."""
+
+    def __init__(self, rules: List[MaskRule]):
+        self.rules = rules
+        self.names = [r.name for r in rules]
+        self._anchors = [(r.name, literal_anchor(r)) for r in rules]
+        self._scanners: Dict[Tuple[str, ...], "re.Pattern"] = {}
+        self._scanner_lock = threading.Lock()
+        placeholder_name = "(?:" + "|".join(self.names) + r")_\d+"
+        # [IP_ADDR_1] 또는 IP_ADDR_1. \d+ 가 탐욕적으로 매칭되므로 IP_ADDR_10 안의 IP_ADDR_1을 잘못 복구하지 않는다.
+        self.placeholder = re.compile(rf'\[({placeholder_name})\]|({placeholder_name})') if rules else None
+        # 청크 끝에서 다음 청크와 함께 다시 훑을 길이: 가장 긴 매치보다 길어야 한다.
+        self.holdback = max((r.max_len for r in rules), default=0) + 1
+
+    def _scanner(self, names: Tuple[str, ...]) -> "re.Pattern":
+        # 우선순위 순 alternation: 가장 왼쪽 위치에서, 같은 위치면 앞선(우선순위 높은) 분기가 이긴다.
+        scanner = self._scanners.get(names)
+        if scanner is None:
+            by_name = {r.name: r for r in self.rules}
+            scanner = re.compile("|".join(f"(?P<{n}>{by_name[n].pattern})" for n in names))
+            with self._scanner_lock:
+                scanner = self._scanners.setdefault(names, scanner)
+        return scanner
+
+    def active_names(self, text: str) -> Tuple[str, ...]:
+        """text 에 anchor 문자열이 하나라도 있는 규칙 (우선순위 순)."""
+        lowered = None
+        names = []
+        for name, anchor in self._anchors:
+            for lit, ci in anchor:
+                if ci and lowered is None:
+                    lowered = text.lower()
+                if lit in (lowered if ci else text):
+                    names.append(name)
+                    break
+        return tuple(names)
+
+    def scanner_for(self, text: str) -> Optional["re.Pattern"]:
+        """text 에 나올 수 없는 규칙(anchor 문자열이 하나도 없는 규칙)을 뺀 alternation.
+
+        빠진 규칙은 text 안에 매치가 없으므로 결과는 전체 alternation 과 같다.
+        """
+        names = self.active_names(text)
+        return self._scanner(names) if names else None
+
+    def finditer(self, text: str, pos: int = 0, endpos: Optional[int] = None) -> Iterator[Tuple[str, re.Match]]:
+        """(규칙 이름, 매치)를 왼쪽부터, 서로 겹치지 않게 내보낸다.
+
+        pos 앞부분은 \b/lookbehind 판단용 문맥으로만 쓰인다.
+        """
+        scanner = self.scanner_for(text)
+        if scanner is None:
+            return
+        for m in scanner.finditer(text, pos, len(text) if endpos is None else endpos):
+            yield m.lastgroup, m
+
+
+class MaskRuleRegistry:
+    def __init__(self, rules: Iterable[MaskRule] = ()):
+        self._rules: Dict[str, MaskRule] = {}
+        self._lock = threading.Lock()
+        self._compiled: Optional[CompiledRules] = None
+        self.hits: Counter = Counter()
+        for rule in rules:
+            self.register(rule)
+
+    def register(self, rule: MaskRule) -> None:
+        if not _NAME.match(rule.name):
+            raise ValueError(f"invalid mask rule name: {rule.name!r} (UPPER_SNAKE_CASE only)")
+        if "(?P<" in rule.pattern:
+            raise ValueError(f"mask rule {rule.name} must not use named groups")
+        if _BACKREF.search(rule.pattern):
+            # 규칙들을 한 alternation 으로 합치면 그룹 번호가 바뀐다
+            raise ValueError(f"mask rule {rule.name} must not use backreferences")
+        compiled = re.compile(rule.pattern)  # 잘못된 패턴은 등록 시점에 바로 실패
+        try:
+            re.compile(f"(?:)|(?:{rule.pattern})")
+        except re.error:
+            raise ValueError(f"mask rule {rule.name} must not use global inline flags (use (?i:...) instead)")
+        if compiled.match("") is not None:
+            raise ValueError(f"mask rule {rule.name} must not match the empty string")
+        if literal_anchor(rule) is None:
+            # anchor 가 없으면 모든 텍스트에서 alternation 분기로 남아 규칙 수만큼 스캔이 느려진다
+            raise ValueError(f"mask rule {rule.name} has no literal every match must contain; set \"requires\"")
+        with self._lock:
+            self._rules[rule.name] = rule
+            self._compiled = None
+
+    def unregister(self, name: str) -> None:
+        with self._lock:
+            self._rules.pop(name, None)
+            self._compiled = None
+
+    def load_config(self, path: str) -> None:
+        with open(path, "r", encoding="utf-8") as f:
+            config = json.load(f)
+        for name in config.get("disable", []):
+            self.unregister(name)
+        for item in config.get("rules", []):
+            self.register(MaskRule(
+                name=item["name"],
+                pattern=item["pattern"],
+                priority=int(item.get("priority", 0)),
+                max_len=int(item.get("max_len", 256)),
+                requires=tuple(item.get("requires", ())),
+            ))
+
+    @property
+    def rules(self) -> List[MaskRule]:
+        # 우선순위 내림차순, 같으면 등록 순서
+        order = {name: i for i, name in enumerate(self._rules)}
+        return sorted(self._rules.values(), key=lambda r: (-r.priority, order[r.name]))
+
+    def compiled(self) -> CompiledRules:
+        compiled = self._compiled
+        if compiled is None:
+            with self._lock:
+                if self._compiled is None:
+                    self._compiled = CompiledRules(self.rules)
+                compiled = self._compiled
+        return compiled
+
+    def record_hits(self, counts: Dict[str, int]) -> None:
+        if counts:
+            with self._lock:
+                self.hits.update(counts)
+
+    def stats(self) -> dict:
+        return {"rules": [r.name for r in self.rules], "hits": dict(self.hits)}
+
+
+_default_registry: Optional[MaskRuleRegistry] = None
+
+
+def default_registry() -> MaskRuleRegistry:
+    """내장 규칙 + MASKING_RULES_PATH 설정 규칙으로 구성된 전역 레지스트리."""
+    global _default_registry
+    if _default_registry is None:
+        registry = MaskRuleRegistry(BUILTIN_RULES)
+        path = os.getenv("MASKING_RULES_PATH")
+        if path:
+            registry.load_config(path)
+        _default_registry = registry
+    return _default_registry
@@ -0,0 +1,237 @@
+"""
+metrics.py
+
+단계별 지연/토큰/에러 지표와 Prometheus 텍스트 포맷 노출 (/metrics).
+
+요청 하나가 마스킹, draft, 임베딩, Pinecone 조회, final, 응답 파싱 중 어디서 시간을 썼는지 보기 위한 것.
+외부 의존성 없이 Counter/Histogram 만 구현한다. (prometheus_client 의 exposition format 0.0.4 와 호환)
+
+- stage_seconds{stage}        : 단계별 소요 시간 히스토그램 (timed 데코레이터/컨텍스트)
+- stage_errors_total{stage}   : 단계에서 난 예외 수
+- llm_tokens_total{stage,kind}: input / output / cache_read / cache_creation 토큰
+- rag_route_total{route}      : 초안 이후 RAG 로 간 비율 (rag / end)
+- analysis_total{served_by}   : 응답 경로별 요청 수 (cache / fast_path / draft / final)
+- parser_strategy_total{strategy}
+register_collector(fn) 로 캐시/큐처럼 이미 stats() 가 있는 객체의 현재 값을 gauge 로 함께 내보낸다.
+
+응답 전문 로그는 log_sampled() 로 RESPONSE_LOG_SAMPLE 비율만 한 줄 JSON 으로 남긴다. (기본 0.01)
+"""
+import functools
+import inspect
+import json
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+# LLM 호출(수 초~수십 초)과 마스킹/파싱(ms 이하)을 한 히스토그램으로 보므로 범위를 넓게 잡는다.
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Iterable[str], values: Iterable[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labelnames: Iterable[str] = ()):
+        self.name, self.help, self.labelnames = name, help, tuple(labelnames)
+        self._values: Dict[LabelValues, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = tuple(str(labels.get(n, "")) for n in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(tuple(str(labels.get(n, "")) for n in self.labelnames), 0)
+
+    def collect(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        lines += [f"{self.name}{_labels(self.labelnames, k)} {_number(v)}" for k, v in items]
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labelnames: Iterable[str] = (), buckets: Iterable[float] = DEFAULT_BUCKETS):
+        self.name, self.help, self.labelnames = name, help, tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # labels -> [bucket counts..., sum, count]
+        self._values: Dict[LabelValues, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float, **labels) -> None:
+        key = tuple(str(labels.get(n, "")) for n in self.labelnames)
+        with self._lock:
+            row = self._values.get(key)
+            if row is None:
+                row = self._values[key] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    row[i] += 1
+                    break
+            row[-2] += seconds
+            row[-1] += 1
+
+    def count(self, **labels) -> int:
+        row = self._values.get(tuple(str(labels.get(n, "")) for n in self.labelnames))
+        return row[-1] if row else 0
+
+    def snapshot(self) -> Dict[LabelValues, list]:
+        """labels -> [버킷별 개수..., 합계, 개수] 사본. 두 시점의 차이로 구간 분포를 본다."""
+        with self._lock:
+            return {k: list(v) for k, v in self._values.items()}
+
+    def collect(self) -> List[str]:
+        with self._lock:
+            items = sorted((k, list(v)) for k, v in self._values.items())
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for key, row in items:
+            cumulative = 0
+            for bound, n in zip(self.buckets, row):
+                cumulative += n
+                le = 'le="%s"' % _number(bound)
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, le)} {cumulative}")
+            inf = 'le="+Inf"'
+            lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, inf)} {row[-1]}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {_number(row[-2])}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {row[-1]}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, object] = {}
+        self._collectors: Dict[str, Callable[[], Dict[str, float]]] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            return self._metrics.setdefault(metric.name, metric)
+
+    def register_collector(self, prefix: str, fn: Callable[[], dict]) -> None:
+        """fn() 이 돌려주는 dict 의 숫자 값을 {prefix}_{key} gauge 로 내보낸다. (같은 prefix 는 덮어쓴다)"""
+        with self._lock:
+            self._collectors[prefix] = fn
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+            collectors = list(self._collectors.items())
+        lines = []
+        for metric in metrics:
+            lines += metric.collect()
+        for prefix, fn in collectors:
+            try:
+                values = fn() or {}
+            except Exception as e:
+                print(f"⚠️ [Metrics] collector {prefix}: {e}")
+                continue
+            for key, value in sorted(values.items()):
+                if isinstance(value, bool) or not isinstance(value, (int, float)):
+                    continue
+                name = f"{prefix}_{key}"
+                lines += [f"# TYPE {name} gauge", f"{name} {_number(value)}"]
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+stage_seconds = REGISTRY.register(Histogram(
+    "troubleshooter_stage_seconds", "Time spent per pipeline stage", ["stage"]))
+stage_errors = REGISTRY.register(Counter(
+    "troubleshooter_stage_errors_total", "Exceptions raised per pipeline stage", ["stage"]))
+llm_tokens = REGISTRY.register(Counter(
+    "troubleshooter_llm_tokens_total", "LLM tokens by stage and kind", ["stage", "kind"]))
+rag_route = REGISTRY.register(Counter(
+    "troubleshooter_rag_route_total", "Draft outcomes: routed to RAG or answered directly", ["route"]))
+analysis_total = REGISTRY.register(Counter(
+    "troubleshooter_analysis_total", "Completed analyses by serving path", ["served_by"]))
+parser_strategy = REGISTRY.register(Counter(
+    "troubleshooter_parser_strategy_total", "Response parser strategy used", ["strategy"]))
+
+
+@contextmanager
+def stage_timer(stage: str):
+    """with 블록 시간을 stage_seconds 에 기록한다. 예외가 나면 stage_errors 도 올린다."""
+    start = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        stage_errors.inc(stage=stage)
+        raise
+    finally:
+        stage_seconds.observe(time.perf_counter() - start, stage=stage)
+
+
+def timed(stage: str):
+    """함수(동기/비동기) 실행 시간을 stage 로 기록하는 데코레이터."""
+    def decorate(fn):
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                with stage_timer(stage):
+                    return await fn(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with stage_timer(stage):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def record_tokens(stage: str, usage: Optional[dict]) -> None:
+    """LangChain usage_metadata 를 llm_tokens 에 더한다."""
+    if not usage:
+        return
+    details = usage.get("input_token_details") or {}
+    for kind, value in (("input", usage.get("input_tokens")), ("output", usage.get("output_tokens")),
+                        ("cache_read", details.get("cache_read")),
+                        ("cache_creation", details.get("cache_creation"))):
+        if value:
+            llm_tokens.inc(int(value), stage=stage, kind=kind)
+
+
+# --- 샘플링 로그 ---
+LOG_SAMPLE = float(os.getenv("RESPONSE_LOG_SAMPLE", "0.01"))
+LOG_MAX_CHARS = int(os.getenv("RESPONSE_LOG_MAX_CHARS", "2000"))
+
+
+def log_sampled(event: str, rate: Optional[float] = None, **fields) -> bool:
+    """rate 확률로 {"event", ...fields} 를 한 줄 JSON 으로 남긴다. 긴 문자열은 LOG_MAX_CHARS 로 자른다."""
+    rate = LOG_SAMPLE if rate is None else rate
+    if rate <= 0 or (rate < 1 and random.random() >= rate):
+        return False
+    record = {"event": event, "ts": round(time.time(), 3)}
+    for key, value in fields.items():
+        if isinstance(value, str) and len(value) > LOG_MAX_CHARS:
+            value = value[:LOG_MAX_CHARS] + f"...(+{len(value) - LOG_MAX_CHARS})"
+        record[key] = value
+    print(json.dumps(record, ensure_ascii=False, default=str))
+    return True
+
+
+def render() -> str:
+    return REGISTRY.render()
@@ -0,0 +1,262 @@
+"""
+response_parser.py
+
+LLM 응답 텍스트에서 cause / solution / prevention 세 필드를 한 번에 추출한다.
+
+전략 (앞에서 성공하면 멈춤, 모두 입력 길이에 선형):
+1. json           : 첫 '{' 부터 json.JSONDecoder.raw_decode (코드펜스/앞뒤 잡텍스트 허용)
+2. json_tolerant  : 직접 구현한 1-pass 스캐너. 문자열 안의 raw 줄바꿈, 이스케이프 안 된 따옴표,
+                    trailing comma, 잘린(닫히지 않은) 출력, 문자열 배열 값 등을 허용한다.
+                    배열은 MAX_DEPTH 단계까지만 재귀로 읽고 더 깊은 것은 괄호 균형만 맞춰 원문으로 둔다.
+3. keyword        : 줄 머리의 라벨(cause:, **원인**, ## 해결 방법 ...)을 한 번의 finditer로 찾아
+                    라벨 사이 구간을 자른다.
+4. none           : 아무 것도 찾지 못함
+
+ParsedResponse.strategy 로 어떤 전략이 성공했는지 알려준다.
+"""
+import json
+import re
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+from dev.app.metrics import parser_strategy, timed
+
+FIELDS = ("cause", "solution", "prevention")
+
+# 원래 구현과 같이 2글자 이하 값은 추출 실패로 본다.
+MIN_VALUE_LEN = 3
+# tolerant 스캐너가 재귀로 읽을 배열 중첩 깊이. '[' 수만 개짜리 출력이 RecursionError 로 500 이 되지 않게 한다.
+MAX_DEPTH = 32
+
+_ESCAPES = {'n': '\n', 't': '\t', 'r': '\r', 'b': '\b', 'f': '\f', '"': '"', "'": "'", '\\': '\\', '/': '/'}
+_WS = re.compile(r'[ \t\r\n]*')
+# 문자열 안의 따옴표가 진짜 끝인지 판단: 뒤에 , "다음키": 가 오거나, 닫는 괄호/콜론/끝이 와야 한다.
+_NEXT_KEY = re.compile(r'[ \t\r\n]*,[ \t\r\n]*["\']?[A-Za-z_][\w ]{0,40}["\']?[ \t\r\n]*:')
+_BARE_KEY = re.compile(r'[A-Za-z_][\w]*')
+_PLAIN_RUN = {'"': re.compile(r'[^"\\]*'), "'": re.compile(r"[^'\\]*")}
+
+_LABELS = {
+    "cause": "cause", "원인": "cause",
+    "solution": "solution", "해결": "solution", "해결 방법": "solution", "해결방법": "solution", "해결책": "solution",
+    "prevention": "prevention", "재발 방지": "prevention", "재발방지": "prevention", "예방": "prevention",
+    "방지": "prevention",
+}
+_MARKER = re.compile(
+    r'(?im)^[ \t]*(?:[-*>]+[ \t]*|#{1,6}[ \t]*|\d+\.[ \t]*)?(?:\*\*|__)?["\']?'
+    r'(cause|solution|prevention|원인|해결 ?방법|해결책|해결|재발 ?방지|예방|방지)'
+    r'["\']?(?:\*\*|__)?[ \t]*(?:[:：][ \t]*(?:\*\*|__)?|$)'
+)
+
+
+@dataclass
+class ParsedResponse:
+    fields: Dict[str, str] = field(default_factory=dict)
+    strategy: str = "none"
+
+    @property
+    def missing(self) -> List[str]:
+        return [f for f in FIELDS if f not in self.fields]
+
+
+def _clean(value) -> Optional[str]:
+    if isinstance(value, list):
+        value = "\n".join(str(v) for v in value)
+    elif not isinstance(value, str):
+        value = "" if value is None else str(value)
+    value = value.strip().strip(',').strip().strip('"').strip()
+    return value if len(value) >= MIN_VALUE_LEN else None
+
+
+def _pick(obj: dict) -> Dict[str, str]:
+    lowered = {str(k).strip().lower(): v for k, v in obj.items()}
+    out = {}
+    for name in FIELDS:
+        if name in lowered:
+            value = _clean(lowered[name])
+            if value is not None:
+                out[name] = value
+    return out
+
+
+# --- 1. strict json ---
+
+def _parse_strict(text: str, start: int) -> Dict[str, str]:
+    try:
+        obj, _ = json.JSONDecoder().raw_decode(text, start)
+    except (ValueError, RecursionError):
+        # 깊게 중첩된 입력은 C 디코더도 RecursionError 를 낸다 -> tolerant/keyword 로 넘긴다
+        return {}
+    return _pick(obj) if isinstance(obj, dict) else {}
+
+
+# --- 2. tolerant json ---
+
+def _read_string(text: str, i: int) -> Tuple[str, int]:
+    """text[i]가 여는 따옴표. (디코딩된 값, 닫는 따옴표 다음 위치)를 돌려준다."""
+    quote = text[i]
+    n = len(text)
+    out: List[str] = []
+    plain = _PLAIN_RUN[quote]
+    j = i + 1
+    while j < n:
+        # 따옴표/역슬래시가 아닌 구간은 정규식으로 한 번에 건너뛴다
+        m = plain.match(text, j)
+        if m.end() > j:
+            out.append(m.group())
+            j = m.end()
+            if j >= n:
+                break
+        c = text[j]
+        if c == '\\' and j + 1 < n:
+            nxt = text[j + 1]
+            if nxt == 'u' and j + 6 <= n:
+                try:
+                    out.append(chr(int(text[j + 2:j + 6], 16)))
+                    j += 6
+                    continue
+                except ValueError:
+                    pass
+            out.append(_ESCAPES.get(nxt, '\\' + nxt))
+            j += 2
+            continue
+        if c == quote:
+            k = _WS.match(text, j + 1).end()
+            if k >= n or text[k] in '}]:' or _NEXT_KEY.match(text, j + 1):
+                return "".join(out), j + 1
+            if text[k] == ',':
+                after = _WS.match(text, k + 1).end()
+                if after >= n or text[after] == '}':  # trailing comma
+                    return "".join(out), j + 1
+        out.append(c)
+        j += 1
+    # 닫히지 않은 문자열 (출력이 잘린 경우): 있는 데까지 사용
+    return "".join(out), n
+
+
+def _skip_balanced(text: str, i: int) -> Tuple[str, int]:
+    """text[i]가 여는 괄호. 재귀 없이 짝이 맞는 닫는 괄호까지를 원문 그대로 돌려준다."""
+    n = len(text)
+    depth, j, in_str = 0, i, False
+    while j < n:
+        ch = text[j]
+        if in_str:
+            if ch == '\\':
+                j += 1
+            elif ch == '"':
+                in_str = False
+        elif ch == '"':
+            in_str = True
+        elif ch in '{[':
+            depth += 1
+        elif ch in '}]':
+            depth -= 1
+            if depth == 0:
+                return text[i:j + 1], j + 1
+        j += 1
+    return text[i:], n
+
+
+def _read_value(text: str, i: int, depth: int = 0):
+    n = len(text)
+    c = text[i]
+    if c in '"\'':
+        return _read_string(text, i)
+    if c == '{' or (c == '[' and depth >= MAX_DEPTH):
+        # 중첩 객체(와 MAX_DEPTH 보다 깊은 배열)는 필드 값으로 쓰지 않으므로 괄호 균형만 맞춰 건너뛴다.
+        return _skip_balanced(text, i)
+    if c == '[':
+        items, j = [], i + 1
+        while j < n:
+            j = _WS.match(text, j).end()
+            if j >= n:
+                break
+            if text[j] == ']':
+                j += 1
+                break
+            if text[j] == '}':
+                break
+            if text[j] == ',':
+                j += 1
+                continue
+            value, nxt = _read_value(text, j, depth + 1)
+            items.append(value)
+            # 빈 값이어도 반드시 전진한다
+            j = max(nxt, j + 1)
+        return items, j
+    # 따옴표 없는 값: 다음 , } 줄바꿈 전까지
+    j = i
+    while j < n and text[j] not in ',}\n':
+        j += 1
+    return text[i:j], j
+
+
+def _parse_tolerant(text: str, start: int) -> Dict[str, str]:
+    n = len(text)
+    i = start + 1
+    obj = {}
+    while i < n:
+        i = _WS.match(text, i).end()
+        if i >= n or text[i] == '}':
+            break
+        if text[i] == ',':
+            i += 1
+            continue
+        if text[i] in '"\'':
+            key, i = _read_string(text, i)
+        else:
+            m = _BARE_KEY.match(text, i)
+            if not m:
+                i += 1
+                continue
+            key, i = m.group(), m.end()
+        i = _WS.match(text, i).end()
+        if i < n and text[i] in ':=':
+            i += 1
+        i = _WS.match(text, i).end()
+        if i >= n:
+            break
+        value, i = _read_value(text, i)
+        obj[key] = value
+    return _pick(obj)
+
+
+# --- 3. keyword ---
+
+def _parse_keywords(text: str) -> Dict[str, str]:
+    markers = [(m.start(), m.end(), _LABELS[re.sub(r'\s+', ' ', m.group(1).lower())]) for m in _MARKER.finditer(text)]
+    out: Dict[str, str] = {}
+    for idx, (_, end, name) in enumerate(markers):
+        if name in out:
+            continue
+        stop = markers[idx + 1][0] if idx + 1 < len(markers) else len(text)
+        value = _clean(text[end:stop].strip().rstrip('}').replace('\\n', '\n').replace('\\"', '"'))
+        if value is not None:
+            out[name] = value
+    return out
+
+
+@timed("parse")
+def parse_response(text) -> ParsedResponse:
+    """세 필드를 추출한다. 앞 전략이 일부 필드만 찾으면 뒤 전략으로 나머지를 채운다."""
+    if not isinstance(text, str):
+        text = "" if text is None else str(text)
+
+    result = ParsedResponse()
+    brace = text.find('{')
+    strategies = []
+    if brace != -1:
+        strategies += [("json", lambda: _parse_strict(text, brace)),
+                       ("json_tolerant", lambda: _parse_tolerant(text, brace))]
+    strategies.append(("keyword", lambda: _parse_keywords(text)))
+
+    for name, run in strategies:
+        found = run()
+        new = {k: v for k, v in found.items() if k not in result.fields}
+        if new:
+            result.fields.update(new)
+            if result.strategy == "none":
+                result.strategy = name
+        if not result.missing:
+            break
+    parser_strategy.inc(strategy=result.strategy)
+    return result
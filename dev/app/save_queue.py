@@ -0,0 +1,192 @@
+"""
+save_queue.py
+
+/save/result 기여를 모아서 쓰는 write-behind 큐.
+
+- submit() 은 바로 돌아온다. 실제 임베딩/업서트는 백그라운드 스레드가 한다.
+- ID는 내용 해시(contribution_id)라서 같은 기여를 다시 저장해도 벡터가 늘지 않는다.
+  아직 쓰이지 않은 같은 ID가 큐에 있으면 새 것으로 덮어쓴다 (coalesce).
+- max_batch 개가 모이거나 가장 오래된 항목이 max_delay 초를 기다리면 writer(batch) 를 한 번 호출한다.
+  writer 는 embed_documents 한 번 + upsert 한 번으로 배치를 쓴다. (main.py 의 write_contributions)
+- writer 가 실패하면 항목을 큐에 되돌리고 max_delay 뒤에 다시 시도한다.
+- 큐가 max_pending 을 넘으면 SaveQueueFullError (API 레이어에서 503)
+
+설정: SAVE_QUEUE_BATCH, SAVE_QUEUE_DELAY(초), SAVE_QUEUE_MAX
+"""
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Callable, List, Optional
+
+
+class SaveQueueFullError(RuntimeError):
+    """대기 중인 기여가 max_pending 을 넘었을 때 발생한다."""
+
+
+def contribution_id(error_log: str, code: str, cause: str, solution: str) -> str:
+    """같은 로그/코드/원인/해결이면 같은 ID. (앞뒤 공백 차이는 무시)"""
+    parts = [(s or "").strip() for s in (error_log, code, cause, solution)]
+    return hashlib.sha1("\0".join(["user_contribution", *parts]).encode("utf-8")).hexdigest()
+
+
+@dataclass
+class Contribution:
+    id: str
+    text: str
+    metadata: dict
+    queued_at: float = field(default_factory=time.monotonic)
+
+
+class SaveQueue:
+    def __init__(self, writer: Callable[[List[Contribution]], None], max_batch: int = 32,
+                 max_delay: float = 2.0, max_pending: int = 1000):
+        self.writer = writer
+        self.max_batch = max(1, max_batch)
+        self.max_delay = max_delay
+        self.max_pending = max_pending
+        self._pending: "OrderedDict[str, Contribution]" = OrderedDict()
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._writing = 0
+        self._flush_requested = False
+        self._closed = False
+        self._retry_at = 0.0
+        self.submitted = 0
+        self.coalesced = 0
+        self.written = 0
+        self.batches = 0
+        self.failures = 0
+        self.last_error: Optional[str] = None
+
+    def submit(self, item: Contribution) -> bool:
+        """큐에 넣는다. 이미 대기 중인 같은 ID를 덮어썼으면 True."""
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("save queue is closed")
+            replaced = item.id in self._pending
+            if not replaced and len(self._pending) >= self.max_pending:
+                raise SaveQueueFullError("save queue is full")
+            if replaced:
+                item.queued_at = self._pending[item.id].queued_at
+                self.coalesced += 1
+            self._pending[item.id] = item
+            self.submitted += 1
+            self._ensure_worker()
+            self._cond.notify_all()
+            return replaced
+
+    def _ensure_worker(self) -> None:
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="save-queue", daemon=True)
+            self._thread.start()
+
+    def _due(self, now: float) -> bool:
+        if not self._pending or now < self._retry_at:
+            return False
+        if self._flush_requested or self._closed or len(self._pending) >= self.max_batch:
+            return True
+        oldest = next(iter(self._pending.values()))
+        return now - oldest.queued_at >= self.max_delay
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._due(time.monotonic()):
+                    if self._closed and not self._pending:
+                        return
+                    if not self._pending:
+                        self._flush_requested = False
+                        self._cond.notify_all()
+                    self._cond.wait(timeout=self._wait_time())
+                batch = [self._pending.popitem(last=False)[1] for _ in range(min(self.max_batch, len(self._pending)))]
+                self._writing += len(batch)
+
+            error = None
+            try:
+                self.writer(batch)
+            except Exception as e:
+                error = e
+
+            with self._cond:
+                self._writing -= len(batch)
+                if error is None:
+                    self.written += len(batch)
+                    self.batches += 1
+                else:
+                    self.failures += 1
+                    self.last_error = f"{type(error).__name__}: {error}"
+                    print(f"❌ [SaveQueue] {len(batch)}건 쓰기 실패, {self.max_delay}s 후 재시도: {error}")
+                    self._retry_at = time.monotonic() + self.max_delay
+                    for item in reversed(batch):
+                        # 그 사이 같은 ID가 새로 들어왔으면 새 것을 유지한다.
+                        if item.id not in self._pending:
+                            self._pending[item.id] = item
+                            self._pending.move_to_end(item.id, last=False)
+                    if self._closed:
+                        return  # 종료 중에는 재시도하지 않는다
+                self._cond.notify_all()
+
+    def _wait_time(self) -> Optional[float]:
+        if not self._pending:
+            return None
+        oldest = next(iter(self._pending.values()))
+        wake = max(oldest.queued_at + self.max_delay, self._retry_at)
+        return max(0.01, wake - time.monotonic())
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """대기 중인 항목을 지금 쓰고, 다 쓸 때까지 기다린다. 시간 안에 비우면 True.
+
+        writer 가 실패하면 max_delay 간격의 재시도도 기다린다.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            if not self._pending and not self._writing:
+                return True
+            self._flush_requested = True
+            self._retry_at = 0.0
+            self._ensure_worker()
+            self._cond.notify_all()
+            while self._pending or self._writing:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(timeout=remaining)
+            return True
+
+    def close(self, timeout: Optional[float] = 10.0) -> bool:
+        """남은 항목을 쓰고 워커를 멈춘다."""
+        done = self.flush(timeout)
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        return done
+
+    def stats(self) -> dict:
+        with self._cond:
+            oldest = next(iter(self._pending.values()), None)
+            return {
+                "depth": len(self._pending),
+                "writing": self._writing,
+                "oldest_age_s": round(time.monotonic() - oldest.queued_at, 3) if oldest else 0.0,
+                "max_batch": self.max_batch,
+                "max_delay": self.max_delay,
+                "max_pending": self.max_pending,
+                "submitted": self.submitted,
+                "coalesced": self.coalesced,
+                "written": self.written,
+                "batches": self.batches,
+                "failures": self.failures,
+                "last_error": self.last_error,
+            }
+
+
+def save_queue_from_env(writer: Callable[[List[Contribution]], None]) -> SaveQueue:
+    return SaveQueue(
+        writer,
+        max_batch=int(os.getenv("SAVE_QUEUE_BATCH", "32")),
+        max_delay=float(os.getenv("SAVE_QUEUE_DELAY", "2.0")),
+        max_pending=int(os.getenv("SAVE_QUEUE_MAX", "1000")),
+    )
@@ -0,0 +1,149 @@
+"""
+streaming.py
+
+/analyze/log/stream (SSE) 를 위한 점진적 파서/언마스커.
+
+- JsonFieldStreamParser: LLM 토큰 조각을 받아 JSON의 cause/solution/prevention
+  문자열 값을 도착하는 즉시 꺼낸다. (코드펜스/앞뒤 잡텍스트는 무시)
+- StreamingUnmasker: 필드 조각을 요청의 MaskingManager로 언마스킹한다.
+  플레이스홀더(IP_ADDR_10 등)가 조각 경계에 걸칠 수 있으므로 끝부분을 잠시 보류한다.
+"""
+import json
+import re
+from typing import Iterable, List, Optional, Tuple
+
+from dev.app.masking import MaskingManager
+
+STREAM_FIELDS = ("cause", "solution", "prevention")
+
+_ESCAPES = {'n': '\n', 't': '\t', 'r': '\r', 'b': '\b', 'f': '\f', '"': '"', '\\': '\\', '/': '/'}
+
+# 플레이스홀더를 구성할 수 있는 문자들로 끝나는 꼬리 (예: "[IP_ADDR_1")
+_PENDING_TAIL = re.compile(r'[\[A-Za-z0-9_]+$')
+_MAX_PENDING = 256
+
+
+class JsonFieldStreamParser:
+    """토큰 조각 단위로 JSON 객체를 훑으며 최상위 문자열 필드 값을 흘려보낸다."""
+
+    def __init__(self, fields: Iterable[str] = STREAM_FIELDS):
+        self.fields = set(fields)
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._unicode: Optional[str] = None
+        self._is_key = False
+        self._key_chars: List[str] = []
+        self._last_key: Optional[str] = None
+        self._expect_value = False
+        self._active: Optional[str] = None
+
+    def feed(self, text: str) -> List[Tuple[str, str, bool]]:
+        """(field, delta, finished) 목록을 반환한다. finished=True면 해당 필드 문자열이 닫힌 것."""
+        events: List[Tuple[str, str, bool]] = []
+        pending: List[str] = []
+
+        def flush(finished: bool = False):
+            if self._active and (pending or finished):
+                events.append((self._active, "".join(pending), finished))
+            pending.clear()
+
+        for ch in text:
+            if self._in_string:
+                if self._unicode is not None:
+                    self._unicode += ch
+                    if len(self._unicode) < 4:
+                        continue
+                    try:
+                        decoded = chr(int(self._unicode, 16))
+                    except ValueError:
+                        decoded = ""
+                    self._unicode = None
+                elif self._escape:
+                    self._escape = False
+                    if ch == 'u':
+                        self._unicode = ""
+                        continue
+                    decoded = _ESCAPES.get(ch, ch)
+                elif ch == '\\':
+                    self._escape = True
+                    continue
+                elif ch == '"':
+                    self._in_string = False
+                    if self._is_key:
+                        self._last_key = "".join(self._key_chars)
+                    else:
+                        flush(finished=True)
+                        self._active = None
+                    continue
+                else:
+                    decoded = ch
+
+                if self._is_key:
+                    self._key_chars.append(decoded)
+                elif self._active:
+                    pending.append(decoded)
+                continue
+
+            if ch in '{[':
+                self._depth += 1
+                self._expect_value = False
+            elif ch in '}]':
+                self._depth = max(0, self._depth - 1)
+            elif ch == ':':
+                self._expect_value = True
+            elif ch == ',':
+                self._expect_value = False
+            elif ch == '"' and self._depth >= 1:
+                self._in_string = True
+                if self._depth == 1 and not self._expect_value:
+                    self._is_key = True
+                    self._key_chars = []
+                else:
+                    self._is_key = False
+                    if self._depth == 1 and self._last_key in self.fields:
+                        self._active = self._last_key
+                    self._expect_value = False
+
+        flush()
+        return events
+
+
+class StreamingUnmasker:
+    """필드 하나의 조각들을 언마스킹한다. 경계에 걸친 플레이스홀더는 다음 조각까지 보류한다."""
+
+    def __init__(self, masker: MaskingManager):
+        self.masker = masker
+        self._buffer = ""
+
+    def feed(self, delta: str) -> str:
+        self._buffer += delta
+        m = _PENDING_TAIL.search(self._buffer)
+        cut = m.start() if m else len(self._buffer)
+        if len(self._buffer) - cut > _MAX_PENDING:
+            # 식별자 같은 긴 토큰은 계속 붙잡고 있지 않는다.
+            cut = len(self._buffer) - _MAX_PENDING
+        ready, self._buffer = self._buffer[:cut], self._buffer[cut:]
+        return self.masker.unmask(ready) if ready else ""
+
+    def flush(self) -> str:
+        ready, self._buffer = self._buffer, ""
+        return self.masker.unmask(ready) if ready else ""
+
+
+def chunk_text(content) -> str:
+    """메시지 청크의 content에서 텍스트 블록만 이어붙인다. (tool_use 입력 조각은 제외)"""
+    if isinstance(content, str):
+        return content
+    text = ""
+    for block in content or []:
+        if isinstance(block, dict):
+            if block.get("type", "text") == "text":
+                text += block.get("text", "")
+        elif isinstance(block, str):
+            text += block
+    return text
+
+
+def format_sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
@@ -0,0 +1,111 @@
+"""
+bench_ingest.py
+
+KB 적재 처리량 벤치마크 (외부 호출 없음).
+
+Bedrock / Pinecone 대신 지연과 스로틀링을 흉내 내는 대역을 쓴다.
+- FakeBedrock : embed_documents 1회 = base 지연 + 텍스트당 지연, throttle 확률로 ThrottlingException
+- FakePinecone: upsert 1회 = 고정 지연
+
+비교 대상
+- serial   : 파이프라인 도입 이전 방식 (파일마다 분할 → 임베딩 → 업서트를 순서대로, 재시도 없음)
+- pipeline : ingest.apply_plan (파일 경계 없는 배치 + 동시 임베딩 + 백그라운드 업서트 + 백오프)
+
+실행: python -m dev.benchmarks.bench_ingest [--files 40] [--chunks 12] [--workers 4] [--throttle 0.05]
+"""
+import argparse
+import random
+import threading
+import time
+
+from dev.app.llm.ingest import UPSERT_BATCH, apply_plan, plan_ingest
+
+
+def split(text):
+    return [p for p in text.split("\n\n") if p.strip()]
+
+
+class FakeBedrock:
+    def __init__(self, base_ms=120.0, per_text_ms=2.0, throttle=0.0, seed=0):
+        self.base = base_ms / 1000
+        self.per_text = per_text_ms / 1000
+        self.throttle = throttle
+        self.calls = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def embed_documents(self, texts):
+        with self._lock:
+            self.calls += 1
+            throttled = self._random.random() < self.throttle
+        if throttled:
+            time.sleep(self.base / 4)
+            raise RuntimeError("ThrottlingException: Rate exceeded")
+        time.sleep(self.base + self.per_text * len(texts))
+        return [[float(len(t)), 1.0] for t in texts]
+
+
+class FakePinecone:
+    def __init__(self, upsert_ms=60.0):
+        self.delay = upsert_ms / 1000
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def upsert(self, vectors, namespace=None):
+        time.sleep(self.delay)
+        with self._lock:
+            self.count += len(vectors)
+
+    def update(self, **_):
+        pass
+
+    def delete(self, **_):
+        pass
+
+
+def make_docs(files, chunks):
+    return [(f"doc{n}.md", "\n\n".join(f"doc{n} paragraph {i} " + "x" * 200 for i in range(chunks)))
+            for n in range(files)]
+
+
+def serial_ingest(plan, embedder, index):
+    """파이프라인 도입 이전: 파일 단위로 임베딩하고 업서트가 끝날 때까지 기다린다. 스로틀링이면 실패."""
+    by_source = {}
+    for chunk in plan.to_embed:
+        by_source.setdefault(chunk.source, []).append(chunk)
+    for chunks in by_source.values():
+        vectors = embedder.embed_documents([c.text for c in chunks])
+        items = [(c.id, v, c.metadata) for c, v in zip(chunks, vectors)]
+        for i in range(0, len(items), UPSERT_BATCH):
+            index.upsert(vectors=items[i:i + UPSERT_BATCH], namespace="bench")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--files", type=int, default=40)
+    parser.add_argument("--chunks", type=int, default=12, help="파일당 청크 수")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--embed-batch", type=int, default=64)
+    parser.add_argument("--throttle", type=float, default=0.05, help="pipeline 실행 시 스로틀링 확률")
+    args = parser.parse_args()
+
+    plan = plan_ingest(make_docs(args.files, args.chunks), None, split)
+    total = len(plan.to_embed)
+    print(f"chunks={total} files={args.files} workers={args.workers} embed_batch={args.embed_batch}")
+
+    index = FakePinecone()
+    start = time.perf_counter()
+    serial_ingest(plan, FakeBedrock(), index)
+    serial = time.perf_counter() - start
+    print(f"  serial   : {serial:6.2f}s  {total / serial:8.1f} chunks/s  (throttle=0, 재시도 없음)")
+
+    index = FakePinecone()
+    report = apply_plan(plan, FakeBedrock(throttle=args.throttle), index, "bench", log=lambda *_: None,
+                        workers=args.workers, embed_batch=args.embed_batch, backoff_base=0.05)
+    assert index.count == total
+    print(f"  pipeline : {report['seconds']:6.2f}s  {report['chunks_per_s']:8.1f} chunks/s  "
+          f"(throttle={args.throttle}, retries={report['retries']})  x{serial / report['seconds']:.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+"""
+bench_masking.py
+
+MaskingManager 마이크로 벤치마크.
+
+1) 이전(패턴별 findall + 전체 str.replace) 구현과 현재 single-pass 구현을
+   수 MB 로그 / 수천 개 IP 조건에서 비교한다.
+2) --rule-scaling: 규칙 수를 늘려 가며 결합 alternation(1회 스캔, MaskingManager.mask)과
+   규칙별 순차 re.sub(플레이스홀더 매핑 없음, 참고용) 비용을 비교한다.
+   합성 규칙은 requires 없이 등록한다(설정 파일 규칙과 같음). 패턴에서 뽑은 anchor 가 로그에 없으므로
+   결합 스캔 비용은 규칙 수와 무관해야 한다. 가장 많은 규칙에서 규칙이 없을 때보다
+   RULE_SCALING_LIMIT 배 넘게 느려지면 실패(종료 코드 1)한다.
+
+실행: python -m dev.benchmarks.bench_masking [--sizes-mb 1 4] [--unique-ips 3000] [--rule-scaling]
+"""
+import argparse
+import random
+import re
+import sys
+import time
+
+from dev.app.masking import MaskingManager
+from dev.app.masking_rules import BUILTIN_RULES, MaskRule, MaskRuleRegistry
+
+# --rule-scaling 허용치: 규칙을 64개 더해도 결합 스캔은 이 배수 안이어야 한다 (측정 잡음 여유 포함)
+RULE_SCALING_LIMIT = 1.3
+
+
+class LegacyMaskingManager:
+    """비교용: 단일 패스 엔진 이전의 구현."""
+    def __init__(self):
+        self.mapping_table = {}
+
+    def mask(self, text):
+        masked_text = text
+        ips = re.findall(r'\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3}', masked_text)
+        for i, ip in enumerate(list(set(ips))):
+            placeholder = f"IP_ADDR_{i}"
+            self.mapping_table[placeholder] = ip
+            masked_text = masked_text.replace(ip, f"[{placeholder}]")
+        docs = re.findall(r'[A-Z]{3}-\d{3}', masked_text)
+        for i, doc in enumerate(list(set(docs))):
+            placeholder = f"DOC_REF_{i}"
+            self.mapping_table[placeholder] = doc
+            masked_text = masked_text.replace(doc, f"[{placeholder}]")
+        return masked_text
+
+    def unmask(self, text):
+        for placeholder, original in self.mapping_table.items():
+            text = text.replace(f"[{placeholder}]", original)
+            text = text.replace(placeholder, original)
+        return text
+
+
+def make_log(size_bytes: int, unique_ips: int, seed: int = 7) -> str:
+    rng = random.Random(seed)
+    ips = [f"10.{rng.randint(0, 255)}.{rng.randint(0, 255)}.{rng.randint(1, 254)}" for _ in range(unique_ips)]
+    lines, total = [], 0
+    while total < size_bytes:
+        line = (
+            f"2024-05-01T10:{rng.randint(0, 59):02d}:{rng.randint(0, 59):02d}Z WARN conn "
+            f"{rng.choice(ips)} -> {rng.choice(ips)} retry={rng.randint(1, 9)} ref=ABC-{rng.randint(100, 999)}"
+        )
+        lines.append(line)
+        total += len(line) + 1
+    return "\n".join(lines)
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    out = fn(*args)
+    return out, time.perf_counter() - start
+
+
+def best_of(repeat, make_fn, *args):
+    # 인스턴스 상태(매핑 테이블)가 남지 않게 매번 새로 만든다
+    return min(timed(make_fn(), *args)[1] for _ in range(repeat))
+
+
+def run(sizes_mb, unique_ips, legacy=True):
+    results = []
+    for size in sizes_mb:
+        text = make_log(int(size * 1024 * 1024), unique_ips)
+        new = MaskingManager()
+        masked, t_mask = timed(new.mask, text)
+        _, t_unmask = timed(new.unmask, masked)
+        row = {"size_mb": size, "unique_ips": unique_ips, "mask_s": t_mask, "unmask_s": t_unmask}
+        if legacy:
+            old = LegacyMaskingManager()
+            old_masked, row["legacy_mask_s"] = timed(old.mask, text)
+            _, row["legacy_unmask_s"] = timed(old.unmask, old_masked)
+        results.append(row)
+    return results
+
+
+def run_rule_scaling(size_mb, rule_counts, unique_ips=3000, repeat=3):
+    """내장 규칙 + n개의 합성 규칙을 결합 스캐너 vs 규칙별 순차 re.sub 로 측정한다. (각각 best of repeat)"""
+    text = make_log(int(size_mb * 1024 * 1024), unique_ips)
+    results = []
+    for n in rule_counts:
+        extra = [MaskRule(f"CUSTOM{i}", rf'tok{i}_[0-9a-f]{{8}}', 0, 13) for i in range(n)]
+        registry = MaskRuleRegistry(list(BUILTIN_RULES) + extra)
+        t_combined = best_of(repeat, lambda: MaskingManager(registry).mask, text)
+
+        def sequential(t):
+            for rule in registry.rules:
+                t = re.sub(rule.pattern, lambda m: f"[{rule.name}]", t)
+            return t
+
+        t_sequential = best_of(repeat, lambda: sequential, text)
+        results.append({"rules": len(registry.rules), "combined_s": t_combined, "sequential_s": t_sequential})
+    return results
+
+
+def rule_scaling_ratio(results) -> float:
+    """가장 많은 규칙 / 가장 적은 규칙의 결합 스캔 시간 비."""
+    by_rules = sorted(results, key=lambda r: r["rules"])
+    return by_rules[-1]["combined_s"] / by_rules[0]["combined_s"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes-mb", type=float, nargs="+", default=[1, 4])
+    parser.add_argument("--unique-ips", type=int, default=3000)
+    parser.add_argument("--no-legacy", action="store_true", help="이전 구현 측정 생략 (느림)")
+    parser.add_argument("--rule-scaling", action="store_true", help="규칙 수 증가에 따른 스캔 비용 비교")
+    args = parser.parse_args()
+
+    if args.rule_scaling:
+        rows = run_rule_scaling(args.sizes_mb[0], [0, 8, 16, 32, 64], args.unique_ips)
+        for row in rows:
+            print(f"[{row['rules']:>3} rules] combined={row['combined_s']:.3f}s sequential={row['sequential_s']:.3f}s")
+        ratio = rule_scaling_ratio(rows)
+        if ratio > RULE_SCALING_LIMIT:
+            print(f"❌ [bench] combined scan grows with rule count: x{ratio:.2f} (limit x{RULE_SCALING_LIMIT})")
+            sys.exit(1)
+        print(f"✅ [bench] combined scan flat with rule count: x{ratio:.2f}")
+        return
+
+    for row in run(args.sizes_mb, args.unique_ips, legacy=not args.no_legacy):
+        line = f"[{row['size_mb']:>4} MB, {row['unique_ips']} IPs] mask={row['mask_s']:.3f}s unmask={row['unmask_s']:.3f}s"
+        if "legacy_mask_s" in row:
+            line += (
+                f" | legacy mask={row['legacy_mask_s']:.3f}s unmask={row['legacy_unmask_s']:.3f}s"
+                f" | speedup mask x{row['legacy_mask_s'] / row['mask_s']:.1f}"
+                f" unmask x{row['legacy_unmask_s'] / max(row['unmask_s'], 1e-9):.1f}"
+            )
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+bench_response_parser.py
+
+응답 파서 마이크로 벤치마크.
+
+이전 구현(필드마다 DOTALL 정규식 4개 + 키워드 슬라이싱을 반복)과
+response_parser.parse_response(세 필드 1회 추출)를 비교한다.
+
+- corpus : dev/tests/fixtures/model_outputs.jsonl 의 실제 형태 출력들
+- large  : 필드 값이 긴 정상 JSON (수십 KB)
+- no_fields   : 필드가 없는 긴 설명문 (거절/잡담 응답). 이전 구현은 필드마다 모든 패턴과
+                키워드 슬라이싱을 끝까지 시도한다.
+- malformed   : 닫히지 않는 따옴표 + 라벨 반복
+
+실행: python -m dev.benchmarks.bench_response_parser [--repeat 200] [--large-kb 64]
+"""
+import argparse
+import json
+import re
+import time
+from pathlib import Path
+
+from dev.app.response_parser import FIELDS, parse_response
+
+CORPUS = Path(__file__).resolve().parents[1] / "tests" / "fixtures" / "model_outputs.jsonl"
+
+
+def legacy_extract(field, text):
+    """비교용: 응답 파서 도입 이전의 robust_extract."""
+    patterns = [
+        rf'"{field}"\s*:\s*"(.*?)"(?=\s*,\s*"|\s*}}\s*$|\s*}}?\s*```|$)',
+        rf'"{field}"\s*:\s*(.*?)(?=\n\s*"\w+"|$)',
+        rf'\*\*{field}\*\*[:\s]+(.*?)(?=\n\*\*|$)',
+        rf'{field}[:\s]+(.*?)(?=\n\w+[:\s]|$)'
+    ]
+    for pattern in patterns:
+        m = re.search(pattern, text, re.DOTALL | re.IGNORECASE)
+        if m:
+            val = m.group(1).strip().strip('"').replace('\\n', '\n').replace('\\"', '"')
+            if len(val) > 2:
+                return val
+    lower_text = text.lower()
+    if field in lower_text:
+        idx = lower_text.find(field) + len(field)
+        sub = text[idx:].lstrip(' :"\n')
+        end_idx = len(sub)
+        for word in ["solution", "prevention", "cause", "원인", "해결", "방지"]:
+            found = sub.lower().find(word)
+            if 0 < found < end_idx:
+                end_idx = found
+        final_val = sub[:end_idx].strip(' ,}"\n')
+        if len(final_val) > 2:
+            return final_val
+    return None
+
+
+def legacy_extract_all(text):
+    return {f: legacy_extract(f, text) for f in FIELDS}
+
+
+def load_corpus():
+    with open(CORPUS, "r", encoding="utf-8") as f:
+        return [json.loads(line)["text"] for line in f if line.strip()]
+
+
+def make_large(kb: int) -> str:
+    body = "연결 재시도 중 타임아웃이 발생했습니다. " * (kb * 1024 // 60)
+    return json.dumps({"cause": body, "solution": body, "prevention": body}, ensure_ascii=False)
+
+
+def make_no_fields(kb: int) -> str:
+    return "로그만으로는 원인을 단정하기 어렵습니다. 추가 정보가 필요합니다.\n" * (kb * 1024 // 80)
+
+
+def make_malformed(n: int) -> str:
+    return '{"cause": "' + 'cause: "a", ' * n
+
+
+def timed(fn, texts, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for text in texts:
+            fn(text)
+    return (time.perf_counter() - start) / (repeat * len(texts))
+
+
+def run(repeat=200, large_kb=64):
+    few = max(1, repeat // 20)
+    suites = {
+        "corpus": (load_corpus(), repeat),
+        f"large_{large_kb}kb": ([make_large(large_kb)], few),
+        f"no_fields_{large_kb}kb": ([make_no_fields(large_kb)], few),
+        "malformed": ([make_malformed(2000)], few),
+    }
+    results = []
+    for name, (texts, n) in suites.items():
+        results.append({
+            "suite": name,
+            "parser_ms": timed(parse_response, texts, n) * 1000,
+            "legacy_ms": timed(legacy_extract_all, texts, n) * 1000,
+        })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--large-kb", type=int, default=64)
+    args = parser.parse_args()
+
+    for row in run(args.repeat, args.large_kb):
+        print(f"[{row['suite']:>18}] parser={row['parser_ms']:.3f}ms legacy={row['legacy_ms']:.3f}ms"
+              f" speedup x{row['legacy_ms'] / max(row['parser_ms'], 1e-9):.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+bench_startup.py
+
+컨테이너 콜드 스타트 예산 측정.
+
+- import      : 새 프로세스에서 `import dev.app.main` 까지 걸린 시간 (클라이언트 생성/그래프 컴파일 없이)
+- warmup      : import 이후 LLM 클라이언트 생성 + 그래프 컴파일 (lifespan warmup 의 그래프 단계, 네트워크 없음)
+- heavy       : import 직후 langchain_anthropic / langchain_aws / pinecone 이 로드되어 있는지 (없어야 정상)
+
+각 항목을 --repeat 번 새 프로세스로 재서 중앙값을 내고, 예산(ms)을 넘으면 exit 1.
+예산: STARTUP_IMPORT_BUDGET_MS (기본 2000), STARTUP_WARMUP_BUDGET_MS (기본 3000)
+
+실행: python -m dev.benchmarks.bench_startup [--repeat 5]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+PROBE = r"""
+import json, sys, time
+start = time.perf_counter()
+import dev.app.main as main
+imported = time.perf_counter()
+heavy = sorted(m for m in ("langchain_anthropic", "langchain_aws", "pinecone") if m in sys.modules)
+main.agent_with_graph.warmup(); main.get_app_graph()
+compiled = time.perf_counter()
+print(json.dumps({"import": (imported - start) * 1000, "warmup": (compiled - imported) * 1000, "heavy": heavy}))
+"""
+
+
+def probe() -> dict:
+    env = {
+        **os.environ,
+        "ANTHROPIC_MODEL_ID": os.getenv("ANTHROPIC_MODEL_ID", "bench-model"),
+        "ANTHROPIC_API_KEY": os.getenv("ANTHROPIC_API_KEY", "bench-key"),
+        "PYTHONDONTWRITEBYTECODE": "1",
+    }
+    out = subprocess.run([sys.executable, "-c", PROBE], capture_output=True, text=True, env=env, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    budgets = {
+        "import": float(os.getenv("STARTUP_IMPORT_BUDGET_MS", "2000")),
+        "warmup": float(os.getenv("STARTUP_WARMUP_BUDGET_MS", "3000")),
+    }
+    runs = [probe() for _ in range(args.repeat)]
+    failed = False
+    for name, budget in budgets.items():
+        median = statistics.median(r[name] for r in runs)
+        ok = median <= budget
+        failed |= not ok
+        print(f"  {name:12s}: median {median:8.1f}ms  budget {budget:8.1f}ms  {'OK' if ok else 'OVER'}")
+    heavy = runs[-1]["heavy"]
+    print(f"  heavy modules loaded at import: {heavy or 'none'}")
+    failed |= bool(heavy)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
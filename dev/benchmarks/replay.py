@@ -0,0 +1,392 @@
+"""
+replay.py
+
+녹화한 트래픽(dev/app/llm/recorder.py)으로 /analyze/log 를 오프라인 부하 테스트한다.
+
+ChatAnthropic / BedrockEmbeddings / Pinecone 인덱스를 녹화 결과를 돌려주는 대역으로 바꿔 끼운다.
+- ReplayLLM       : (단계, 사용자 프롬프트 해시)가 같은 녹화 응답. 없으면 같은 단계 응답 중 해시로 하나 고른다.
+- ReplayEmbeddings: 녹화된 질의면 그 조회 결과를 가리키는 1차원 벡터 [slot], 아니면 [-1]
+- ReplayIndex     : 위 벡터가 가리키는 녹화 matches (없으면 빈 결과)
+응답은 결정적이고, 지연만 분포에서 뽑는다. 임베딩 캐시/마스킹/파싱/그래프는 실제 코드가 돈다.
+
+지연 분포 (--llm-latency, --embed-latency, --query-latency)
+  empirical          : 녹화된 지연에서 복원 추출 (기본)
+  fixed:MS           : 고정
+  uniform:LO,HI      : 균등
+  lognormal:P50,P95  : 로그정규 (p50/p95 ms 로 지정)
+  0                  : 지연 없음
+
+실행:
+  python -m dev.benchmarks.replay run data/replay/corpus.jsonl --qps 20 --requests 400 --out reports/replay.json
+  python -m dev.benchmarks.replay run corpus.jsonl --qps 20 --compare reports/replay.json   # 이전 리비전과 비교
+  python -m dev.benchmarks.replay serve corpus.jsonl --port 8000                            # 대역을 낀 서버 (uvicorn)
+  python -m dev.benchmarks.replay run corpus.jsonl --url http://localhost:8000 --qps 50     # 외부 서버 부하
+
+run 은 기본으로 프로세스 안에서(ASGI) 앱을 호출한다. 요청 i 는 시작 + i/qps 에 보내고(open-loop),
+지연은 예정 시각부터 잰다. (서버가 밀리면 대기 시간까지 지연에 포함된다)
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import subprocess
+import threading
+import time
+from collections import Counter as Tally
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+from langchain_core.messages import AIMessage
+
+from dev.app import metrics
+from dev.app.llm.recorder import prompt_key, text_key
+
+FALLBACK_CONTENT = json.dumps({"cause": "replay", "solution": "replay", "prevention": "replay"})
+
+
+class Latency:
+    def __init__(self, kind: str, params: Tuple[float, ...] = (), samples: Optional[List[float]] = None):
+        self.kind, self.params, self.samples = kind, params, samples or []
+
+    @classmethod
+    def parse(cls, spec: str, samples: Optional[List[float]] = None) -> "Latency":
+        kind, _, args = spec.partition(":")
+        params = tuple(float(a) for a in args.split(",") if a)
+        expected = {"empirical": 0, "0": 0, "fixed": 1, "uniform": 2, "lognormal": 2}
+        if kind not in expected or len(params) != expected[kind]:
+            raise ValueError(f"bad latency spec: {spec!r}")
+        return cls(kind, params, samples)
+
+    def sample_ms(self, rng: random.Random) -> float:
+        if self.kind == "fixed":
+            return self.params[0]
+        if self.kind == "uniform":
+            return rng.uniform(*self.params)
+        if self.kind == "lognormal":
+            p50, p95 = self.params
+            sigma = max(0.0, math.log(p95 / p50)) / 1.645
+            return rng.lognormvariate(math.log(p50), sigma)
+        if self.kind == "empirical" and self.samples:
+            return rng.choice(self.samples)
+        return 0.0
+
+
+@dataclass
+class Corpus:
+    requests: List[dict] = field(default_factory=list)
+    llm: Dict[Tuple[str, str], dict] = field(default_factory=dict)
+    llm_by_stage: Dict[str, List[dict]] = field(default_factory=dict)
+    embeds: Dict[str, dict] = field(default_factory=dict)
+    queries: List[dict] = field(default_factory=list)
+    query_slot: Dict[str, int] = field(default_factory=dict)
+    latencies_ms: Dict[str, List[float]] = field(default_factory=dict)
+
+    @classmethod
+    def load(cls, path: str) -> "Corpus":
+        corpus = cls()
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    corpus.add(json.loads(line))
+        return corpus
+
+    def add(self, event: dict) -> None:
+        kind = event["type"]
+        if kind == "request":
+            self.requests.append(event)
+            return
+        if kind == "llm":
+            self.llm.setdefault((event["stage"], event["key"]), event)
+            self.llm_by_stage.setdefault(event["stage"], []).append(event)
+        elif kind == "embed":
+            self.embeds.setdefault(event["key"], event)
+        elif kind == "query":
+            if event["vector_key"] not in self.query_slot:
+                self.query_slot[event["vector_key"]] = len(self.queries)
+                self.queries.append(event)
+        self.latencies_ms.setdefault(kind, []).append(float(event.get("ms", 0)))
+
+    def summary(self) -> dict:
+        return {"requests": len(self.requests), "llm": sum(len(v) for v in self.llm_by_stage.values()),
+                "embed": len(self.embeds), "query": len(self.queries)}
+
+
+class _Stand:
+    def __init__(self, latency: Latency, seed: int):
+        self.latency = latency
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.calls = 0
+
+    def _delay(self) -> float:
+        with self._lock:
+            self.calls += 1
+            return self.latency.sample_ms(self._rng) / 1000
+
+
+class ReplayLLM(_Stand):
+    def __init__(self, corpus: Corpus, latency: Latency, stage: str = "draft", seed: int = 0):
+        super().__init__(latency, seed)
+        self.corpus, self.stage = corpus, stage
+        self.misses = 0
+
+    def bind_tools(self, tools, **_):
+        return ReplayLLM(self.corpus, self.latency, "final", seed=self._rng.randrange(1 << 30))
+
+    def _reply(self, messages) -> AIMessage:
+        key = prompt_key(messages)
+        event = self.corpus.llm.get((self.stage, key))
+        if event is None:
+            self.misses += 1
+            pool = self.corpus.llm_by_stage.get(self.stage) or []
+            event = pool[int(key, 16) % len(pool)] if pool else {"content": FALLBACK_CONTENT}
+        return AIMessage(content=event["content"], usage_metadata=event.get("usage") or None)
+
+    def invoke(self, messages, *_, **__):
+        time.sleep(self._delay())
+        return self._reply(messages)
+
+    async def ainvoke(self, messages, *_, **__):
+        await asyncio.sleep(self._delay())
+        return self._reply(messages)
+
+
+class ReplayEmbeddings(_Stand):
+    def __init__(self, corpus: Corpus, latency: Latency, seed: int = 0):
+        super().__init__(latency, seed)
+        self.corpus = corpus
+
+    def embed_query(self, text: str) -> List[float]:
+        time.sleep(self._delay())
+        event = self.corpus.embeds.get(text_key(text))
+        slot = self.corpus.query_slot.get(event["vector_key"], -1) if event else -1
+        return [float(slot)]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        time.sleep(self._delay())
+        return [[-1.0] for _ in texts]
+
+
+class ReplayIndex(_Stand):
+    def __init__(self, corpus: Corpus, latency: Latency, seed: int = 0):
+        super().__init__(latency, seed)
+        self.corpus = corpus
+
+    def query(self, vector=None, top_k: int = 3, **_):
+        time.sleep(self._delay())
+        slot = int(vector[0]) if vector else -1
+        matches = self.corpus.queries[slot]["matches"] if 0 <= slot < len(self.corpus.queries) else []
+        return {"matches": matches[:top_k]}
+
+    def describe_index_stats(self):
+        return {"replay": True, "queries": len(self.corpus.queries)}
+
+    def upsert(self, **_):
+        pass
+
+    def update(self, **_):
+        pass
+
+    def delete(self, **_):
+        pass
+
+
+def install(corpus: Corpus, llm: str = "empirical", embed: str = "empirical", query: str = "empirical",
+            seed: int = 0) -> dict:
+    """agent_with_graph / tools 싱글톤을 대역으로 바꿔 끼운다. 대역 객체들을 돌려준다."""
+    from dev.app.llm import agent_with_graph as ag
+    from dev.app.llm import tools
+    from dev.app.llm.embedding_cache import CachedEmbeddings, EmbeddingCache
+
+    lat = corpus.latencies_ms
+    stands = {
+        "llm": ReplayLLM(corpus, Latency.parse(llm, lat.get("llm")), "draft", seed),
+        "embed": ReplayEmbeddings(corpus, Latency.parse(embed, lat.get("embed")), seed + 1),
+        "index": ReplayIndex(corpus, Latency.parse(query, lat.get("query")), seed + 2),
+    }
+    stands["llm_with_tools"] = stands["llm"].bind_tools([])
+    ag.llm = stands["llm"]
+    ag.llm_with_tools = stands["llm_with_tools"]
+    # 임베딩 캐시는 그대로 둔다 (녹화 때처럼 캐시 히트는 대역까지 오지 않는다). 디스크 캐시는 쓰지 않는다.
+    cache = EmbeddingCache(max_entries=int(os.getenv("EMBEDDING_CACHE_SIZE", "4096")))
+    tools._embedder = CachedEmbeddings(stands["embed"], "replay", cache)
+    tools._pinecone_index = stands["index"]
+    tools._namespace = "replay"
+    os.environ["RAG_BACKEND"] = "pinecone"
+    return stands
+
+
+# --- 부하 ---
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    rank = max(0, math.ceil(q / 100 * len(sorted_values)) - 1)
+    return sorted_values[rank]
+
+
+def stage_breakdown(before: dict, after: dict) -> dict:
+    """두 stage_seconds 스냅샷 차이로 단계별 호출 수, 평균, p95(버킷 상한 근사) ms 를 낸다."""
+    buckets = metrics.stage_seconds.buckets
+    out = {}
+    for key, row in sorted(after.items()):
+        prev = before.get(key) or [0] * len(row)
+        delta = [a - b for a, b in zip(row, prev)]
+        count = delta[-1]
+        if not count:
+            continue
+        target, seen, p95 = 0.95 * count, 0, float("inf")
+        for bound, n in zip(buckets, delta):
+            seen += n
+            if seen >= target:
+                p95 = bound
+                break
+        out[key[0]] = {"count": count, "mean_ms": round(delta[-2] / count * 1000, 2),
+                       "p95_ms_le": p95 * 1000 if p95 != float("inf") else None}
+    return out
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              timeout=5).stdout.strip() or "unknown"
+    except Exception:
+        return "unknown"
+
+
+async def drive(requests: List[dict], qps: float, count: int, url: Optional[str] = None,
+                timeout: float = 120.0) -> List[dict]:
+    """open-loop 로 count 건을 qps 속도로 보낸다. 요청 본문은 녹화 순서대로 돌려 쓴다."""
+    import httpx
+
+    if url:
+        client = httpx.AsyncClient(base_url=url, timeout=timeout)
+    else:
+        from dev.app import main
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://replay",
+                                   timeout=timeout)
+
+    results: List[dict] = []
+
+    async def one(body: dict, due: float):
+        try:
+            res = await client.post("/analyze/log", json=body)
+            served = res.json().get("served_by") if res.status_code == 200 else None
+            results.append({"status": res.status_code, "served_by": served, "ms": (time.perf_counter() - due) * 1000})
+        except Exception as e:
+            results.append({"status": type(e).__name__, "served_by": None, "ms": (time.perf_counter() - due) * 1000})
+
+    async with client:
+        start = time.perf_counter()
+        tasks = []
+        for i in range(count):
+            due = start + i / qps
+            delay = due - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            req = requests[i % len(requests)]
+            body = {"persona": req["persona"], "input_mode": req["input_mode"],
+                    "error_log": req.get("log", ""), "code": req.get("code", "")}
+            tasks.append(asyncio.create_task(one(body, due)))
+        await asyncio.gather(*tasks)
+    return results
+
+
+def run_load(corpus: Corpus, qps: float, count: int, url: Optional[str] = None) -> dict:
+    if not corpus.requests:
+        raise ValueError("corpus has no requests")
+    before = metrics.stage_seconds.snapshot()
+    start = time.perf_counter()
+    results = asyncio.run(drive(corpus.requests, qps, count, url))
+    elapsed = time.perf_counter() - start
+    ok = sorted(r["ms"] for r in results if r["status"] == 200)
+    return {
+        "revision": git_revision(),
+        "target_qps": qps,
+        "requests": count,
+        "completed": len(ok),
+        "errors": dict(Tally(str(r["status"]) for r in results if r["status"] != 200)),
+        "seconds": round(elapsed, 3),
+        "throughput_rps": round(len(ok) / elapsed, 2) if elapsed else 0.0,
+        "latency_ms": {
+            "p50": round(percentile(ok, 50), 2), "p95": round(percentile(ok, 95), 2),
+            "p99": round(percentile(ok, 99), 2), "max": round(ok[-1], 2) if ok else 0.0,
+            "mean": round(sum(ok) / len(ok), 2) if ok else 0.0,
+        },
+        "served_by": dict(Tally(r["served_by"] for r in results if r["served_by"])),
+        # 외부 서버(--url)면 이 프로세스의 지표가 아니므로 비어 있다. 서버의 /metrics 를 볼 것
+        "stages": {} if url else stage_breakdown(before, metrics.stage_seconds.snapshot()),
+    }
+
+
+def print_report(report: dict, baseline: Optional[dict] = None) -> None:
+    lat = report["latency_ms"]
+    print(f"[replay] rev={report['revision']} {report['completed']}/{report['requests']} ok "
+          f"in {report['seconds']}s -> {report['throughput_rps']} rps (target {report['target_qps']})")
+    if report["errors"]:
+        print(f"  errors: {report['errors']}")
+    print(f"  latency ms  p50={lat['p50']}  p95={lat['p95']}  p99={lat['p99']}  max={lat['max']}")
+    print(f"  served_by   {report['served_by']}")
+    for stage, s in report["stages"].items():
+        print(f"  {stage:<12} n={s['count']:<6} mean={s['mean_ms']:>9.2f}ms  p95<={s['p95_ms_le']}")
+    if baseline:
+        print(f"  vs rev={baseline.get('revision')}:")
+        for q in ("p50", "p95", "p99"):
+            old, new = baseline["latency_ms"][q], lat[q]
+            change = f"{(new - old) / old * 100:+.1f}%" if old else "n/a"
+            print(f"    {q:<4} {old:>9.2f} -> {new:>9.2f} ms ({change})")
+        print(f"    rps  {baseline['throughput_rps']:>9.2f} -> {report['throughput_rps']:>9.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="녹화 트래픽으로 /analyze/log 오프라인 부하 테스트")
+    sub = parser.add_subparsers(dest="command", required=True)
+    for name in ("run", "serve"):
+        p = sub.add_parser(name)
+        p.add_argument("corpus", help="RECORD_PATH 로 녹화한 JSONL")
+        p.add_argument("--llm-latency", default="empirical")
+        p.add_argument("--embed-latency", default="empirical")
+        p.add_argument("--query-latency", default="empirical")
+        p.add_argument("--seed", type=int, default=0)
+        p.add_argument("--cache", action="store_true", help="분석 결과 캐시를 켠다 (기본은 꺼서 매번 그래프를 탄다)")
+    run = sub.choices["run"]
+    run.add_argument("--qps", type=float, default=10.0)
+    run.add_argument("--requests", type=int, default=200)
+    run.add_argument("--url", help="프로세스 안 대신 이 서버로 보낸다 (예: replay serve 로 띄운 서버)")
+    run.add_argument("--out", help="보고서 JSON 저장 경로")
+    run.add_argument("--compare", help="이전 보고서 JSON 과 비교")
+    serve = sub.choices["serve"]
+    serve.add_argument("--host", default="127.0.0.1")
+    serve.add_argument("--port", type=int, default=8000)
+    args = parser.parse_args()
+
+    corpus = Corpus.load(args.corpus)
+    print(f"[corpus] {corpus.summary()}")
+    if args.command == "serve" or not args.url:
+        from dev.app import main as app_main
+        from dev.app.cache import AnalysisCache
+        install(corpus, args.llm_latency, args.embed_latency, args.query_latency, args.seed)
+        if not args.cache:
+            app_main.analysis_cache = AnalysisCache(max_entries=0)
+
+    if args.command == "serve":
+        import uvicorn
+        uvicorn.run(app_main.app, host=args.host, port=args.port)
+        return
+
+    report = run_load(corpus, args.qps, args.requests, args.url)
+    baseline = None
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+    print_report(report, baseline)
+    if args.out:
+        os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
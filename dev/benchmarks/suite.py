@@ -0,0 +1,456 @@
+"""
+suite.py
+
+핫패스 오프라인 벤치마크 + 기준선(JSON) 대비 회귀 검사.
+
+외부 호출 없이 돈다. (LLM / 임베딩 / 인덱스는 대역, 분석 캐시와 fast path 는 끈다)
+- mask_*, unmask_*          : MaskingManager.mask / unmask, 로그 크기별
+- extract_unmask_*          : robust_extract_and_unmask, 실제 형태 출력 / 깨진 출력 / 필드 없는 장문
+- build_user_prompt         : 그래프 입력 프롬프트 조립
+- graph_direct, graph_rag   : 가짜 LLM 으로 컴파일된 그래프 invoke (초안만 / 초안 → 검색 → 최종)
+- rag_search_local          : 로컬 인덱스 대역(LocalIndex + BM25)에 rag_search
+- analyze_e2e               : TestClient 로 /analyze/log 왕복
+
+케이스마다 best_us(라운드별 호출당 평균의 최솟값, timeit 방식)를 기준선과 비교해
+tolerance(기본 0.25 = 25%, BENCH_TOLERANCE) 넘게 느려지면 exit 1.
+공유 VM 에서는 기계 전체가 느려지는 구간이 있어서 두 가지로 보정한다.
+- calibration: 라운드마다 코드와 무관한 고정 작업(정규식/JSON/산술)을 함께 재서, 그 대비 비율(relative)로
+  비교한다. (--no-normalize 면 best_us 그대로 비교)
+- 회귀로 보이는 케이스는 --confirm 번 다시 재고 가장 좋은 값으로 판정한다.
+기준선 항목에 "tolerance" 를 두면 그 케이스만 다른 허용치를 쓴다.
+기준선은 기계마다 다르므로 CI 러너에서 --update 로 다시 만든다.
+
+실행:
+  python -m dev.benchmarks.suite                    # 측정 + dev/benchmarks/baseline.json 과 비교
+  python -m dev.benchmarks.suite --only mask graph  # 이름에 포함된 케이스만
+  python -m dev.benchmarks.suite --update           # 기준선 갱신 (측정한 케이스만)
+"""
+import argparse
+import contextlib
+import gc
+import hashlib
+import io
+import json
+import os
+import platform
+import re
+import statistics
+import sys
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+from langchain_core.messages import AIMessage, HumanMessage
+
+from dev.benchmarks.bench_masking import make_log
+from dev.benchmarks.bench_response_parser import load_corpus, make_malformed, make_no_fields
+from dev.benchmarks.replay import git_revision
+
+BASELINE = Path(__file__).resolve().parent / "baseline.json"
+TOLERANCE = float(os.getenv("BENCH_TOLERANCE", "0.25"))
+METRIC = "best_us"
+
+FINAL = json.dumps({"cause": "[IP_ADDR_0] 로의 연결이 끊겼습니다.", "solution": "재시도와 타임아웃을 설정하세요.",
+                    "prevention": "커넥션 풀 상태를 모니터링하세요."}, ensure_ascii=False)
+DRAFT_UNSURE = "로그만으로는 원인이 불확실 합니다. 추가 정보가 필요합니다."
+
+TRACEBACK = """Traceback (most recent call last):
+  File "/srv/app/client.py", line 88, in fetch
+    resp = session.get(url, timeout=5)
+  File "/usr/lib/python3/site-packages/requests/sessions.py", line 602, in get
+    return self.request("GET", url, **kwargs)
+requests.exceptions.ConnectionError: ECONNRESET while reading from 10.20.30.40:5432
+"""
+
+
+@dataclass
+class Case:
+    name: str
+    setup: Callable[[contextlib.ExitStack], Callable[[], object]]   # 준비 후 측정할 함수를 돌려준다
+    number: int                                                      # 라운드당 호출 수
+
+
+CASES: List[Case] = []
+
+
+def case(name: str, number: int):
+    def register(setup):
+        CASES.append(Case(name, setup, number))
+        return setup
+    return register
+
+
+def _patch(stack: contextlib.ExitStack, obj, attr: str, value) -> None:
+    old = getattr(obj, attr)
+    setattr(obj, attr, value)
+    stack.callback(setattr, obj, attr, old)
+
+
+def _setenv(stack: contextlib.ExitStack, **env) -> None:
+    old = {k: os.environ.get(k) for k in env}
+    os.environ.update(env)
+    stack.callback(lambda: [os.environ.pop(k, None) if v is None else os.environ.__setitem__(k, v)
+                            for k, v in old.items()])
+
+
+# --- 대역 ---
+
+class InstantLLM:
+    """검색 결과 메시지가 없으면 초안(draft), 있으면 최종 JSON 을 바로 돌려준다."""
+
+    def __init__(self, draft: str):
+        self.draft = draft
+
+    def bind_tools(self, tools):
+        return self
+
+    def _reply(self, messages):
+        last = messages[-1]
+        knowledge = isinstance(last, HumanMessage) and str(last.content).startswith("[검색된 지식]")
+        return AIMessage(content=FINAL if knowledge else self.draft)
+
+    def invoke(self, messages, *_, **__):
+        return self._reply(messages)
+
+    async def ainvoke(self, messages, *_, **__):
+        return self._reply(messages)
+
+
+class HashEmbeddings:
+    def __init__(self, dim: int):
+        self.dim = dim
+
+    def embed_query(self, text: str) -> List[float]:
+        seed = int(hashlib.sha1(text.encode("utf-8")).hexdigest()[:8], 16)
+        return np.random.default_rng(seed).standard_normal(self.dim).astype(np.float32).tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self.embed_query(t) for t in texts]
+
+
+def _local_index(n: int = 5000, dim: int = 256):
+    from dev.app.llm.local_index import LocalIndex
+
+    rng = np.random.default_rng(7)
+    codes = ["ECONNRESET", "ETIMEDOUT", "KeyError", "NullPointerException", "OOMKilled", "ENOSPC", "HTTP 502"]
+    words = "connection pool timeout retry socket worker queue disk memory thread lock deadlock cache".split()
+    items = []
+    for i in range(n):
+        text = f"{codes[i % len(codes)]} " + " ".join(rng.choice(words, 40)) + f" runbook step {i}"
+        items.append((f"kb#{i}", rng.standard_normal(dim).astype(np.float32), {
+            "source": f"kb/{i % 50}.md", "chunk_index": i, "text": text, "doc_type": "kb_md"}))
+    return LocalIndex.build(items)
+
+
+def _install_rag(stack: contextlib.ExitStack) -> None:
+    from dev.app.llm import tools
+    from dev.app.llm.embedding_cache import CachedEmbeddings, EmbeddingCache
+    from dev.app.llm.lexical_index import BM25Index
+
+    local = _local_index()
+    local.warm()
+    _setenv(stack, RAG_BACKEND="local", RAG_HYBRID="1")
+    _patch(stack, tools, "_local_index", local)
+    _patch(stack, tools, "_lexical_index", BM25Index.from_local_index(local))
+    # 임베딩 캐시를 끄고 매번 임베딩 대역을 거친다 (검색 경로 자체를 잰다)
+    _patch(stack, tools, "_embedder", CachedEmbeddings(HashEmbeddings(local.dim), "bench", EmbeddingCache(max_entries=0)))
+
+
+def _install_graph(stack: contextlib.ExitStack, draft: str):
+    from dev.app.llm import agent_with_graph as ag
+
+    llm = InstantLLM(draft)
+    _setenv(stack, FAST_PATH="0")
+    for name, value in (("llm", llm), ("llm_with_tools", llm), ("SPECULATIVE_RAG", False)):
+        if name in vars(ag):
+            _patch(stack, ag, name, value)
+        else:
+            setattr(ag, name, value)
+            stack.callback(vars(ag).pop, name, None)
+    _install_rag(stack)
+    return ag.build_graph().compile()
+
+
+def _state(log: str) -> dict:
+    return {"messages": [], "persona": "junior", "input_mode": "log", "log_text": log, "code_text": ""}
+
+
+# --- 케이스 ---
+
+def _mask_case(size: int):
+    def setup(stack):
+        from dev.app.masking import MaskingManager
+        text = make_log(size, unique_ips=max(10, size // 2000))
+        return lambda: MaskingManager().mask(text)
+    return setup
+
+
+def _unmask_case(size: int):
+    def setup(stack):
+        from dev.app.masking import MaskingManager
+        masker = MaskingManager()
+        masked = masker.mask(make_log(size, unique_ips=max(10, size // 2000)))
+        return lambda: masker.unmask(masked)
+    return setup
+
+
+case("mask_4kb", 200)(_mask_case(4 * 1024))
+case("mask_64kb", 20)(_mask_case(64 * 1024))
+case("mask_1mb", 1)(_mask_case(1024 * 1024))
+case("unmask_64kb", 20)(_unmask_case(64 * 1024))
+case("unmask_1mb", 1)(_unmask_case(1024 * 1024))
+
+
+def _extract_case(texts_fn):
+    def setup(stack):
+        from dev.app.main import robust_extract_and_unmask
+        from dev.app.masking import MaskingManager
+        from dev.app.response_parser import FIELDS
+        texts = texts_fn()
+        masker = MaskingManager()
+        masker.mask(TRACEBACK)
+
+        def run():
+            for text in texts:
+                for f in FIELDS:
+                    robust_extract_and_unmask(f, text, masker)
+        return run
+    return setup
+
+
+case("extract_unmask_realistic", 20)(_extract_case(load_corpus))
+case("extract_unmask_malformed", 5)(_extract_case(lambda: [make_malformed(2000)]))
+case("extract_unmask_no_fields_16kb", 5)(_extract_case(lambda: [make_no_fields(16)]))
+
+
+@case("build_user_prompt", 2000)
+def _build_user_prompt(stack):
+    from dev.app.llm.agent_with_graph import build_user_prompt
+    log = make_log(8 * 1024, unique_ips=20)
+    code = "def fetch(url):\n    return session.get(url, timeout=5)\n" * 20
+    return lambda: build_user_prompt("log_code", log, code)
+
+
+@case("graph_direct", 50)
+def _graph_direct(stack):
+    graph = _install_graph(stack, FINAL)
+    state = _state(TRACEBACK)
+    return lambda: graph.invoke(state)
+
+
+@case("graph_rag", 20)
+def _graph_rag(stack):
+    graph = _install_graph(stack, DRAFT_UNSURE)
+    state = _state(TRACEBACK)
+    return lambda: graph.invoke(state)
+
+
+@case("rag_search_local", 20)
+def _rag_search(stack):
+    from dev.app.llm import tools
+    _install_rag(stack)
+    return lambda: tools.rag_search(TRACEBACK, top_k=5)
+
+
+@case("analyze_e2e", 10)
+def _analyze_e2e(stack):
+    from fastapi.testclient import TestClient
+    from dev.app import main
+    from dev.app.cache import AnalysisCache
+
+    graph = _install_graph(stack, DRAFT_UNSURE)
+    _patch(stack, main, "app_graph", graph)
+    _patch(stack, main, "analysis_cache", AnalysisCache(max_entries=0))
+    # lifespan 은 돌리지 않는다 (종료 시 save_queue 를 닫기 때문)
+    client = TestClient(main.app)
+    body = {"persona": "junior", "input_mode": "log", "error_log": make_log(8 * 1024, unique_ips=20) + "\n" + TRACEBACK}
+
+    def run():
+        res = client.post("/analyze/log", json=body)
+        assert res.status_code == 200, res.text
+    return run
+
+
+# --- 측정 / 비교 ---
+
+_CAL_RE = re.compile(r"(\d{1,3}\.){3}\d{1,3}")
+_CAL_TEXT = " ".join(f"host 10.0.{i % 256}.{i % 200} ok" for i in range(400))
+
+
+def _calibration_work():
+    _CAL_RE.sub("[IP]", _CAL_TEXT)
+    json.loads(json.dumps({"k": list(range(300)), "s": _CAL_TEXT[:2000]}))
+    sum(i * i for i in range(3000))
+
+
+CAL_NUMBER = 10
+
+
+def _calibration_round() -> float:
+    start = time.perf_counter()
+    for _ in range(CAL_NUMBER):
+        _calibration_work()
+    return (time.perf_counter() - start) / CAL_NUMBER
+
+
+def measure(fn: Callable[[], object], number: int, repeat: int) -> dict:
+    """라운드마다 calibration 작업과 케이스를 번갈아 잰다.
+
+    relative = 케이스 1회 시간 / 같은 순간의 calibration 1회 시간 (라운드 중 최솟값).
+    기계 전체가 느려지면 둘 다 느려지므로 relative 는 덜 흔들린다.
+    """
+    fn()  # 워밍업 (지연 import, 정규식 컴파일, 첫 캐시 채우기)
+    _calibration_work()
+    rounds, ratios, cals = [], [], []
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            cal = _calibration_round()
+            start = time.perf_counter()
+            for _ in range(number):
+                fn()
+            per_call = (time.perf_counter() - start) / number
+            cal = min(cal, _calibration_round())
+            rounds.append(per_call)
+            cals.append(cal)
+            ratios.append(per_call / cal)
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+    return {"best_us": round(min(rounds) * 1e6, 2), "median_us": round(statistics.median(rounds) * 1e6, 2),
+            "relative": round(min(ratios), 5), "calibration_us": round(statistics.median(cals) * 1e6, 2),
+            "number": number, "repeat": repeat}
+
+
+def run_case(c: Case, repeat: int) -> dict:
+    # print 가 많은 경로(main)도 있어서 측정 중 출력은 버린다
+    with contextlib.ExitStack() as stack, contextlib.redirect_stdout(io.StringIO()):
+        fn = c.setup(stack)
+        return measure(fn, c.number, repeat)
+
+
+def run(only: Optional[List[str]] = None, repeat: int = 5, log=print) -> Dict[str, dict]:
+    results = {}
+    for c in CASES:
+        if only and not any(o in c.name for o in only):
+            continue
+        results[c.name] = run_case(c, repeat)
+        log(f"  {c.name:<32} best {results[c.name]['best_us']:>12.1f}us  median {results[c.name]['median_us']:>12.1f}us")
+    return results
+
+
+def confirm(results: Dict[str, dict], names: List[str], repeat: int, log=print) -> None:
+    """회귀로 보인 케이스를 다시 재서 더 좋은 값으로 바꾼다. (일시적인 노이즈 걸러내기)"""
+    by_name = {c.name: c for c in CASES}
+    for name in names:
+        again = run_case(by_name[name], repeat)
+        if again[METRIC] < results[name][METRIC]:
+            results[name] = again
+        log(f"  [confirm] {name:<32} best {results[name][METRIC]:>12.1f}us")
+
+
+def environment() -> dict:
+    return {"python": platform.python_version(), "machine": platform.machine(), "system": platform.system(),
+            "processor": platform.processor() or "", "revision": git_revision()}
+
+
+def compare(results: Dict[str, dict], baseline: dict, tolerance: float = TOLERANCE,
+            normalize: bool = True) -> List[dict]:
+    """normalize: 양쪽에 relative 가 있으면 그것으로 비교하고, normalized_us 는 기준선 기계 속도로 환산한 값."""
+    rows = []
+    base_results = baseline.get("results", {})
+    for name, current in results.items():
+        base = base_results.get(name)
+        if not base:
+            rows.append({"case": name, "status": "new", "current_us": current[METRIC]})
+            continue
+        tol = float(base.get("tolerance", tolerance))
+        if normalize and base.get("relative") and current.get("relative"):
+            change = current["relative"] / base["relative"] - 1
+            normalized = base["calibration_us"] * current["relative"]
+        else:
+            change = current[METRIC] / base[METRIC] - 1 if base[METRIC] else 0.0
+            normalized = current[METRIC]
+        status = "regressed" if change > tol else ("improved" if change < -tol else "ok")
+        rows.append({"case": name, "status": status, "baseline_us": base[METRIC], "current_us": current[METRIC],
+                     "normalized_us": round(normalized, 2), "change": round(change, 4), "tolerance": tol})
+    return rows
+
+
+def save_baseline(path: Path, results: Dict[str, dict]) -> None:
+    data = {"metric": METRIC, "environment": environment(), "results": {}}
+    if path.exists():
+        with open(path, "r", encoding="utf-8") as f:
+            data["results"] = json.load(f).get("results", {})
+    for name, r in results.items():
+        keep = {"tolerance": data["results"][name]["tolerance"]} if "tolerance" in data["results"].get(name, {}) else {}
+        data["results"][name] = {**r, **keep}
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2, sort_keys=True)
+        f.write("\n")
+
+
+def write_report(path: str, results: Dict[str, dict], rows: Optional[List[dict]] = None) -> None:
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"environment": environment(), "results": results, "comparison": rows or []},
+                  f, ensure_ascii=False, indent=2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="핫패스 오프라인 벤치마크 + 회귀 검사")
+    parser.add_argument("--only", nargs="+", help="이름에 이 문자열이 들어간 케이스만")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--baseline", default=str(BASELINE))
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE, help="허용 비율 (0.25 = 25%% 느려질 때까지 통과)")
+    parser.add_argument("--confirm", type=int, default=2, help="회귀로 보이는 케이스를 다시 재는 횟수")
+    parser.add_argument("--update", action="store_true", help="측정 결과로 기준선을 갱신")
+    parser.add_argument("--no-normalize", action="store_true", help="calibration 속도 보정을 하지 않는다")
+    parser.add_argument("--out", help="이번 측정 결과 JSON 저장 경로")
+    args = parser.parse_args()
+
+    print(f"[bench] {environment()}")
+    results = run(args.only, args.repeat)
+    path = Path(args.baseline)
+    if args.update or not path.exists():
+        if args.out:
+            write_report(args.out, results)
+        if args.update:
+            save_baseline(path, results)
+            print(f"[bench] baseline updated -> {path}")
+        else:
+            print(f"[bench] no baseline at {path}; run with --update to create one")
+        return
+
+    with open(path, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    base_env = baseline.get("environment", {})
+    if (base_env.get("python"), base_env.get("machine")) != (platform.python_version(), platform.machine()):
+        print(f"⚠️ [bench] baseline was recorded on {base_env}; numbers may not be comparable")
+
+    rows = compare(results, baseline, args.tolerance, not args.no_normalize)
+    for _ in range(args.confirm):
+        suspects = [r["case"] for r in rows if r["status"] == "regressed"]
+        if not suspects:
+            break
+        confirm(results, suspects, args.repeat)
+        rows = compare(results, baseline, args.tolerance, not args.no_normalize)
+    for row in rows:
+        if row["status"] == "new":
+            print(f"  {row['case']:<32} new (no baseline)")
+            continue
+        print(f"  {row['case']:<32} {row['baseline_us']:>12.1f} -> {row['normalized_us']:>12.1f}us "
+              f"{row['change'] * 100:+7.1f}% (tol {row['tolerance'] * 100:.0f}%)  {row['status'].upper()}")
+    if args.out:
+        write_report(args.out, results, rows)
+    regressed = [r["case"] for r in rows if r["status"] == "regressed"]
+    if regressed:
+        print(f"❌ [bench] regressions: {', '.join(regressed)}")
+        sys.exit(1)
+    print("✅ [bench] no regressions")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+from dev.app.cache import AnalysisCache
+from dev.app.llm import answer_store
+from dev.app.llm.answer_store import AnswerStore, adapt, seed_from_contributions
+
+LOG_A = """2024-05-01 10:22:31,114 ERROR [pid 4121]
+Traceback (most recent call last):
+  File "/srv/app/users.py", line 12, in load_user
+    return CACHE[uid]
+KeyError: 'user_id'
+"""
+LOG_B = LOG_A.replace("10:22:31,114", "08:01:09,991").replace("pid 4121", "pid 77").replace("line 12", "line 14")
+
+ANSWER = {
+    "cause": "1. 캐시에 user_id 키가 없습니다.\n   로그인 전에 조회했습니다.\n2. 캐시 초기화 순서 문제입니다.",
+    "solution": "1. CACHE.get 을 쓰세요.\n2. 초기화 순서를 고치세요.\n3. 테스트를 추가하세요.\n4. 모니터링을 붙이세요.",
+    "prevention": "키 존재 여부를 먼저 확인하세요. 초기화 순서를 문서화하세요. 리뷰에서 확인하세요.",
+}
+
+
+def test_match_ignores_noise_and_adapts_per_persona():
+    store = AnswerStore()
+    assert store.add(LOG_A, ANSWER, "kb")
+    assert store.add("그냥 느려요", ANSWER, "kb") is None  # 예외 헤더가 없으면 등록하지 않는다
+
+    hit = store.match(LOG_B)
+    assert hit is not None and hit["source"] == "kb"
+    assert store.match(LOG_B.replace("KeyError", "IndexError")) is None
+
+    senior = adapt(hit, "senior")
+    assert senior["solution"].count("\n") == 2 and "로그인 전에" not in senior["cause"]
+    assert adapt(hit, "junior")["cause"] == ANSWER["cause"]
+
+
+def test_low_confidence_contributions_are_not_served():
+    store = AnswerStore(min_confidence=0.8)
+    records = [
+        {**ANSWER, "doc_type": "user_contribution", "error_sample": LOG_A, "merged_count": 1, "vetted": True},
+        {**ANSWER, "doc_type": "kb_md", "error_sample": LOG_A, "merged_count": 9},
+    ]
+    assert seed_from_contributions(store, records, min_merged=2) == 0
+    records[0]["merged_count"] = 3
+    assert seed_from_contributions(store, records, min_merged=2) == 1
+    assert store.match(LOG_B)["source"] == "user_contribution x3"
+
+
+def test_conflicting_unvetted_contributions_in_one_cluster_are_not_served(tmp_path):
+    import numpy as np
+    from dev.app.llm import compact
+    from dev.app.llm.answer_store import vet_contributions
+    from dev.app.llm.local_index import LocalIndex
+
+    # 비슷한 로그 4건: 두 사람은 캐시 키 누락, 두 사람은 전혀 다른 원인을 적었다
+    other = {"cause": "DB 가 내려가 있습니다.", "solution": "DB 를 재시작하세요.", "prevention": "헬스체크를 두세요."}
+    rng = np.random.default_rng(0)
+    base = rng.normal(size=16)
+    items = [(f"c{i}", (base + rng.normal(scale=0.01, size=16)).tolist(),
+              {**answer, "doc_type": "user_contribution", "error_sample": LOG_A})
+             for i, answer in enumerate([ANSWER, other, ANSWER, {**other, "cause": "디스크가 가득 찼습니다.",
+                                                                   "solution": "로그를 정리하세요."}])]
+    local = LocalIndex.build(items, "float32")
+    compact.apply_compaction(compact.plan_compaction(local, 0.95), local, log=lambda *_: None)
+
+    # 합쳐진 것은 같은 답 두 건뿐이고, 검토 전이라 fast path 에 오르지 않는다
+    assert sorted(md.get("merged_count", 1) for md in local.metadata) == [1, 1, 2]
+    store = AnswerStore(min_confidence=0.8)
+    assert seed_from_contributions(store, local.metadata, min_merged=2) == 0
+    assert store.match(LOG_B) is None
+
+    # 다른 답을 낸 기여는 검토를 거쳐도 같은 답 수가 모자라 쓰이지 않는다
+    vet_contributions(local, [id_ for id_, md in zip(local.ids, local.metadata) if md["cause"] != ANSWER["cause"]])
+    assert seed_from_contributions(store, local.metadata, min_merged=2) == 0
+    vet_contributions(local, [id_ for id_, md in zip(local.ids, local.metadata) if md.get("merged_count") == 2])
+    assert seed_from_contributions(store, local.metadata, min_merged=2) == 1
+    assert store.match(LOG_B)["cause"] == ANSWER["cause"].strip()
+
+
+def test_contributions_with_unmasked_values_are_not_seeded():
+    store = AnswerStore(min_confidence=0.8)
+    leaked = {**ANSWER, "cause": "10.0.0.7 캐시 서버에 user_id 키가 없습니다.",
+              "doc_type": "user_contribution", "error_sample": LOG_A, "merged_count": 5, "vetted": True}
+    assert seed_from_contributions(store, [leaked], min_merged=2) == 0
+    assert store.match(LOG_B) is None
+    # /save/result 가 마스킹해 둔 값은 그대로 통과한다
+    masked = {**leaked, "cause": "[IP_ADDR_0] 캐시 서버에 user_id 키가 없습니다."}
+    assert seed_from_contributions(store, [masked], min_merged=2) == 1
+
+
+class ExplodingLLM:
+    def bind_tools(self, tools):
+        return self
+
+    def invoke(self, messages):
+        raise AssertionError("fast path should not call the LLM")
+
+    ainvoke = invoke
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setenv("ANTHROPIC_MODEL_ID", "fake-model")
+    monkeypatch.setenv("ANTHROPIC_API_KEY", "fake-key")
+    from dev.app import main
+    from dev.app.llm import agent_with_graph as ag
+
+    store = AnswerStore()
+    store.add(LOG_A, ANSWER, "kb")
+    monkeypatch.setattr(answer_store, "_store", store)
+    monkeypatch.setattr(ag, "llm", ExplodingLLM())
+    monkeypatch.setattr(main, "app_graph", ag.build_graph().compile())
+    monkeypatch.setattr(main, "analysis_cache", AnalysisCache(max_entries=0))
+    return TestClient(main.app)
+
+
+def test_analyze_serves_known_signature_without_llm(client):
+    res = client.post("/analyze/log", json={"persona": "senior", "input_mode": "log", "error_log": LOG_B})
+    assert res.status_code == 200
+    body = res.json()
+    assert body["served_by"] == "fast_path"
+    assert body["solution"].startswith("1. CACHE.get") and "4." not in body["solution"]
+
+    res = client.post("/analyze/log/stream", json={"persona": "junior", "input_mode": "log", "error_log": LOG_B})
+    done = [json.loads(b.split("data: ", 1)[1]) for b in res.text.strip().split("\n\n") if b.startswith("event: done")]
+    assert done[0]["served_by"] == "fast_path" and done[0]["cause"] == ANSWER["cause"]
@@ -0,0 +1,64 @@
+import asyncio
+import json
+import pytest
+from fastapi.testclient import TestClient
+
+from dev.app.cache import AnalysisCache
+from dev.app.concurrency import AnalysisLimiter
+
+
+class FakeBatchGraph:
+    """log_text에 'boom'이 있으면 실패하는 그래프 대역."""
+    def __init__(self):
+        self.calls = 0
+
+    async def ainvoke(self, state):
+        from langchain_core.messages import AIMessage
+        self.calls += 1
+        await asyncio.sleep(0.01)
+        if "boom" in state["log_text"]:
+            raise RuntimeError("llm exploded")
+        payload = {"cause": f"원인: {state['log_text']}", "solution": "해결 방법입니다", "prevention": "예방 수칙입니다"}
+        return {"messages": [AIMessage(content=json.dumps(payload, ensure_ascii=False))]}
+
+
+@pytest.fixture
+def batch_client(monkeypatch):
+    monkeypatch.setenv("ANTHROPIC_MODEL_ID", "fake-model")
+    monkeypatch.setenv("ANTHROPIC_API_KEY", "fake-key")
+    from dev.app import main
+    graph = FakeBatchGraph()
+    monkeypatch.setattr(main, "app_graph", graph)
+    monkeypatch.setattr(main, "analysis_limiter", AnalysisLimiter(max_in_flight=4, max_queue=16))
+    monkeypatch.setattr(main, "analysis_cache", AnalysisCache(max_entries=0))
+    return TestClient(main.app), graph
+
+
+def test_batch_dedupes_and_reports_per_item_errors(batch_client):
+    client, graph = batch_client
+    items = [
+        {"persona": "junior", "input_mode": "log", "error_log": "KeyError: 'id'"},
+        {"persona": "junior", "input_mode": "log", "error_log": "  KeyError: 'id'  "},
+        {"persona": "senior", "input_mode": "log", "error_log": "KeyError: 'id'"},
+        {"persona": "junior", "input_mode": "log", "error_log": "boom"},
+    ]
+    res = client.post("/analyze/batch", json={"items": items})
+    assert res.status_code == 200
+
+    lines = [json.loads(line) for line in res.text.splitlines()]
+    by_index = {line["index"]: line for line in lines if line["type"] == "item"}
+    assert sorted(by_index) == [0, 1, 2, 3]
+    assert graph.calls == 3
+
+    assert by_index[0]["status"] == "ok"
+    assert by_index[1]["result"] == by_index[0]["result"]
+    assert [by_index[0]["deduplicated"], by_index[1]["deduplicated"]].count(True) == 1
+    assert by_index[3]["status"] == "error"
+    assert "llm exploded" in by_index[3]["error"]
+
+    assert lines[-1] == {"type": "summary", "total": 4, "unique": 3, "ok": 3, "error": 1}
+
+
+def test_batch_rejects_empty(batch_client):
+    client, _ = batch_client
+    assert client.post("/analyze/batch", json={"items": []}).status_code == 400
@@ -0,0 +1,44 @@
+import json
+
+from dev.app.llm import agent_with_graph as ag
+from dev.benchmarks import suite
+
+
+def test_compare_flags_regressions_with_tolerance_and_speed():
+    baseline = {"results": {
+        "a": {"best_us": 100.0},
+        "b": {"best_us": 100.0, "tolerance": 0.5},
+        "c": {"best_us": 100.0},
+    }}
+    results = {"a": {"best_us": 130.0}, "b": {"best_us": 140.0}, "c": {"best_us": 60.0}, "d": {"best_us": 1.0}}
+    rows = {r["case"]: r for r in suite.compare(results, baseline, tolerance=0.25)}
+    assert rows["a"]["status"] == "regressed"
+    assert rows["b"]["status"] == "ok"          # 케이스별 허용치
+    assert rows["c"]["status"] == "improved"
+    assert rows["d"]["status"] == "new"
+
+    # 같은 순간의 calibration 대비 비율(relative)이 그대로면 기계가 느려진 것으로 본다
+    baseline["results"]["a"].update(relative=2.0, calibration_us=50.0)
+    results["a"].update(relative=2.1, calibration_us=65.0)
+    rows = {r["case"]: r for r in suite.compare(results, baseline, tolerance=0.25)}
+    assert rows["a"]["status"] == "ok" and rows["a"]["normalized_us"] == 105.0
+    rows = {r["case"]: r for r in suite.compare(results, baseline, tolerance=0.25, normalize=False)}
+    assert rows["a"]["status"] == "regressed"
+
+
+def test_run_selected_cases_and_restore_globals(tmp_path, monkeypatch):
+    monkeypatch.setenv("ANTHROPIC_MODEL_ID", "fake-model")
+    monkeypatch.setenv("ANTHROPIC_API_KEY", "fake-key")
+    before = dict(vars(ag))
+    results = suite.run(["build_user_prompt", "graph_direct"], repeat=1, log=lambda *_: None)
+    assert set(results) == {"build_user_prompt", "graph_direct"}
+    assert all(r["best_us"] > 0 for r in results.values())
+    # 대역으로 바꿔 끼운 전역은 케이스가 끝나면 원래대로 돌아온다
+    assert {k: vars(ag).get(k) for k in ("llm", "llm_with_tools", "SPECULATIVE_RAG")} == \
+        {k: before.get(k) for k in ("llm", "llm_with_tools", "SPECULATIVE_RAG")}
+
+    path = tmp_path / "baseline.json"
+    suite.save_baseline(path, results)
+    saved = json.loads(path.read_text(encoding="utf-8"))
+    assert saved["metric"] == "best_us"
+    assert saved["results"]["graph_direct"]["number"] == 50 and saved["results"]["graph_direct"]["relative"] > 0
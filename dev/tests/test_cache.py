@@ -0,0 +1,158 @@
+import json
+import time
+import pytest
+from fastapi.testclient import TestClient
+
+from dev.app.cache import AnalysisCache, analysis_cache_key
+from dev.app.concurrency import AnalysisLimiter
+
+
+def test_lru_evicts_least_recently_used():
+    cache = AnalysisCache(max_entries=2, ttl=60)
+    cache.set("a", {"cause": "1"})
+    cache.set("b", {"cause": "2"})
+    assert cache.get("a") == {"cause": "1"}
+    cache.set("c", {"cause": "3"})
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+    stats = cache.stats()
+    assert stats["evictions"] == 1
+    assert stats["hits"] == 2 and stats["misses"] == 1
+
+
+def test_ttl_expires_entries():
+    cache = AnalysisCache(max_entries=4, ttl=0.01)
+    cache.set("a", {"cause": "1"})
+    time.sleep(0.02)
+    assert cache.get("a") is None
+
+
+def test_disk_backend_survives_restart(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    AnalysisCache(max_entries=4, ttl=60, path=path).set("k", {"cause": "[IP_ADDR_0] 접속 실패"})
+    reopened = AnalysisCache(max_entries=4, ttl=60, path=path)
+    assert reopened.get("k") == {"cause": "[IP_ADDR_0] 접속 실패"}
+
+
+def test_key_depends_on_prompt_version_and_model():
+    base = analysis_cache_key("log", "code", "junior", "log", "model-a", "v1")
+    assert base == analysis_cache_key("log", "code", "junior", "log", "model-a", "v1")
+    assert base != analysis_cache_key("log", "code", "junior", "log", "model-b", "v1")
+    assert base != analysis_cache_key("log", "code", "junior", "log", "model-a", "v2")
+    assert base != analysis_cache_key("log", "code", "senior", "log", "model-a", "v1")
+
+
+class EchoGraph:
+    """마스킹된 로그를 그대로 cause에 넣어 돌려주는 그래프 대역."""
+    def __init__(self):
+        self.calls = 0
+
+    async def ainvoke(self, state):
+        from langchain_core.messages import AIMessage
+        self.calls += 1
+        payload = {"cause": f"{state['log_text']} 연결 실패", "solution": "해결 방법입니다", "prevention": "예방 수칙입니다"}
+        return {"messages": [AIMessage(content=json.dumps(payload, ensure_ascii=False))]}
+
+
+@pytest.fixture
+def cached_api(monkeypatch):
+    monkeypatch.setenv("ANTHROPIC_MODEL_ID", "fake-model")
+    monkeypatch.setenv("ANTHROPIC_API_KEY", "fake-key")
+    from dev.app import main
+    graph, cache = EchoGraph(), AnalysisCache(max_entries=16, ttl=60)
+    monkeypatch.setattr(main, "app_graph", graph)
+    monkeypatch.setattr(main, "analysis_cache", cache)
+    monkeypatch.setattr(main, "analysis_limiter", AnalysisLimiter(max_in_flight=2, max_queue=4))
+    return TestClient(main.app), graph, cache
+
+
+def test_cache_hit_is_unmasked_per_request(cached_api):
+    client, graph, cache = cached_api
+    first = client.post("/analyze/log", json={"persona": "junior", "input_mode": "log", "error_log": "10.0.0.1"})
+    second = client.post("/analyze/log", json={"persona": "junior", "input_mode": "log", "error_log": "192.168.1.9"})
+
+    assert graph.calls == 1
+    assert first.json()["cause"] == "10.0.0.1 연결 실패"
+    assert second.json()["cause"] == "192.168.1.9 연결 실패"
+
+    # 캐시에는 원본 IP가 남지 않는다.
+    stored = json.dumps(list(cache._entries.values()), ensure_ascii=False)
+    assert "10.0.0.1" not in stored and "192.168.1.9" not in stored
+
+    stats = client.get("/cache/stats").json()
+    assert stats["hits"] == 1 and stats["misses"] == 1
+
+
+def test_noisy_variants_share_fingerprint_cache_entry(cached_api):
+    client, graph, _ = cached_api
+    for ts, pid in (("2024-05-01 10:22:31", 4121), ("2024-06-13 08:01:09", 77)):
+        log = f"{ts} ERROR [pid {pid}]\nValueError: invalid literal for int()"
+        res = client.post("/analyze/log", json={"persona": "senior", "input_mode": "log", "error_log": log})
+        assert res.status_code == 200
+    assert graph.calls == 1
+
+
+def test_disk_store_batches_touches_and_prunes_over_cap(tmp_path):
+    import asyncio
+    cache = AnalysisCache(max_entries=1, ttl=60, path=str(tmp_path / "cache.sqlite"), disk_max_entries=2)
+    disk = cache._disk
+    disk.prune_interval = 3600
+
+    async def run():
+        await cache.aset("a", {"cause": "1"})
+        await cache.aset("b", {"cause": "2"})
+        assert await cache.aget("a") == {"cause": "1"}  # 메모리 미스 → 디스크 조회
+        assert "a" in disk._touched                      # accessed_at 은 아직 쓰지 않았다
+        await cache.aset("c", {"cause": "3"})            # 행 수가 cap 을 넘으면 정리 (b 가 가장 오래됨)
+
+    asyncio.run(run())
+    assert disk._touched == {}
+    rows = {k for (k,) in disk._conn.execute("SELECT key FROM analysis_cache")}
+    assert rows == {"a", "c"}
+
+
+def test_disk_store_overwrites_do_not_trigger_prune(tmp_path, monkeypatch):
+    from dev.app.cache import _SqliteStore
+    disk = _SqliteStore(str(tmp_path / "cache.sqlite"), max_entries=3, prune_interval=3600)
+    pruned = []
+    monkeypatch.setattr(disk, "_prune", lambda now: pruned.append(now))
+
+    now = time.time()
+    for i in range(50):
+        for key in ("a", "b", "c"):
+            disk.set(key, {"cause": str(i)}, now + 60, now)
+    assert disk._rows == 3 and pruned == []
+    assert disk.get("a", now)[0] == {"cause": "49"}
+
+    disk.set("d", {"cause": "new"}, now + 60, now)
+    assert disk._rows == 4 and len(pruned) == 1
+
+
+def test_fingerprint_key_includes_placeholder_table(cached_api):
+    client, graph, _ = cached_api
+
+    def analyze(log):
+        res = client.post("/analyze/log", json={"persona": "junior", "input_mode": "log", "error_log": log})
+        assert res.status_code == 200
+        return res.json()["cause"]
+
+    # 에러 줄이 같아 시그니처는 같지만 플레이스홀더 구성이 다르다
+    first = analyze("ERROR upstream refused\nretrying host 10.0.0.1")
+    second = analyze("ERROR upstream refused\nnotify ops@example.com")
+    assert graph.calls == 2
+    assert "10.0.0.1" in first and "ops@example.com" in second and "[" not in second
+
+    # 같은 구성이면 공유하고, 자기 값으로 언마스킹된다
+    third = analyze("ERROR upstream refused\nretrying host 10.9.9.9")
+    assert graph.calls == 2
+    assert "10.9.9.9" in third and "10.0.0.1" not in third
+
+
+def test_fingerprint_key_separates_logs_that_differ_after_five_error_lines():
+    from dev.app import main
+
+    steps = "".join(f"ERROR step {i} failed\n" for i in range(5))
+    state = {"persona": "junior", "input_mode": "log", "code_text": ""}
+    disk = main.cache_key_for({**state, "log_text": steps + "ERROR disk full on /data"})
+    perm = main.cache_key_for({**state, "log_text": steps + "ERROR permission denied on /etc/shadow"})
+    assert main.CACHE_KEY_MODE == "fingerprint" and disk != perm
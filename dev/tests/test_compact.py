@@ -0,0 +1,68 @@
+import sys
+
+import numpy as np
+
+from dev.app.llm import compact
+from dev.app.llm.local_index import LocalIndex
+
+
+def contribution_items(seed=0):
+    rng = np.random.default_rng(seed)
+    base = rng.normal(size=(3, 32))
+    items = []
+    # 주제 0: 거의 같은 기여 4건, 주제 1: 2건, 주제 2: 1건
+    for topic, copies, persona in ((0, 4, "junior"), (1, 2, "senior"), (2, 1, "junior")):
+        for k in range(copies):
+            vec = base[topic] + rng.normal(scale=0.02, size=32)
+            md = {"doc_type": "user_contribution", "persona": persona if k else "senior",
+                  "cause": f"cause {topic}", "solution": f"solution {topic}"}
+            items.append((f"c{topic}-{k}", vec.tolist(), md))
+    # 같은 주제의 KB 청크는 건드리지 않는다
+    items.append(("kb-0", base[0].tolist(), {"doc_type": "kb_md", "text": "kb"}))
+    return items
+
+
+def test_plan_groups_near_duplicates_only():
+    local = LocalIndex.build(contribution_items(), "float32")
+    plan = compact.plan_compaction(local, threshold=0.95)
+    assert plan.summary() == {"scanned": 7, "threshold": 0.95, "clusters": 2, "delete": 4, "remaining": 3}
+    big = plan.clusters[0]
+    assert sorted(big.members) == ["c0-0", "c0-1", "c0-2", "c0-3"]
+    assert big.metadata["merged_count"] == 4 and big.metadata["personas"] == ["junior", "senior"]
+    assert "kb-0" not in plan.to_delete
+
+
+def test_cli_dry_run_then_apply_on_local_snapshot(tmp_path, monkeypatch, capsys):
+    LocalIndex.build(contribution_items(), "float16").save(str(tmp_path))
+
+    monkeypatch.setattr(sys, "argv", ["compact", "--local", str(tmp_path), "--dry-run"])
+    compact.main()
+    assert '"delete": 4' in capsys.readouterr().out
+    assert len(LocalIndex.load(str(tmp_path))) == 8
+
+    monkeypatch.setattr(sys, "argv", ["compact", "--local", str(tmp_path)])
+    compact.main()
+    after = LocalIndex.load(str(tmp_path))
+    assert len(after) == 4
+    merged = [md for md in after.metadata if md.get("merged_count")]
+    assert sorted(md["merged_count"] for md in merged) == [2, 4]
+
+    # 다시 돌려도 더 지울 것이 없다
+    assert compact.plan_compaction(after, 0.95).to_delete == []
+
+
+def test_members_with_different_answers_are_kept_and_not_counted():
+    rng = np.random.default_rng(3)
+    base = rng.normal(size=32)
+    answers = [("DB 커넥션 풀 고갈", "풀 크기를 늘리세요"), ("DB 커넥션 풀 고갈", "풀 크기를 늘리세요"),
+               ("방화벽이 포트를 막음", "보안 그룹 5432 허용"), ("", "")]
+    items = [(f"c{i}", (base + rng.normal(scale=0.01, size=32)).tolist(),
+              {"doc_type": "user_contribution", "persona": "junior", "cause": cause, "solution": solution})
+             for i, (cause, solution) in enumerate(answers)]
+    plan = compact.plan_compaction(LocalIndex.build(items, "float32"), threshold=0.95)
+
+    # 로그는 모두 비슷하지만 같은 답을 낸 두 건만 합친다
+    (cluster,) = plan.clusters
+    assert sorted(cluster.members) == ["c0", "c1"] and cluster.metadata["merged_count"] == 2
+    assert sorted(cluster.conflicts) == ["c2", "c3"] and plan.to_delete == [m for m in cluster.members if m != cluster.canonical]
+    assert compact.answers_agree({"cause": "a b c"}, {"cause": "a b c d"}) and not compact.answers_agree({}, {})
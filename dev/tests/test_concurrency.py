@@ -0,0 +1,96 @@
+import asyncio
+import json
+import pytest
+from fastapi.testclient import TestClient
+
+from dev.app.cache import AnalysisCache
+from dev.app.concurrency import AnalysisBusyError, AnalysisLimiter
+
+
+def test_limiter_bounds_in_flight():
+    limiter = AnalysisLimiter(max_in_flight=2, max_queue=10, queue_timeout=5)
+    peak = 0
+
+    async def job():
+        nonlocal peak
+        async with limiter.slot():
+            peak = max(peak, limiter.in_flight)
+            await asyncio.sleep(0.01)
+
+    async def run():
+        await asyncio.gather(*(job() for _ in range(8)))
+
+    asyncio.run(run())
+    assert peak == 2
+    assert limiter.in_flight == 0
+
+
+def test_limiter_rejects_when_queue_full():
+    limiter = AnalysisLimiter(max_in_flight=1, max_queue=1, queue_timeout=5)
+
+    async def hold(event):
+        async with limiter.slot():
+            await event.wait()
+
+    async def run():
+        release = asyncio.Event()
+        first = asyncio.create_task(hold(release))
+        await asyncio.sleep(0)
+        second = asyncio.create_task(hold(release))
+        await asyncio.sleep(0)
+        with pytest.raises(AnalysisBusyError):
+            async with limiter.slot():
+                pass
+        release.set()
+        await asyncio.gather(first, second)
+
+    asyncio.run(run())
+    assert limiter.rejected == 1
+
+
+class FakeAsyncGraph:
+    """ainvoke만 제공하는 그래프 대역. 동시에 실행 중인 호출 수를 기록한다."""
+    def __init__(self):
+        self.active = 0
+        self.peak = 0
+
+    async def ainvoke(self, state):
+        from langchain_core.messages import AIMessage
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        await asyncio.sleep(0.05)
+        self.active -= 1
+        payload = {"cause": "원인 설명입니다", "solution": "해결 방법입니다", "prevention": "예방 수칙입니다"}
+        return {"messages": [AIMessage(content=json.dumps(payload, ensure_ascii=False))]}
+
+
+@pytest.fixture
+def main_module(monkeypatch):
+    monkeypatch.setenv("ANTHROPIC_MODEL_ID", "fake-model")
+    monkeypatch.setenv("ANTHROPIC_API_KEY", "fake-key")
+    from dev.app import main
+    monkeypatch.setattr(main, "app_graph", FakeAsyncGraph())
+    monkeypatch.setattr(main, "analysis_limiter", AnalysisLimiter(max_in_flight=4, max_queue=16))
+    monkeypatch.setattr(main, "analysis_cache", AnalysisCache(max_entries=0))
+    return main
+
+
+def test_analyze_log_runs_concurrently(main_module):
+    import httpx
+
+    async def run():
+        transport = httpx.ASGITransport(app=main_module.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            payload = {"persona": "junior", "input_mode": "log", "error_log": "Error at 10.0.0.1"}
+            return await asyncio.gather(*(client.post("/analyze/log", json=payload) for _ in range(6)))
+
+    responses = asyncio.run(run())
+    assert all(r.status_code == 200 for r in responses)
+    # 이벤트 루프가 막히지 않았다면 여러 요청이 겹쳐서 실행되고, limiter 한도(4)를 넘지 않는다.
+    assert 1 < main_module.app_graph.peak <= 4
+
+
+def test_analyze_status_reports_limiter(main_module):
+    res = TestClient(main_module.app).get("/analyze/status")
+    assert res.status_code == 200
+    assert res.json()["max_in_flight"] == 4
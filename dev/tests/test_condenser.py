@@ -0,0 +1,87 @@
+import json
+
+from dev.app.condenser import condense_log, estimate_tokens
+
+TRACE = """Traceback (most recent call last):
+  File "/app/worker.py", line 41, in handle
+    conn = pool.get()
+  File "/app/pool.py", line 12, in get
+    raise TimeoutError("pool exhausted")
+TimeoutError: pool exhausted"""
+
+
+def retry_lines(start, count):
+    return [f"2024-05-01T10:00:{i % 60:02d}Z WARN retry to [IP_ADDR_0] attempt={i}" for i in range(start, start + count)]
+
+
+def test_small_log_is_untouched():
+    text = "INFO start\n" + TRACE
+    result = condense_log(text, "log")
+    assert result.text == text
+    assert result.original_chars == result.condensed_chars
+
+
+def test_consecutive_repeats_keep_first_last_and_trace():
+    text = "\n".join(retry_lines(0, 3000) + TRACE.splitlines() + retry_lines(3000, 2))
+    result = condense_log(text, "log")
+    lines = result.text.splitlines()
+    assert lines[0].endswith("attempt=0")
+    assert any(line.endswith("attempt=2999") for line in lines)
+    assert "2998번 더 반복" in result.text
+    assert TRACE in result.text
+    assert result.condensed_tokens < result.original_tokens / 20
+
+
+def test_repeated_frames_are_folded():
+    frame = '  File "/app/a.py", line 5, in run\n    return run()'
+    text = "Traceback (most recent call last):\n" + "\n".join([frame] * 50) + "\nRecursionError: maximum recursion depth exceeded"
+    result = condense_log(text, "log")
+    assert "2줄 블록이 48번 더 반복" in result.text
+    assert result.text.endswith("RecursionError: maximum recursion depth exceeded")
+
+
+def test_budget_trims_middle_but_keeps_exception_headers():
+    noise = [f"DEBUG step {i} payload {'x' * (i % 13)} {chr(65 + i % 26) * (i % 7)} id-{i * 7919}" for i in range(4000)]
+    noise = [f"{line} {w}" for line, w in zip(noise, ("alpha", "beta", "gamma", "delta") * 1000)]
+    text = "\n".join(noise[:2000] + TRACE.splitlines() + noise[2000:])
+    result = condense_log(text, "log", budget=800)
+    assert result.condensed_tokens <= 800 * 1.1
+    assert "TimeoutError: pool exhausted" in result.text
+    assert "줄 생략" in result.text
+    assert result.text.splitlines()[0].startswith("DEBUG step 0")
+    assert estimate_tokens(result.text) == result.condensed_tokens
+
+
+def test_budget_is_configurable_per_input_mode(monkeypatch):
+    monkeypatch.setenv("CONDENSE_BUDGET_LOG_CODE", "100")
+    text = "\n".join(f"line {i} {'abcdefgh' * (i % 5)} {i * 31}" for i in range(500))
+    assert condense_log(text, "log_code").budget == 100
+    assert condense_log(text, "log_code").condensed_tokens < condense_log(text, "log").condensed_tokens
+
+
+def test_analyze_response_reports_sizes(monkeypatch):
+    from fastapi.testclient import TestClient
+    from langchain_core.messages import AIMessage
+    from dev.app.cache import AnalysisCache
+
+    monkeypatch.setenv("ANTHROPIC_MODEL_ID", "fake-model")
+    monkeypatch.setenv("ANTHROPIC_API_KEY", "fake-key")
+    from dev.app import main
+
+    seen = {}
+
+    class EchoGraph:
+        async def ainvoke(self, state):
+            seen["log"] = state["log_text"]
+            payload = {"cause": "풀 고갈", "solution": "풀 크기 조정", "prevention": "모니터링 추가"}
+            return {"messages": [AIMessage(content=json.dumps(payload, ensure_ascii=False))]}
+
+    monkeypatch.setattr(main, "app_graph", EchoGraph())
+    monkeypatch.setattr(main, "analysis_cache", AnalysisCache(max_entries=0))
+
+    log = "\n".join(retry_lines(0, 2000)) + "\n" + TRACE
+    res = TestClient(main.app).post("/analyze/log", json={"persona": "senior", "input_mode": "log", "error_log": log})
+    assert res.status_code == 200
+    meta = res.json()["metadata"]
+    assert meta["original_lines"] == 2006
+    assert meta["condensed_chars"] == len(seen["log"]) < meta["original_chars"]
@@ -0,0 +1,97 @@
+import asyncio
+import threading
+
+from langchain_core.embeddings import Embeddings
+
+from dev.app.llm.embedding_cache import CachedEmbeddings, EmbeddingCache
+
+
+class CountingEmbeddings(Embeddings):
+    def __init__(self):
+        self.calls = []
+
+    def _vec(self, text):
+        return [float(len(text)), float(sum(map(ord, text)) % 97), 0.5]
+
+    def embed_documents(self, texts):
+        self.calls.append(("documents", list(texts)))
+        return [self._vec(t) for t in texts]
+
+    def embed_query(self, text):
+        self.calls.append(("query", text))
+        return self._vec(text)
+
+
+def test_repeated_queries_skip_inner_embedder():
+    inner = CountingEmbeddings()
+    emb = CachedEmbeddings(inner, "model-a", EmbeddingCache(max_entries=8))
+    first = emb.embed_query("KeyError: 'user_id'")
+    assert emb.embed_query("KeyError: 'user_id'") == first
+    assert len(inner.calls) == 1
+    stats = emb.cache.stats()
+    assert stats["hits"] == 1 and stats["misses"] == 1 and stats["hit_ratio"] == 0.5
+
+
+def test_documents_only_embed_missing_texts_once():
+    inner = CountingEmbeddings()
+    emb = CachedEmbeddings(inner, "model-a", EmbeddingCache(max_entries=8))
+    emb.embed_documents(["a chunk", "b chunk"])
+    out = emb.embed_documents(["b chunk", "c chunk", "c chunk", "a chunk"])
+    assert inner.calls[-1] == ("documents", ["c chunk"])
+    assert out[1] == out[2] and len(out) == 4
+
+
+def test_model_id_and_kind_are_part_of_key():
+    inner = CountingEmbeddings()
+    cache = EmbeddingCache(max_entries=8)
+    CachedEmbeddings(inner, "model-a", cache).embed_query("same")
+    CachedEmbeddings(inner, "model-b", cache).embed_query("same")
+    CachedEmbeddings(inner, "model-a", cache).embed_documents(["same"])
+    assert len(inner.calls) == 3
+
+
+def test_sqlite_store_survives_restart(tmp_path):
+    path = str(tmp_path / "emb.sqlite")
+    CachedEmbeddings(CountingEmbeddings(), "m", EmbeddingCache(max_entries=4, path=path)).embed_query("hello")
+    inner = CountingEmbeddings()
+    reopened = CachedEmbeddings(inner, "m", EmbeddingCache(max_entries=4, path=path))
+    assert reopened.embed_query("hello") == [5.0, float(sum(map(ord, "hello")) % 97), 0.5]
+    assert inner.calls == []
+
+
+def test_thread_and_async_access():
+    inner = CountingEmbeddings()
+    emb = CachedEmbeddings(inner, "m", EmbeddingCache(max_entries=16))
+
+    def worker():
+        for i in range(200):
+            emb.embed_query(f"q{i % 10}")
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert emb.cache.stats()["entries"] == 10
+
+    async def run():
+        return await asyncio.gather(*(emb.aembed_query(f"q{i % 10}") for i in range(50)))
+
+    assert len(asyncio.run(run())) == 50
+
+
+def test_cached_vectors_are_float32_and_not_shared_with_callers():
+    from array import array
+
+    emb = CachedEmbeddings(CountingEmbeddings(), "model-a", EmbeddingCache(max_entries=8))
+    first = emb.embed_query("ECONNRESET")
+    first.append(99.0)  # 호출자가 돌려받은 list 를 바꿔도
+    first[0] = -1.0
+    again = emb.embed_query("ECONNRESET")
+    assert again == [10.0, float(sum(map(ord, "ECONNRESET")) % 97), 0.5]
+
+    docs = emb.embed_documents(["x", "x"])
+    assert docs[0] == docs[1] and docs[0] is not docs[1]
+    stored = list(emb.cache._entries.values())
+    assert all(isinstance(v, array) and v.typecode == "f" for v in stored)
+    assert emb.cache.stats()["vector_bytes"] == 4 * 3 * len(stored)
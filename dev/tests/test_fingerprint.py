@@ -0,0 +1,87 @@
+from dev.app.fingerprint import canonical_error, fingerprint, normalize
+
+PY_LOG_A = """2024-05-01 10:22:31,114 ERROR [pid 4121] request_id=9f2c1a7b-aa
+Traceback (most recent call last):
+  File "/srv/app/main.py", line 88, in handler
+    user = load_user(uid)
+  File "/srv/app/users.py", line 12, in load_user
+    return CACHE[uid]
+KeyError: 'user_id'
+"""
+
+PY_LOG_B = """2024-06-13 08:01:09,991 ERROR [pid 77] request_id=0b71dd20-zz
+Traceback (most recent call last):
+  File "/srv/app/main.py", line 91, in handler
+    user = load_user(uid)
+  File "/srv/app/users.py", line 14, in load_user
+    return CACHE[uid]
+KeyError: 'user_id'
+"""
+
+JS_LOG = """Uncaught ReferenceError: count is not defined
+    at increment (main.js:10:14)
+    at HTMLButtonElement.onclick (index.html:25:32)"""
+
+JAVA_LOG = """Exception in thread "main" java.lang.IllegalStateException: boot failed
+\tat com.acme.App.start(App.java:42)
+\tat com.acme.App.main(App.java:12)
+Caused by: java.sql.SQLException: Connection refused to [IP_ADDR_3]
+\tat com.acme.Db.connect(Db.java:77)"""
+
+
+def test_python_logs_differing_only_in_noise_share_signature():
+    a, b = fingerprint(PY_LOG_A), fingerprint(PY_LOG_B)
+    assert a.signature == b.signature
+    assert a.language == "python"
+    assert a.exception == "KeyError"
+    # 가장 안쪽 프레임이 먼저 온다.
+    assert a.frames == ["users.py:load_user", "main.py:handler"]
+    assert a.canonical.startswith("KeyError: 'user_id'")
+
+
+def test_different_exception_changes_signature():
+    other = PY_LOG_A.replace("KeyError: 'user_id'", "KeyError: 'order_id'")
+    assert fingerprint(other).signature != fingerprint(PY_LOG_A).signature
+
+
+def test_javascript_frames_and_line_numbers():
+    fp = fingerprint(JS_LOG)
+    moved = fingerprint(JS_LOG.replace("10:14", "57:3"))
+    assert fp.language == "javascript"
+    assert fp.exception == "ReferenceError"
+    assert fp.frames[0] == "main.js:increment"
+    assert fp.signature == moved.signature
+
+
+def test_java_keeps_root_cause_and_ignores_placeholder_numbers():
+    fp = fingerprint(JAVA_LOG)
+    assert fp.language == "java"
+    assert fp.exception == "java.sql.SQLException"
+    assert "com.acme.App.start" in fp.frames
+    assert fp.signature == fingerprint(JAVA_LOG.replace("[IP_ADDR_3]", "[IP_ADDR_0]")).signature
+
+
+def test_normalize_masks_addresses_and_temp_paths():
+    out = normalize("segfault at 0x7ffd5e8c in /tmp/pytest-of-ci/abc123/run.sock")
+    assert "0x7ffd5e8c" not in out and "<ADDR>" in out
+    assert "<TMP>" in out
+
+
+def test_canonical_error_falls_back_to_error_lines():
+    text = "starting server\nconnecting db\nFATAL: password authentication failed for user app"
+    assert canonical_error(text) == "FATAL: password authentication failed for user app"
+
+
+def test_full_signature_covers_every_error_line_and_header():
+    steps = "".join(f"2024-05-01 10:00:0{i} ERROR step {i} failed\n" for i in range(5))
+    disk = fingerprint(steps + "ERROR disk full on /data")
+    perm = fingerprint(steps + "ERROR permission denied on /etc/shadow")
+    # 검색용 signature 는 앞 5줄만 보므로 같지만, 캐시용 full_signature 는 다르다
+    assert disk.signature == perm.signature and disk.full_signature != perm.full_signature
+
+    middle = JAVA_LOG.replace("Caused by: java.sql", "Caused by: java.io.IOException: pipe\nCaused by: java.sql")
+    assert fingerprint(middle).signature == fingerprint(JAVA_LOG).signature
+    assert fingerprint(middle).full_signature != fingerprint(JAVA_LOG).full_signature
+
+    # 잡음만 다른 로그는 여전히 같다
+    assert fingerprint(PY_LOG_A).full_signature == fingerprint(PY_LOG_B).full_signature
@@ -0,0 +1,170 @@
+import gzip
+import sys
+import threading
+
+import pytest
+
+from dev.app.llm.ingest import apply_plan, iter_plans, legacy_chunk_id, load_docs, merge_summaries, plan_ingest
+
+
+def split(text):
+    return [p for p in text.split("\n\n") if p.strip()]
+
+
+class FakeIndex:
+    def __init__(self):
+        self.vectors, self.updates, self.deleted = {}, [], []
+
+    def upsert(self, vectors, namespace):
+        for id_, vec, md in vectors:
+            self.vectors[id_] = (vec, md)
+
+    def update(self, id, set_metadata, namespace):
+        self.updates.append((id, set_metadata))
+
+    def delete(self, ids, namespace):
+        self.deleted.extend(ids)
+        for id_ in ids:
+            self.vectors.pop(id_, None)
+
+
+class FakeEmbedder:
+    def __init__(self):
+        self.embedded = []
+
+    def embed_documents(self, texts):
+        self.embedded.extend(texts)
+        return [[float(len(t))] for t in texts]
+
+
+def ingest(docs, manifest, index, **kw):
+    plan = plan_ingest(docs, manifest, split, "model-a", **kw)
+    embedder = FakeEmbedder()
+    apply_plan(plan, embedder, index, "dev", log=lambda *_: None)
+    return plan, embedder
+
+
+def test_only_diff_is_embedded_and_stale_ids_deleted():
+    index = FakeIndex()
+    docs = [("a.md", "A1\n\nA2\n\nA3"), ("b.md", "B1\n\nB2")]
+    plan, emb = ingest(docs, None, index)
+    assert len(emb.embedded) == 5
+    # 첫 실행은 이전 방식 ID를 정리한다
+    assert legacy_chunk_id("a.md", 0, "A1") in plan.to_delete
+
+    plan2, emb2 = ingest(docs, plan.manifest, index)
+    assert plan2.empty and emb2.embedded == [] and plan2.unchanged_files == ["a.md", "b.md"]
+
+    # 앞에 문단이 끼고 A3가 바뀜, b.md 삭제
+    edited = [("a.md", "A0\n\nA1\n\nA2\n\nA3 edited")]
+    plan3, emb3 = ingest(edited, plan2.manifest, index)
+    assert emb3.embedded == ["A0", "A3 edited"]
+    assert sorted(u[1]["chunk_index"] for u in index.updates) == [1, 2]
+    assert plan3.removed_files == ["b.md"]
+    assert len(plan3.to_delete) == 3  # 옛 A3 + B1 + B2
+    assert sorted(md["text"] for _, md in index.vectors.values()) == ["A0", "A1", "A2", "A3 edited"]
+
+
+def test_settings_change_forces_full_reingest():
+    index = FakeIndex()
+    docs = [("a.md", "A1\n\nA2")]
+    plan, _ = ingest(docs, None, index)
+    other_model = plan_ingest(docs, plan.manifest, split, "model-b")
+    assert len(other_model.to_embed) == 2 and other_model.changed_files == ["a.md"]
+    assert plan_ingest(docs, plan.manifest, split, "model-a", full=True).to_embed
+
+
+def test_duplicate_chunks_in_one_file_get_distinct_ids():
+    plan = plan_ingest([("a.md", "same\n\nsame")], None, split)
+    assert len({c.id for c in plan.to_embed}) == 2
+
+
+class ThrottlingEmbedder(FakeEmbedder):
+    """처음 몇 번은 Bedrock 처럼 ThrottlingException 을 던진다."""
+
+    def __init__(self, failures):
+        super().__init__()
+        self.failures = failures
+        self.lock = threading.Lock()
+
+    def embed_documents(self, texts):
+        with self.lock:
+            throttled = self.failures > 0
+            self.failures -= throttled
+        if throttled:
+            raise RuntimeError("ThrottlingException: Rate exceeded")
+        with self.lock:
+            return super().embed_documents(texts)
+
+
+def test_pipeline_retries_throttling_and_upserts_every_chunk_once():
+    docs = [(f"{n}.md", "\n\n".join(f"{n}-{i}" for i in range(7))) for n in range(5)]
+    plan = plan_ingest(docs, None, split)
+    index, upserted = FakeIndex(), []
+    original = index.upsert
+    index.upsert = lambda vectors, namespace: (upserted.extend(v[0] for v in vectors), original(vectors, namespace))
+
+    embedder = ThrottlingEmbedder(failures=3)
+    report = apply_plan(plan, embedder, index, "dev", log=lambda *_: None,
+                        workers=3, embed_batch=4, upsert_batch=10, backoff_base=0)
+    assert report["retries"] == 3 and report["chunks"] == 35
+    assert sorted(upserted) == sorted(c.id for c in plan.to_embed)
+    assert len(embedder.embedded) == 35
+
+
+def test_non_retryable_error_is_raised():
+    class Broken(FakeEmbedder):
+        def embed_documents(self, texts):
+            raise ValueError("ValidationException: input too long")
+
+    plan = plan_ingest([("a.md", "A1\n\nA2")], None, split)
+    with pytest.raises(ValueError):
+        apply_plan(plan, Broken(), FakeIndex(), "dev", log=lambda *_: None, backoff_base=0)
+
+
+def test_load_docs_streams_nested_and_gzipped_files(tmp_path):
+    (tmp_path / "runbooks" / "db").mkdir(parents=True)
+    (tmp_path / "a.md").write_text("A", encoding="utf-8")
+    (tmp_path / "runbooks" / "db" / "ora.rst").write_text("ORA", encoding="utf-8")
+    with gzip.open(tmp_path / "runbooks" / "pm.log.gz", "wt", encoding="utf-8") as f:
+        f.write("postmortem")
+    (tmp_path / "image.png").write_bytes(b"\x89PNG")
+
+    docs = load_docs(str(tmp_path))
+    assert not isinstance(docs, list)
+    loaded = {p.replace(str(tmp_path), "").lstrip("/\\").replace("\\", "/"): t for p, t in docs}
+    assert loaded == {"a.md": "A", "runbooks/db/ora.rst": "ORA", "runbooks/pm.log.gz": "postmortem"}
+
+
+def test_windowed_plans_match_single_plan_and_bound_chunks():
+    docs = [(f"{n}.md", "\n\n".join(f"{n}-{i}" for i in range(4))) for n in range(6)]
+    first = plan_ingest(docs, None, split)
+    consumed = []
+
+    def stream():
+        for doc in docs:
+            consumed.append(doc[0])
+            yield doc
+
+    summary, sizes = None, []
+    for plan in iter_plans(stream(), None, split, max_chunks=5):
+        # 부분 계획을 내보낼 때 아직 읽지 않은 문서가 남아 있어야 한다
+        sizes.append((len(plan.to_embed), len(consumed)))
+        summary = merge_summaries(summary, plan.summary())
+    assert summary == first.summary()
+    assert all(n <= 8 for n, _ in sizes) and sizes[0][1] < len(docs)
+    assert plan.manifest == first.manifest
+
+
+def test_rag_store_dry_run_touches_nothing(tmp_path, monkeypatch, capsys):
+    from dev.app.llm import rag_store
+
+    docs = tmp_path / "kb"
+    docs.mkdir()
+    (docs / "net.md").write_text("# 네트워크\n\nECONNRESET 은 상대가 연결을 끊은 것이다.", encoding="utf-8")
+    manifest = tmp_path / "manifest.json"
+    monkeypatch.setattr(sys, "argv", ["rag_store", "--docs", str(docs), "--manifest", str(manifest), "--dry-run"])
+    rag_store.main()
+    out = capsys.readouterr().out
+    assert '"embed": 1' in out and "+ " in out
+    assert not manifest.exists()
@@ -11,9 +11,9 @@ def _count_sentences_ko(text: str) -> int:
 class FakeLLM:
     def __init__(self, *args, **kwargs):
         pass
-    def bind_tools(self, tools):
+    def bind_tools(self, tools, **kwargs):
         return self
-    def invoke(self, messages):
+    def invoke(self, messages, *args, **kwargs):
         from langchain_core.messages import AIMessage
         payload = {
             "cause": "테스트용 원인입니다. (Fake LLM)",
@@ -21,6 +21,9 @@ class FakeLLM:
             "prevention": "재발 방지를 위해 입력 검증을 추가하세요.\n환경 변수를 점검하세요."
         }
         return AIMessage(content=json.dumps(payload, ensure_ascii=False))
+    async def ainvoke(self, messages, *args, **kwargs):
+        # 그래프의 async 노드(ainvoke/astream 경로)도 같은 응답을 받는다
+        return self.invoke(messages)
 
 @pytest.fixture
 def ag_module(monkeypatch):
@@ -32,7 +35,10 @@ def ag_module(monkeypatch):
     # 경로에 맞춰 import (현재 구조 반영)
     from dev.app.llm import agent_with_graph as ag
     ag = importlib.reload(ag)
-    return ag
+    yield ag
+    # FakeLLM 으로 만들어진 llm/graph 가 모듈 전역에 남으면 이후 테스트(test_main 등)까지 가짜를 쓴다
+    for name in ag._LAZY:
+        vars(ag).pop(name, None)
 
 def test_graph_builds_and_app_exists(ag_module):
     ag = ag_module
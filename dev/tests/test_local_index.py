@@ -0,0 +1,257 @@
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from dev.app.llm import local_index as li
+from dev.app.llm.local_index import LocalIndex
+
+
+def random_items(n, dim=64, seed=0):
+    rng = np.random.default_rng(seed)
+    vecs = rng.normal(size=(n, dim)).astype(np.float32)
+    return [(f"id-{i}", vecs[i].tolist(), {"text": f"chunk {i}", "doc_type": "kb_md" if i % 2 else "user"}) for i in range(n)]
+
+
+@pytest.mark.parametrize("dtype", ["float16", "int8"])
+def test_compact_index_matches_exact_search(tmp_path, dtype):
+    items = random_items(500)
+    exact = LocalIndex.build(items, "float32")
+    LocalIndex.build(items, dtype).save(str(tmp_path))
+    loaded = LocalIndex.load(str(tmp_path))
+    assert isinstance(loaded.vectors, np.memmap)
+
+    query = items[42][1]
+    res = loaded.query(vector=query, top_k=5, include_metadata=True)
+    assert res["matches"][0]["id"] == "id-42"
+    assert res["matches"][0]["metadata"]["text"] == "chunk 42"
+    assert abs(res["matches"][0]["score"] - 1.0) < 0.01
+    assert [m["id"] for m in res["matches"][:3]] == [m["id"] for m in exact.query(query, top_k=3)["matches"]]
+
+
+def test_filter_and_upsert_on_mmap_snapshot(tmp_path):
+    items = random_items(50)
+    LocalIndex.build(items).save(str(tmp_path))
+    index = LocalIndex.load(str(tmp_path))
+
+    res = index.query(vector=items[3][1], top_k=3, filter={"doc_type": "kb_md"})
+    assert all(m["metadata"]["doc_type"] == "kb_md" for m in res["matches"])
+
+    new_vec = [1.0] + [0.0] * 63
+    index.upsert([("id-3", new_vec, {"text": "updated"}), ("new", [0.0, 1.0] + [0.0] * 62, {"text": "new"})])
+    assert len(index) == 51
+    assert index.query(vector=new_vec, top_k=1)["matches"][0] == {"id": "id-3", "score": pytest.approx(1.0, abs=1e-3),
+                                                                  "metadata": {"text": "updated"}}
+
+
+def test_query_latency_is_sub_millisecond():
+    index = LocalIndex.build(random_items(2000, dim=1024))
+    query = random_items(1, dim=1024, seed=9)[0][1]
+    index.query(query, top_k=5)  # 작업 사본 생성
+    start = time.perf_counter()
+    for _ in range(100):
+        index.query(query, top_k=5)
+    assert (time.perf_counter() - start) / 100 < 0.005
+
+
+@pytest.mark.parametrize("dtype", ["float16", "int8"])
+def test_blockwise_scoring_without_work_cache(monkeypatch, dtype):
+    monkeypatch.setattr(li, "BLOCK_ROWS", 64)
+    monkeypatch.setattr(li, "WORK_CACHE_MB", 0)
+    items = random_items(300)
+    index = LocalIndex.build(items, dtype)
+    assert index.warm() == 0  # 캐시 한도 0: float32 사본을 만들지 않는다
+    res = index.query(items[250][1], top_k=3)
+    assert res["matches"][0]["id"] == "id-250" and abs(res["matches"][0]["score"] - 1.0) < 0.01
+    assert [m["id"] for m in res["matches"]] == [m["id"] for m in LocalIndex.build(items, "float32").query(items[250][1], top_k=3)["matches"]]
+
+
+def test_query_sees_consistent_snapshot_during_upserts():
+    items = random_items(200)
+    index = LocalIndex.build(items)
+    stop = threading.Event()
+
+    def writer():
+        n = 0
+        while not stop.is_set():
+            index.upsert([(f"extra-{n}", items[n % 200][1], {"text": f"extra {n}"})])
+            index.delete([f"extra-{n - 5}"])
+            n += 1
+
+    thread = threading.Thread(target=writer)
+    thread.start()
+    try:
+        for i in range(300):
+            for m in index.query(items[i % 200][1], top_k=8)["matches"]:
+                # id 와 metadata 가 서로 다른 버전에서 오면 짝이 어긋난다
+                expected = m["id"].replace("id-", "chunk ").replace("extra-", "extra ")
+                assert m["metadata"]["text"] == expected
+    finally:
+        stop.set()
+        thread.join()
+
+
+@pytest.mark.parametrize("dtype", ["float16", "int8"])
+def test_appending_upserts_reuse_spare_rows_without_touching_old_snapshots(dtype):
+    items = random_items(300)
+    index = LocalIndex.build(items[:100], dtype)
+    before = index.snapshot()
+    buffers = set()
+    for id_, vec, md in items[100:]:
+        index.upsert([(id_, vec, md)])
+        buffers.add(id(index._vector_buf))
+    assert len(buffers) <= 2 and len(index) == 300  # 한 건씩 200번 추가해도 행렬 복사는 한두 번
+    assert len(before.ids) == 100 and before.vectors.shape[0] == 100
+
+    # 기존 id 를 바꾸면 복사본을 고치므로 이전 스냅샷의 벡터는 그대로다
+    snap = index.snapshot()
+    row = np.array(snap.vectors[5])
+    index.upsert([("id-5", items[7][1], {"text": "moved"})])
+    assert np.array_equal(snap.vectors[5], row) and snap.metadata[5]["text"] == "chunk 5"
+    assert index.query(items[7][1], top_k=2)["matches"][0]["id"] in {"id-5", "id-7"}
+    assert index.query(items[250][1], top_k=1)["matches"][0]["id"] == "id-250"
+
+
+def test_save_replaces_snapshot_atomically(tmp_path, monkeypatch):
+    path = str(tmp_path / "index")
+    LocalIndex.build(random_items(50)).save(path)
+    mapped = LocalIndex.load(path)  # vectors.npy 를 mmap 으로 연 채로 같은 경로에 다시 저장한다
+    mapped.upsert([("new", [1.0] + [0.0] * 63, {"text": "new"})])
+    mapped.save(path)
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["index"]
+    assert len(LocalIndex.load(path)) == 51
+    assert mapped.query(random_items(50)[9][1], top_k=1)["matches"][0]["id"] == "id-9"
+
+    # 쓰는 중에 실패하면 기존 스냅샷이 그대로 남는다
+    def broken(*args, **kwargs):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(li.json, "dump", broken)
+    with pytest.raises(OSError):
+        LocalIndex.build(random_items(3)).save(path)
+    monkeypatch.undo()
+    assert len(LocalIndex.load(path)) == 51 and sorted(p.name for p in tmp_path.iterdir()) == ["index"]
+
+
+def test_rag_search_runs_offline_on_local_backend(tmp_path, monkeypatch):
+    from langchain_core.embeddings import Embeddings
+    from dev.app.llm import tools
+    from dev.app.llm.embedding_cache import CachedEmbeddings, EmbeddingCache
+
+    class HashEmbeddings(Embeddings):
+        def embed_query(self, text):
+            return [float(("Timeout" in text)), float(("KeyError" in text)), 0.1]
+
+        def embed_documents(self, texts):
+            return [self.embed_query(t) for t in texts]
+
+    LocalIndex.build([
+        ("a", [1.0, 0.0, 0.1], {"source": "timeout.md", "chunk_index": 0, "text": "타임아웃 해결법"}),
+        ("b", [0.0, 1.0, 0.1], {"source": "keyerror.md", "chunk_index": 2, "text": "KeyError 해결법"}),
+    ]).save(str(tmp_path))
+    monkeypatch.setenv("RAG_BACKEND", "local")
+    monkeypatch.setenv("LOCAL_INDEX_PATH", str(tmp_path))
+    monkeypatch.setattr(tools, "_local_index", None)
+    monkeypatch.setattr(tools, "_lexical_index", None)
+    monkeypatch.setattr(tools, "_embedder", CachedEmbeddings(HashEmbeddings(), "hash", EmbeddingCache(8)))
+
+    out = tools.rag_search("KeyError: 'user_id'", top_k=1)
+    assert out.startswith("- (") and "keyerror.md#2" in out and "KeyError 해결법" in out
+
+
+def test_lexical_exact_code_match_skips_embedding(tmp_path, monkeypatch):
+    from dev.app.llm import tools
+    from dev.app.llm.lexical_index import BM25Index, code_tokens, rrf_fuse
+
+    docs = [
+        ("ora", [1.0, 0.0, 0.0], {"source": "oracle.md", "chunk_index": 0,
+                                  "text": "ORA-12541: TNS:no listener 는 리스너가 내려간 경우 발생한다."}),
+        ("reset", [0.0, 1.0, 0.0], {"source": "chrome.md", "chunk_index": 1,
+                                    "text": "net::ERR_CONNECTION_RESET 은 프록시가 연결을 끊을 때 보인다."}),
+        ("npe", [0.0, 0.0, 1.0], {"source": "java.md", "chunk_index": 3,
+                                  "text": "java.lang.NullPointerException 은 null 참조 호출이다."}),
+    ]
+    LocalIndex.build(docs).save(str(tmp_path))
+    monkeypatch.setenv("RAG_BACKEND", "local")
+    monkeypatch.setenv("LOCAL_INDEX_PATH", str(tmp_path))
+    monkeypatch.setattr(tools, "_local_index", None)
+    monkeypatch.setattr(tools, "_lexical_index", None)
+
+    def no_embedder():
+        raise AssertionError("embedding should be skipped")
+
+    monkeypatch.setattr(tools, "get_embedder", no_embedder)
+    out = tools.rag_search("Error: ORA-12541: TNS:no listener", top_k=3)
+    assert out.splitlines()[0].endswith("oracle.md#0")
+    assert "chrome.md" not in out
+
+    assert code_tokens("Caused by: java.lang.NullPointerException at ERR_CONNECTION_RESET") == {
+        "java.lang.nullpointerexception", "err_connection_reset"}
+    bm25 = BM25Index.from_local_index(tools.get_local_index())
+    assert bm25.search("ERR_CONNECTION_RESET", 1)[0].id == "reset"
+    fused = rrf_fuse([[("a", {}), ("b", {})], [("b", {}), ("c", {})]], top_k=3)
+    assert [f[0] for f in fused] == ["b", "a", "c"]
+
+
+def test_mirrored_contributions_reach_lexical_index_and_labels_are_not_cosine(tmp_path, monkeypatch):
+    from dev.app.llm import tools
+
+    class FixedEmbeddings:
+        def embed_query(self, text):
+            return [0.0, 1.0, 0.0]
+
+    LocalIndex.build([
+        ("ora", [1.0, 0.0, 0.0], {"source": "oracle.md", "chunk_index": 0, "text": "ORA-12541 리스너 없음"}),
+        ("npe", [0.0, 1.0, 0.0], {"source": "java.md", "chunk_index": 3, "text": "NullPointerException 은 null 참조"}),
+    ]).save(str(tmp_path))
+    monkeypatch.setenv("RAG_BACKEND", "local")
+    monkeypatch.setenv("LOCAL_INDEX_PATH", str(tmp_path))
+    monkeypatch.setattr(tools, "_local_index", None)
+    monkeypatch.setattr(tools, "_lexical_index", None)
+    monkeypatch.setattr(tools, "get_embedder", FixedEmbeddings)
+    assert tools.rag_search("ORA-12541", top_k=1).startswith("- (#1 exact code match) oracle.md#0")
+
+    # 저장 큐가 올린 기여는 BM25 색인에도 바로 보인다
+    lexical = tools.get_lexical_index()
+    tools.mirror_upsert([("c1", [0.0, 0.0, 1.0], {"source": "contribution", "chunk_index": 0,
+                                                  "text": "ERR_CERT_DATE_INVALID 는 인증서 만료"})])
+    assert tools.get_lexical_index() is lexical and "c1" in lexical
+    assert "contribution#0" in tools.rag_search("net::ERR_CERT_DATE_INVALID", top_k=1)
+
+    # RRF 로 합친 결과는 코사인처럼 보이는 점수 대신 순위로 적는다
+    out = tools.rag_search("null 참조 오류", top_k=2)
+    assert out.startswith("- (#1 hybrid) ") and "- (#2 hybrid) " in out
+
+    # 기존 문서가 바뀌면 색인을 버리고 다음 검색 때 다시 만든다
+    tools.mirror_upsert([("npe", [0.0, 1.0, 0.0], {"source": "java.md", "chunk_index": 3, "text": "수정된 설명"})])
+    assert tools._lexical_index is None
+    assert tools.get_lexical_index().search("수정된 설명", 1)[0].id == "npe"
+
+
+def test_masked_vendor_code_log_still_hits_exact_match(tmp_path, monkeypatch):
+    from dev.app.llm import tools
+    from dev.app.llm.lexical_index import code_tokens
+    from dev.app.llm.tools import canonical_error
+    from dev.app.masking import MaskingManager
+
+    LocalIndex.build([
+        ("ora", [1.0, 0.0], {"source": "oracle.md", "chunk_index": 0, "text": "ORA-12541: TNS:no listener 대응"}),
+        ("other", [0.0, 1.0], {"source": "misc.md", "chunk_index": 0, "text": "IP_ADDR_0 DOC_REF_0 설명"}),
+    ]).save(str(tmp_path))
+    monkeypatch.setenv("RAG_BACKEND", "local")
+    monkeypatch.setenv("LOCAL_INDEX_PATH", str(tmp_path))
+    monkeypatch.setattr(tools, "_local_index", None)
+    monkeypatch.setattr(tools, "_lexical_index", None)
+
+    def no_embedder():
+        raise AssertionError("embedding should be skipped")
+
+    monkeypatch.setattr(tools, "get_embedder", no_embedder)
+
+    masked = MaskingManager().mask("ORA-12541: TNS:no listener (host 10.0.0.5, ticket ABC-123)")
+    assert "ORA-12541" in masked and "[IP_ADDR_0]" in masked and "[DOC_REF_0]" in masked
+    # 플레이스홀더는 에러 코드로 세지 않는다
+    assert code_tokens(masked) == {"ora-12541"}
+    assert code_tokens(canonical_error(masked)) == {"ora-12541"}  # [IP_ADDR] 처럼 번호가 지워진 형태도
+    assert tools.rag_search(masked, top_k=2).splitlines()[0].endswith("oracle.md#0")
@@ -0,0 +1,109 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+from langchain_core.messages import AIMessage
+
+from dev.app import metrics
+from dev.app.cache import AnalysisCache
+from dev.app.metrics import Counter, Histogram, Registry
+
+
+def test_exposition_format():
+    registry = Registry()
+    hist = registry.register(Histogram("t_seconds", "help", ["stage"], buckets=(0.1, 1.0)))
+    count = registry.register(Counter("t_total", "help", ["kind"]))
+    hist.observe(0.05, stage="draft")
+    hist.observe(0.5, stage="draft")
+    hist.observe(5, stage="draft")
+    count.inc(3, kind='a"b')
+    registry.register_collector("t_queue", lambda: {"depth": 2, "last_error": "x", "persistent": True})
+
+    text = registry.render()
+    assert '# TYPE t_seconds histogram' in text
+    assert 't_seconds_bucket{stage="draft",le="0.1"} 1' in text
+    assert 't_seconds_bucket{stage="draft",le="1"} 2' in text
+    assert 't_seconds_bucket{stage="draft",le="+Inf"} 3' in text
+    assert 't_seconds_count{stage="draft"} 3' in text
+    assert 't_total{kind="a\\"b"} 3' in text
+    assert "t_queue_depth 2" in text
+    assert "t_queue_last_error" not in text and "t_queue_persistent" not in text
+
+
+def test_timed_records_sync_async_and_errors():
+    @metrics.timed("test_sync")
+    def ok():
+        return 1
+
+    @metrics.timed("test_async")
+    async def boom():
+        raise ValueError("x")
+
+    before = metrics.stage_errors.value(stage="test_async")
+    assert ok() == 1
+    with pytest.raises(ValueError):
+        asyncio.run(boom())
+    assert metrics.stage_seconds.count(stage="test_sync") >= 1
+    assert metrics.stage_seconds.count(stage="test_async") >= 1
+    assert metrics.stage_errors.value(stage="test_async") == before + 1
+
+
+def test_log_sampled(capsys):
+    assert metrics.log_sampled("e", rate=0, response="x") is False
+    assert metrics.log_sampled("e", rate=1, response="y" * (metrics.LOG_MAX_CHARS + 5)) is True
+    line = capsys.readouterr().out.strip()
+    assert line.startswith('{"event": "e"') and line.endswith('...(+5)"}')
+
+
+class FakeLLM:
+    def __init__(self):
+        self.replies = ['원인이 불확실 합니다', '{"cause": "c", "solution": "s", "prevention": "p"}']
+
+    def bind_tools(self, tools):
+        return self
+
+    async def ainvoke(self, messages):
+        usage = {"input_tokens": 100, "output_tokens": 20, "total_tokens": 120,
+                 "input_token_details": {"cache_read": 80}}
+        return AIMessage(content=self.replies.pop(0), usage_metadata=usage)
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setenv("ANTHROPIC_MODEL_ID", "fake-model")
+    monkeypatch.setenv("ANTHROPIC_API_KEY", "fake-key")
+    monkeypatch.setenv("FAST_PATH", "0")
+    from dev.app import main
+    from dev.app.llm import agent_with_graph as ag
+
+    llm = FakeLLM()
+    monkeypatch.setattr(ag, "llm", llm)
+    monkeypatch.setattr(ag, "llm_with_tools", llm)
+    monkeypatch.setattr(ag, "SPECULATIVE_RAG", False)
+    monkeypatch.setattr(ag.rag_tools, "rag_search", lambda query, top_k=3: "- (0.9) kb.md#0\nhint")
+    monkeypatch.setattr(main, "app_graph", ag.build_graph().compile())
+    monkeypatch.setattr(main, "analysis_cache", AnalysisCache(max_entries=0))
+    return TestClient(main.app)
+
+
+def test_metrics_endpoint_reports_stages(client, capsys):
+    before = {stage: metrics.stage_seconds.count(stage=stage)
+              for stage in ("mask", "draft", "retrieve", "final", "parse", "analyze")}
+    rag = metrics.rag_route.value(route="rag")
+    tokens = metrics.llm_tokens.value(stage="final", kind="cache_read")
+
+    res = client.post("/analyze/log", json={"persona": "junior", "input_mode": "log", "error_log": "boom at host 10.0.0.1"})
+    assert res.status_code == 200 and res.json()["served_by"] == "final"
+    # 응답 전문을 매번 찍지 않는다 (기본 샘플링 1%)
+    assert "[LLM RESPONSE]" not in capsys.readouterr().out
+
+    for stage, n in before.items():
+        assert metrics.stage_seconds.count(stage=stage) > n, stage
+    assert metrics.rag_route.value(route="rag") == rag + 1
+    assert metrics.llm_tokens.value(stage="final", kind="cache_read") == tokens + 80
+
+    res = client.get("/metrics")
+    assert res.status_code == 200 and res.headers["content-type"].startswith("text/plain")
+    assert 'troubleshooter_stage_seconds_count{stage="draft"}' in res.text
+    assert 'troubleshooter_analysis_total{served_by="final"}' in res.text
+    assert "troubleshooter_limiter_in_flight 0" in res.text
@@ -0,0 +1,108 @@
+import copy
+
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+
+
+def tokens(text):
+    return max(1, len(text) // 2)
+
+
+class CachingLLM:
+    """cache_control 이 달린 블록까지를 prefix 로 기억하는 가짜 LLM. 같은 prefix 면 cache_read 로 보고한다.
+
+    Anthropic 처럼 묶인 tools 정의가 system 앞의 prefix 에 들어간다. (bind_tools 결과는 응답/기록을 공유한다)
+    """
+
+    def __init__(self, replies):
+        self.replies, self.seen, self.prefixes = list(replies), [], set()
+        self.tools, self.tool_choice = (), None
+
+    def bind_tools(self, tools, tool_choice=None, **_):
+        bound = copy.copy(self)
+        bound.tools, bound.tool_choice = tuple(t.name for t in tools), tool_choice
+        return bound
+
+    def invoke(self, messages):
+        self.seen.append((self.tools, self.tool_choice, messages))
+        prefix, rest = "", "".join(f"<tool {name}>" for name in self.tools)
+        for m in messages:
+            blocks = m.content if isinstance(m.content, list) else [{"type": "text", "text": m.content}]
+            for block in blocks:
+                if block.get("cache_control"):
+                    prefix, rest = prefix + rest + block["text"], ""
+                else:
+                    rest += block["text"]
+        cached = tokens(prefix) if prefix else 0
+        read = cached if prefix in self.prefixes else 0
+        self.prefixes.add(prefix)
+        usage = {"input_tokens": cached + tokens(rest), "output_tokens": 10, "total_tokens": cached + tokens(rest) + 10,
+                 "input_token_details": {"cache_read": read, "cache_creation": cached - read}}
+        return AIMessage(content=self.replies.pop(0), usage_metadata=usage)
+
+
+@pytest.fixture
+def ag(monkeypatch):
+    monkeypatch.setenv("ANTHROPIC_MODEL_ID", "fake-model")
+    monkeypatch.setenv("ANTHROPIC_API_KEY", "fake-key")
+    from dev.app.llm import agent_with_graph as ag
+    monkeypatch.setattr(ag, "_usage", {})
+    monkeypatch.setattr(ag.rag_tools, "rag_search", lambda query, top_k=3: "- (0.9) kb.md#0\nECONNRESET")
+    monkeypatch.setattr(ag, "SPECULATIVE_RAG", False)
+    return ag
+
+
+def state(log="ECONNRESET at 10:00"):
+    return {"messages": [], "persona": "junior", "input_mode": "log", "log_text": log, "code_text": ""}
+
+
+def test_system_messages_are_prebuilt_with_cache_breakpoint(ag):
+    first = ag._draft_messages(state())[0]
+    again = ag._draft_messages(state("other error"))[0]
+    assert first is again is ag.SYSTEM_MESSAGES[("junior", "log", "draft")]
+    base, instruction = first.content
+    assert base["cache_control"] == {"type": "ephemeral"}
+    assert "cache_control" not in instruction
+    assert instruction["text"] == ag.STAGE_INSTRUCTIONS["draft"]
+    # draft/final 은 같은 페르소나 블록을 공유한다 (같은 캐시 prefix)
+    final = ag._final_messages(state())[0]
+    assert final.content[0] == base and final.content[1]["text"] == ag.STAGE_INSTRUCTIONS["final"]
+    assert isinstance(ag.build_system_message("junior", "log", "draft", cache=False), SystemMessage)
+    assert "cache_control" not in ag.build_system_message("junior", "log", "draft", cache=False).content[0]
+
+
+def test_messages_are_not_mutated(ag):
+    human = HumanMessage(content="[로그]\nboom  ")
+    draft = AIMessage(content="초안  \n")
+    msgs = ag._final_messages({**state(), "messages": [human, draft]})
+    assert [m.content for m in msgs[1:]] == ["[로그]\nboom", "초안"]
+    assert human.content == "[로그]\nboom  " and draft.content == "초안  \n"
+
+
+def test_final_includes_user_prompt(ag):
+    msgs = ag._final_messages({**state(), "messages": [AIMessage(content="초안")]})
+    assert isinstance(msgs[1], HumanMessage) and msgs[1].content == "[로그]\nECONNRESET at 10:00"
+    assert msgs[2].content == "초안"
+
+
+def test_repeated_requests_read_prefix_from_cache(ag, monkeypatch):
+    llm = CachingLLM(["원인이 불확실 합니다", "final", "원인이 불확실 합니다", "final"])
+    # 실제 팩토리(_FACTORIES)가 draft/final 용 바인딩을 만들게 한다
+    monkeypatch.setattr(ag, "_make_llm", lambda: llm)
+    for name in ("llm", "llm_with_tools"):
+        monkeypatch.delitem(vars(ag), name, raising=False)
+    graph = ag.build_graph().compile()
+
+    graph.invoke(state())
+    graph.invoke(state("ECONNREFUSED at 11:00"))
+
+    stats = ag.usage_stats()["stages"]
+    assert stats["draft"]["calls"] == 2 and stats["final"]["calls"] == 2
+    # 첫 draft 가 페르소나 prefix 를 쓰고, 이후 호출은 모두 캐시에서 읽는다
+    assert stats["draft"]["cache_creation"] > 0
+    assert stats["final"]["cache_creation"] == 0
+    assert stats["final"]["cache_read"] == 2 * stats["draft"]["cache_creation"]
+    assert stats["draft"]["cache_read"] == stats["draft"]["cache_creation"]
+    assert 0 < stats["draft"]["cache_hit_ratio"] < stats["final"]["cache_hit_ratio"] < 1
+    # 두 단계 모두 같은 tools 를 싣고, 모델이 tool_use 를 내지 않게 한다
+    assert {(tools, str(choice)) for tools, choice, _ in llm.seen} == {(("rag_search",), str(ag.NO_TOOL_CALLS))}
@@ -0,0 +1,106 @@
+import random
+
+import pytest
+from fastapi.testclient import TestClient
+from langchain_core.messages import AIMessage
+
+from dev.app.cache import AnalysisCache
+from dev.app.llm import recorder
+from dev.app.llm.embedding_cache import CachedEmbeddings, EmbeddingCache
+from dev.benchmarks import replay
+
+FINAL = '{"cause": "연결이 끊겼습니다", "solution": "재시도", "prevention": "타임아웃 설정"}'
+
+
+class ScriptedLLM:
+    def bind_tools(self, tools):
+        return ScriptedLLM()
+
+    async def ainvoke(self, messages):
+        if len(messages) > 2:  # final: 시스템 + 사용자 + 초안 + 검색 결과
+            return AIMessage(content=FINAL, usage_metadata={"input_tokens": 50, "output_tokens": 9, "total_tokens": 59})
+        return AIMessage(content="원인이 불확실 합니다")
+
+
+class FakeEmbedder:
+    def embed_query(self, text):
+        return [float(len(text)), 1.0]
+
+    def embed_documents(self, texts):
+        return [self.embed_query(t) for t in texts]
+
+
+class FakeIndex:
+    def query(self, vector=None, top_k=3, **_):
+        return {"matches": [{"id": "kb#1", "score": 0.91,
+                             "metadata": {"source": "kb.md", "chunk_index": 1, "text": "ECONNRESET 런북", "extra": "x"}}]}
+
+
+@pytest.fixture
+def app_main(monkeypatch):
+    monkeypatch.setenv("ANTHROPIC_MODEL_ID", "fake-model")
+    monkeypatch.setenv("ANTHROPIC_API_KEY", "fake-key")
+    monkeypatch.setenv("FAST_PATH", "0")
+    monkeypatch.setenv("RAG_HYBRID", "0")
+    monkeypatch.setenv("RAG_BACKEND", "pinecone")
+    from dev.app import main
+    from dev.app.llm import agent_with_graph as ag
+    from dev.app.llm import tools
+
+    llm = ScriptedLLM()
+    monkeypatch.setattr(ag, "llm", llm)
+    monkeypatch.setattr(ag, "llm_with_tools", llm.bind_tools([]))
+    monkeypatch.setattr(ag, "SPECULATIVE_RAG", False)
+    monkeypatch.setattr(tools, "_embedder", CachedEmbeddings(FakeEmbedder(), "fake", EmbeddingCache()))
+    monkeypatch.setattr(tools, "_pinecone_index", FakeIndex())
+    monkeypatch.setattr(main, "app_graph", ag.build_graph().compile())
+    monkeypatch.setattr(main, "analysis_cache", AnalysisCache(max_entries=0))
+    yield main
+    recorder.uninstall()
+
+
+def test_record_then_replay(app_main, tmp_path):
+    path = tmp_path / "corpus.jsonl"
+    recorder.install(recorder.Recorder(str(path)))
+    client = TestClient(app_main.app)
+    for host in ("10.0.0.1", "10.0.0.2"):
+        res = client.post("/analyze/log", json={"persona": "junior", "input_mode": "log",
+                                                "error_log": f"ECONNRESET from {host}"})
+        assert res.status_code == 200 and res.json()["served_by"] == "final"
+    recorder.uninstall()
+
+    corpus = replay.Corpus.load(str(path))
+    # 같은 마스킹 결과(IP 플레이스홀더)라 두 요청이 같은 프롬프트/질의로 녹화된다
+    assert len(corpus.requests) == 2 and "10.0.0.1" not in path.read_text(encoding="utf-8")
+    assert len(corpus.llm_by_stage["draft"]) == 2 and len(corpus.llm_by_stage["final"]) == 2
+    assert len(corpus.embeds) == 1 and len(corpus.queries) == 1  # 두 번째 임베딩은 캐시 히트
+    assert corpus.queries[0]["matches"][0]["metadata"] == {"source": "kb.md", "chunk_index": 1, "text": "ECONNRESET 런북"}
+
+    stands = replay.install(corpus, llm="fixed:20", embed="0", query="fixed:5")
+    report = replay.run_load(corpus, qps=40, count=12)
+
+    assert report["completed"] == 12 and report["errors"] == {}
+    assert report["served_by"] == {"final": 12}
+    assert stands["llm"].misses == 0 and stands["llm_with_tools"].misses == 0
+    assert report["latency_ms"]["p50"] >= 40  # draft + final 고정 지연
+    assert report["latency_ms"]["p50"] <= report["latency_ms"]["p95"] <= report["latency_ms"]["p99"]
+    assert report["stages"]["draft"]["count"] == 12 and report["stages"]["final"]["count"] == 12
+    # 임베딩 캐시는 실제 코드가 돈다: 첫 질의만 대역까지 간다
+    assert stands["embed"].calls == 1 and stands["index"].calls == 12
+
+
+@pytest.mark.parametrize("spec,low,high", [("fixed:30", 30, 30), ("uniform:10,20", 10, 20),
+                                           ("lognormal:100,300", 10, 2000), ("0", 0, 0)])
+def test_latency_specs(spec, low, high):
+    latency = replay.Latency.parse(spec)
+    rng = random.Random(1)
+    samples = [latency.sample_ms(rng) for _ in range(200)]
+    assert all(low <= s <= high for s in samples)
+    if spec.startswith("lognormal"):
+        samples.sort()
+        assert 80 <= samples[100] <= 125
+
+
+def test_bad_latency_spec():
+    with pytest.raises(ValueError):
+        replay.Latency.parse("lognormal:100")
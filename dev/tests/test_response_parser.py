@@ -0,0 +1,69 @@
+import json
+import random
+import time
+from pathlib import Path
+
+from dev.app.response_parser import FIELDS, parse_response
+
+CORPUS = Path(__file__).parent / "fixtures" / "model_outputs.jsonl"
+# 파일에 넣기엔 큰 악성 입력: 깊은 중첩은 json 디코더와 tolerant 스캐너 모두 재귀 한도를 넘긴다
+MALFORMED = ['{"a":' + '[' * 100000, '{"cause": ' + '[' * 5000 + '"x"' + ']' * 5000 + '}', '[' * 100000 + '{']
+
+
+def load_corpus():
+    with open(CORPUS, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def test_corpus_fields_and_strategy():
+    for case in load_corpus():
+        parsed = parse_response(case["text"])
+        assert parsed.strategy == case["strategy"], case["name"]
+        for field, fragment in case["expect"].items():
+            assert fragment in parsed.fields.get(field, ""), (case["name"], field, parsed.fields)
+        if not case["expect"]:
+            assert parsed.missing == list(FIELDS)
+
+
+def test_fuzzed_outputs_never_raise():
+    rng = random.Random(1234)
+    texts = [c["text"] for c in load_corpus()] + MALFORMED
+    noise = ['"', "'", "{", "}", "[", "]", ",", ":", "\\", "\n", "**", "```", "cause", "원인"]
+    for _ in range(2000):
+        text = rng.choice(texts)
+        for _ in range(rng.randint(1, 4)):
+            pos = rng.randint(0, len(text))
+            if rng.random() < 0.5:
+                text = text[:pos] + rng.choice(noise) + text[pos:]
+            else:
+                text = text[:pos]
+        parsed = parse_response(text)
+        assert set(parsed.fields) <= set(FIELDS)
+
+
+def test_deeply_nested_input_falls_through_without_raising():
+    for text in MALFORMED:
+        assert set(parse_response(text).fields) <= set(FIELDS)
+    assert parse_response(MALFORMED[0]).strategy == "none"
+    parsed = parse_response('{"a": ' + '[' * 100000 + '\ncause: 디스크가 가득 찼습니다')
+    assert parsed.strategy == "keyword" and "디스크" in parsed.fields["cause"]
+    # 얕은 배열 값은 여전히 tolerant 스캐너가 읽는다
+    assert parse_response('{"cause": [["풀 고갈", "누수"]], solution: 재시작}').fields["cause"]
+
+
+def test_adversarial_input_is_linear():
+    # 이전 정규식 cascade에서 역추적이 폭증하던 형태: 닫히지 않는 따옴표와 라벨 반복
+    text = '{"cause": "' + 'cause: "a", ' * 20000
+    start = time.perf_counter()
+    parse_response(text)
+    assert time.perf_counter() - start < 2.0
+
+
+def test_main_marks_missing_fields(monkeypatch):
+    monkeypatch.setenv("ANTHROPIC_MODEL_ID", "fake-model")
+    monkeypatch.setenv("ANTHROPIC_API_KEY", "fake-key")
+    from dev.app.main import EXTRACT_FAILED, extract_fields
+
+    fields = extract_fields('{"cause": "디스크 부족"}')
+    assert fields["cause"] == "디스크 부족"
+    assert fields["solution"] == EXTRACT_FAILED.format(field="solution")
@@ -0,0 +1,90 @@
+import threading
+
+import pytest
+from fastapi.testclient import TestClient
+
+from dev.app.save_queue import Contribution, SaveQueue, SaveQueueFullError, contribution_id
+
+
+class RecordingWriter:
+    def __init__(self, fail=0):
+        self.batches, self.fail = [], fail
+        self.lock = threading.Lock()
+
+    def __call__(self, batch):
+        with self.lock:
+            if self.fail:
+                self.fail -= 1
+                raise RuntimeError("ThrottlingException")
+            self.batches.append([(c.id, c.metadata.get("n")) for c in batch])
+
+
+def item(n, key=None):
+    return Contribution(contribution_id(f"log {key if key is not None else n}", "", "c", "s"), f"text {n}", {"n": n})
+
+
+def test_coalesces_duplicates_and_writes_in_batches():
+    writer = RecordingWriter()
+    queue = SaveQueue(writer, max_batch=3, max_delay=60)
+    assert queue.submit(item(0, key="same")) is False
+    assert queue.submit(item(1, key="same")) is True  # 같은 내용 → 같은 ID, 새 값으로 덮어씀
+    for n in range(2, 6):
+        queue.submit(item(n))
+    assert queue.flush(timeout=5)
+    written = [n for batch in writer.batches for _, n in batch]
+    assert sorted(written) == [1, 2, 3, 4, 5]
+    assert all(len(batch) <= 3 for batch in writer.batches)
+    assert queue.stats()["depth"] == 0 and queue.stats()["coalesced"] == 1
+
+
+def test_failed_batch_is_retried_and_full_queue_rejects():
+    writer = RecordingWriter(fail=1)
+    queue = SaveQueue(writer, max_batch=10, max_delay=0.05, max_pending=2)
+    queue.submit(item(0))
+    queue.submit(item(1))
+    with pytest.raises(SaveQueueFullError):
+        queue.submit(item(2))
+    assert queue.close(timeout=5)
+    assert sorted(n for batch in writer.batches for _, n in batch) == [0, 1]
+    assert queue.stats()["failures"] == 1
+
+
+def test_save_endpoint_returns_immediately_and_flush_reports_depth(monkeypatch):
+    monkeypatch.setenv("ANTHROPIC_MODEL_ID", "fake-model")
+    monkeypatch.setenv("ANTHROPIC_API_KEY", "fake-key")
+    from dev.app import main
+
+    writer = RecordingWriter()
+    monkeypatch.setattr(main, "save_queue", SaveQueue(writer, max_batch=8, max_delay=60))
+    client = TestClient(main.app)
+    payload = {"persona": "junior", "error_log": "E1", "code": "", "cause": "원인", "solution": "해결"}
+    first = client.post("/save/result", json=payload).json()
+    again = client.post("/save/result", json={**payload, "persona": "senior"}).json()
+    assert first["status"] == "success" and first["id"] == again["id"] and again["coalesced"]
+    assert client.get("/save/status").json()["depth"] == 1
+
+    flushed = client.post("/save/flush").json()
+    assert flushed["depth"] == 0 and flushed["written"] == 1
+    assert len(writer.batches) == 1
+
+
+def test_saved_answer_fields_are_masked_like_the_log(monkeypatch):
+    monkeypatch.setenv("ANTHROPIC_MODEL_ID", "fake-model")
+    monkeypatch.setenv("ANTHROPIC_API_KEY", "fake-key")
+    from dev.app import main
+    from dev.app.llm.answer_store import unmasked_fields
+
+    queue = SaveQueue(RecordingWriter(), max_batch=8, max_delay=60)
+    monkeypatch.setattr(main, "save_queue", queue)
+    client = TestClient(main.app)
+    # 클라이언트는 unmask 된 분석 결과를 그대로 저장한다
+    client.post("/save/result", json={
+        "persona": "junior", "error_log": "ECONNREFUSED 10.1.2.3:5432", "code": "",
+        "cause": "10.1.2.3 의 DB 가 꺼져 있습니다", "solution": "ops@acme.io 에 10.1.2.3 재시작 요청",
+    })
+    (saved,) = queue._pending.values()
+    md = saved.metadata
+    assert md["error_sample"] == "ECONNREFUSED [IP_ADDR_0]:5432"
+    assert md["cause"] == "[IP_ADDR_0] 의 DB 가 꺼져 있습니다"
+    assert md["solution"] == "[EMAIL_0] 에 [IP_ADDR_0] 재시작 요청"
+    assert unmasked_fields(md) == []
@@ -0,0 +1,109 @@
+import asyncio
+import time
+
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage
+
+
+class SlowLLM:
+    """초안/최종 답변을 차례로 돌려주는 지연 있는 가짜 LLM."""
+
+    def __init__(self, replies, delay):
+        self.replies, self.delay, self.seen = list(replies), delay, []
+
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+    def invoke(self, messages):
+        time.sleep(self.delay)
+        self.seen.append(messages)
+        return AIMessage(content=self.replies.pop(0))
+
+    async def ainvoke(self, messages):
+        await asyncio.sleep(self.delay)
+        self.seen.append(messages)
+        return AIMessage(content=self.replies.pop(0))
+
+
+@pytest.fixture
+def ag(monkeypatch):
+    monkeypatch.setenv("ANTHROPIC_MODEL_ID", "fake-model")
+    monkeypatch.setenv("ANTHROPIC_API_KEY", "fake-key")
+    from dev.app.llm import agent_with_graph as ag
+    searches = []
+
+    def slow_search(query, top_k=3):
+        searches.append(query)
+        time.sleep(0.3)
+        return "- (0.9) kb.md#0\nECONNRESET 은 상대가 연결을 끊은 것"
+
+    monkeypatch.setattr(ag.rag_tools, "rag_search", slow_search)
+    # 모듈 속성이므로 테스트가 끝나면 monkeypatch 가 지운다 (다른 테스트 파일로 새지 않게)
+    monkeypatch.setattr(ag, "searches", searches, raising=False)
+    return ag
+
+
+def state():
+    return {"messages": [], "persona": "junior", "input_mode": "log", "log_text": "ECONNRESET at 10:00", "code_text": ""}
+
+
+@pytest.mark.parametrize("speculative", [False, True])
+def test_speculative_rag_overlaps_draft(ag, monkeypatch, speculative):
+    llm = SlowLLM(["원인이 불확실 합니다", "final"], delay=0.3)
+    monkeypatch.setattr(ag, "llm", llm)
+    monkeypatch.setattr(ag, "llm_with_tools", llm)
+    monkeypatch.setattr(ag, "SPECULATIVE_RAG", speculative)
+
+    start = time.perf_counter()
+    out = asyncio.run(ag.build_graph().compile().ainvoke(state()))
+    elapsed = time.perf_counter() - start
+
+    knowledge = [m for m in out["messages"] if isinstance(m, HumanMessage) and m.content.startswith("[검색된 지식]")]
+    assert len(knowledge) == 1 and "ECONNRESET" in knowledge[0].content
+    assert ag.searches == ["ECONNRESET at 10:00"] and not ag._speculative
+    # 직렬: 초안 0.3 + 검색 0.3 + 최종 0.3 / 추측 실행: 검색이 초안과 겹친다
+    assert (elapsed < 0.8) if speculative else (elapsed >= 0.9)
+
+
+def test_speculative_result_is_discarded_when_draft_is_confident(ag, monkeypatch):
+    llm = SlowLLM(['{"cause": "확실한 원인"}'], delay=0.05)
+    monkeypatch.setattr(ag, "llm", llm)
+    monkeypatch.setattr(ag, "SPECULATIVE_RAG", True)
+
+    out = ag.build_graph().compile().invoke(state())
+    assert [m.content for m in out["messages"]] == ['{"cause": "확실한 원인"}']
+    assert not ag._speculative and out.get("rag_ticket") is None
+
+
+def test_unclaimed_speculative_search_expires(ag, monkeypatch):
+    from concurrent.futures import Future
+
+    # 스트리밍이 초안 뒤에 끊겨 tools 노드가 돌지 않은 경우: 다음 요청이 맡길 때 만료분을 정리한다
+    monkeypatch.setattr(ag, "SPECULATIVE_TTL", 0.0)
+    abandoned = Future()
+    ag._park_speculative(abandoned)
+    monkeypatch.setattr(ag, "SPECULATIVE_TTL", 60.0)
+    ticket = ag._park_speculative(Future())
+    try:
+        assert abandoned.cancelled() and list(ag._speculative) == [ticket]
+    finally:
+        ag.discard_speculative(ticket)
+    assert not ag._speculative and ag.discard_speculative(ticket) is None
+
+
+def test_cancelled_draft_cancels_speculative_search(ag, monkeypatch):
+    from concurrent.futures import Future
+
+    monkeypatch.setattr(ag, "llm", SlowLLM(["원인이 불확실 합니다"], delay=1.0))
+    pending = Future()  # 풀에서 아직 시작 전인 검색
+    monkeypatch.setattr(ag, "_start_speculative_rag", lambda s: pending)
+
+    async def run():
+        task = asyncio.create_task(ag.aagent_draft(state()))
+        await asyncio.sleep(0.05)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(run())
+    assert pending.cancelled() and not ag._speculative
@@ -0,0 +1,36 @@
+import subprocess
+import sys
+
+from fastapi.testclient import TestClient
+
+
+def test_import_does_not_build_clients(monkeypatch):
+    monkeypatch.setenv("ANTHROPIC_MODEL_ID", "fake-model")
+    monkeypatch.setenv("ANTHROPIC_API_KEY", "fake-key")
+    code = (
+        "import sys, dev.app.main as m\n"
+        "print(m.app_graph is None, [n for n in ('langchain_anthropic', 'langchain_aws', 'pinecone') if n in sys.modules])"
+    )
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    assert out.stdout.strip().splitlines()[-1] == "True []"
+
+
+def test_ready_reports_503_until_warmup_finishes(monkeypatch):
+    monkeypatch.setenv("ANTHROPIC_MODEL_ID", "fake-model")
+    monkeypatch.setenv("ANTHROPIC_API_KEY", "fake-key")
+    from dev.app import main
+
+    calls = []
+    monkeypatch.setattr(main, "readiness", {"ready": False, "startup_ms": None, "warmup_ms": {}, "errors": {}})
+    monkeypatch.setattr(main.agent_with_graph, "warmup", lambda: calls.append("llm"))
+    monkeypatch.setattr(main, "app_graph", object())
+    monkeypatch.setattr(main.llm_tools, "warmup", lambda: (_ for _ in ()).throw(RuntimeError("pinecone down")))
+
+    client = TestClient(main.app)
+    assert client.get("/ready").status_code == 503
+    assert client.get("/health").status_code == 200
+
+    main.warmup()
+    res = client.get("/ready")
+    assert res.status_code == 200 and calls == ["llm"]
+    assert res.json()["errors"] == {"rag": "pinecone down"}
@@ -0,0 +1,123 @@
+import json
+import pytest
+from fastapi.testclient import TestClient
+
+from dev.app.cache import AnalysisCache
+from dev.app.masking import MaskingManager
+from dev.app.streaming import JsonFieldStreamParser, StreamingUnmasker
+
+PAYLOAD = {
+    "cause": "서버 [IP_ADDR_0] 연결 실패\n재시도 초과",
+    "solution": "방화벽 \"8080\" 포트를 여세요",
+    "prevention": "헬스체크를 추가하세요. 타임아웃을 조정하세요.",
+}
+
+
+def _collect(parser, pieces):
+    out = {}
+    for piece in pieces:
+        for field, delta, _ in parser.feed(piece):
+            out[field] = out.get(field, "") + delta
+    return out
+
+
+def test_parser_handles_one_char_chunks():
+    text = "```json\n" + json.dumps(PAYLOAD, ensure_ascii=False) + "\n```"
+    assert _collect(JsonFieldStreamParser(), list(text)) == PAYLOAD
+
+
+def test_parser_decodes_unicode_escapes_across_chunks():
+    text = json.dumps(PAYLOAD)  # ensure_ascii=True → \uXXXX
+    pieces = [text[i:i + 3] for i in range(0, len(text), 3)]
+    assert _collect(JsonFieldStreamParser(), pieces) == PAYLOAD
+
+
+def test_unmasker_holds_back_split_placeholder():
+    masker = MaskingManager()
+    masker.mask("a 10.0.0.1 b")
+    unmasker = StreamingUnmasker(masker)
+    out = unmasker.feed("접속 [IP_AD") + unmasker.feed("DR_0] 실패") + unmasker.flush()
+    assert out == "접속 10.0.0.1 실패"
+
+
+@pytest.fixture
+def streaming_client(monkeypatch):
+    monkeypatch.setenv("ANTHROPIC_MODEL_ID", "fake-model")
+    monkeypatch.setenv("ANTHROPIC_API_KEY", "fake-key")
+    from langchain_core.language_models import GenericFakeChatModel
+    from langchain_core.messages import AIMessage
+    from dev.app import main
+    from dev.app.llm import agent_with_graph as ag
+
+    content = json.dumps(PAYLOAD, ensure_ascii=False)
+    monkeypatch.setattr(main, "analysis_cache", AnalysisCache(max_entries=0))
+    monkeypatch.setattr(ag, "llm", GenericFakeChatModel(messages=iter([AIMessage(content=content)])))
+    return TestClient(main.app)
+
+
+def _events(body: str):
+    for block in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.splitlines())
+        yield lines["event"], json.loads(lines["data"])
+
+
+def test_stream_endpoint_emits_field_events(streaming_client):
+    res = streaming_client.post(
+        "/analyze/log/stream",
+        json={"persona": "junior", "input_mode": "log", "error_log": "connect to 10.0.0.1 failed"},
+    )
+    assert res.status_code == 200
+    assert res.headers["content-type"].startswith("text/event-stream")
+
+    events = list(_events(res.text))
+    assert events[0] == ("stage", {"stage": "draft"})
+    fields = {}
+    for name, data in events:
+        if name == "field":
+            fields[data["field"]] = fields.get(data["field"], "") + data["delta"]
+    assert len([e for e in events if e[0] == "field"]) > 3
+    assert fields["cause"] == "서버 10.0.0.1 연결 실패\n재시도 초과"
+
+    name, done = events[-1]
+    assert name == "done"
+    assert done["solution"] == fields["solution"]
+
+
+def test_stream_slot_taken_inside_generator(streaming_client, monkeypatch):
+    from dev.app import main
+    from dev.app.concurrency import AnalysisLimiter
+
+    limiter = AnalysisLimiter(max_in_flight=1, max_queue=0)
+    monkeypatch.setattr(main, "analysis_limiter", limiter)
+
+    # 응답이 전송되기 전에 클라이언트가 끊겨 제너레이터가 한 번도 돌지 않아도 슬롯은 잡혀 있지 않다
+    gen = main.stream_analysis({}, MaskingManager(), "k")
+    assert limiter.in_flight == 0
+    del gen
+
+    res = streaming_client.post(
+        "/analyze/log/stream",
+        json={"persona": "junior", "input_mode": "log", "error_log": "connect to 10.0.0.1 failed"},
+    )
+    assert list(_events(res.text))[-1][0] == "done"
+    assert limiter.in_flight == 0
+
+
+def test_stream_reports_busy_as_error_event(streaming_client, monkeypatch):
+    import asyncio
+    from dev.app import main
+    from dev.app.concurrency import AnalysisLimiter
+
+    limiter = AnalysisLimiter(max_in_flight=1, max_queue=0)
+    monkeypatch.setattr(main, "analysis_limiter", limiter)
+
+    async def run():
+        await limiter.acquire()  # 다른 요청이 슬롯을 쥐고 있다
+        try:
+            return [e async for e in main.stream_analysis({}, MaskingManager(), "k")]
+        finally:
+            limiter.release()
+
+    events = list(_events("".join(asyncio.run(run()))))
+    assert events == [("error", {"detail": "analysis queue is full", "retry_after": 1})]
+    assert limiter.in_flight == 0
@@ -102,7 +102,8 @@ if st.session_state.analysis_result:
             "error_log": st.session_state.last_inputs["error_log"],
             "code": st.session_state.last_inputs["code"],
             "cause": result["cause"],
-            "solution": result["solution"]
+            "solution": result["solution"],
+            "prevention": result.get("prevention", "")
         }
         try:
             save_res = requests.post(f"{API_BASE_URL}/save/result", json=save_payload)